@@ -1,15 +1,435 @@
 from subprocess import PIPE
 from mininet.log import info, error, debug, output, warn
 import asyncio, asyncssh
+from concurrent.futures import Future, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from functools import partial
-import time
-
+from shlex import quote
 from mininet.dutil import _info
 
+def wait_all(futures, timeout=None):
+    """
+    Blocks until all the futures are completed.
+
+    Parameters
+    ----------
+    futures : iterable
+        concurrent.futures.Future objects to wait for (e.g., as returned by
+        `ASsh.sendCmd` or `ASsh.connect`)
+    timeout : float
+        maximum number of seconds to wait. If None, wait forever (default is
+        None).
+
+    Returns
+    -------
+    list
+        the result of each future, in the same order as `futures`
+
+    Raises
+    ------
+    concurrent.futures.TimeoutError
+        if some futures are still pending after `timeout` seconds
+    """
+    futures = list(futures)
+    _, pending = wait(futures, timeout=timeout)
+    if pending:
+        raise FutureTimeoutError("{} operations still pending after {} s".format(len(pending), timeout))
+    return [future.result() for future in futures]
+
+class CommandBatch(object):
+    """
+    Commands grouped per host so that each host receives all its commands
+    in a single script (i.e., one SSH round-trip per host), the scripts of
+    the different hosts being executed in parallel.
+
+    Commands are added by units (one or several commands that must run in
+    sequence). When `parallelism` is set, up to `parallelism` units run at
+    the same time on each host, a new unit starting as soon as a running one
+    terminates. Otherwise the units run one after the other.
+
+    Attributes
+    ----------
+    parallelism : int
+        maximum number of units running at the same time on a host (None to
+        run them sequentially)
+    groups : dict
+        (ASsh, list of units) for each host
+    """
+    def __init__(self, parallelism=None):
+        self.parallelism = parallelism
+        self.groups = {}
+
+    def add(self, ssh, cmds):
+        """
+        Adds a unit of commands to run on the host of `ssh`.
+
+        Parameters
+        ----------
+        ssh : ASsh
+            connection to the host (any connection to the host can be used)
+        cmds : str or list
+            command(s) of the unit
+        """
+        if not isinstance(cmds, str):
+            cmds = ";".join(cmds)
+        if not cmds:
+            return
+        self.groups.setdefault(ssh.host, (ssh, []))[1].append(cmds)
+
+    def script(self, units):
+        """
+        Returns the bash script running `units`. Its last command fails if
+        a unit failed (i.e., the last command of the unit failed), so that
+        the script exits with status 1 unless more commands are appended.
+        """
+        lines = ["batch_status=0"]
+        if not self.parallelism:
+            for unit in units:
+                lines.append("{{ {}\n}} || batch_status=1".format(unit))
+        else:
+            lines.append("batch_pids=")
+            for unit in units:
+                # backpressure: wait for a slot before starting the unit
+                lines.append("while [ $(jobs -rp | wc -l) -ge {} ]; do wait -n; done".format(self.parallelism))
+                lines.append("( {} ) &".format(unit))
+                lines.append('batch_pids="$batch_pids $!"')
+            # the status of a unit is kept even if wait -n reaped it
+            lines.append("for pid in $batch_pids; do wait $pid || batch_status=1; done")
+        lines.append("[ $batch_status -eq 0 ]")
+        return "\n".join(lines) + "\n"
+
+    def send(self):
+        """
+        Sends the script of each host without blocking.
+
+        Returns
+        -------
+        dict
+            concurrent.futures.Future of the script output for each host
+        """
+        return {host: ssh.sendScript(self.script(units)) for host, (ssh, units) in self.groups.items()}
+
+    def execute(self, timeout=None):
+        """
+        Runs the script of each host in parallel and blocks until they are
+        all executed.
+
+        Returns
+        -------
+        dict
+            output of the script for each host
+        """
+        futures = self.send()
+        hosts = list(futures.keys())
+        outputs = wait_all([futures[host] for host in hosts], timeout=timeout)
+        return dict(zip(hosts, outputs))
+
+    def __len__(self):
+        return len(self.groups)
+
+class BastionManager(object):
+    """
+    Connections with a bastion (i.e., SSH relay) shared by all the SSH
+    connections that go through it.
+
+    Instead of forwarding a local port per connection, the downstream
+    connections are tunneled through one of the `size` connections kept
+    with the bastion (`connect_ssh`). A bastion connection that fails is
+    dropped and re-established.
+
+    Use `BastionManager.get` to obtain the manager of a bastion.
+
+    Attributes
+    ----------
+    bastion : str
+        hostname of the bastion
+    bastion_port : int
+        SSH port number of the bastion
+    username : str
+        username used to connect to the bastion and the hosts
+    client_keys : list
+        list of private key filenames
+    size : int
+        number of connections kept with the bastion
+    conns : list
+        connections with the bastion (None when not connected)
+    """
+
+    # number of connections kept with each bastion
+    defaultSize = 1
+
+    # (loop, bastion, bastion_port, username) -> BastionManager
+    managers = {}
+
+    def __init__(self, bastion, bastion_port=22, username=None, client_keys=None, size=None):
+        self.bastion = bastion
+        self.bastion_port = bastion_port
+        self.username = username
+        self.client_keys = client_keys
+        self.size = size if size is not None else self.defaultSize
+
+        self.conns = [None] * self.size
+        self.locks = None
+        self.nextConn = 0
+
+    @classmethod
+    def get(cls, loop, bastion, bastion_port=22, username=None, client_keys=None):
+        """
+        Returns the manager of the bastion, creating it if needed.
+        """
+        key = (loop, bastion, bastion_port, username)
+        if key not in cls.managers:
+            cls.managers[key] = cls(bastion=bastion, bastion_port=bastion_port,
+                                    username=username, client_keys=client_keys)
+        return cls.managers[key]
+
+    def _options(self):
+        options = {"known_hosts": None, "client_keys": self.client_keys}
+        if self.username is not None:
+            options["username"] = self.username
+        return options
+
+    async def connection(self, index=None):
+        """
+        Returns a connection with the bastion, connecting if needed.
+
+        Parameters
+        ----------
+        index : int
+            index of the bastion connection to use. If None, the connections
+            are used in turn (default is None).
+        """
+        if self.locks is None:
+            self.locks = [asyncio.Lock() for _ in range(self.size)]
+        if index is None:
+            index = self.nextConn
+            self.nextConn = (self.nextConn + 1) % self.size
+
+        async with self.locks[index]:
+            if self.conns[index] is None:
+                self.conns[index] = await asyncssh.connect(host=self.bastion, port=self.bastion_port, **self._options())
+                _info ("bastion connection {}@{}:{} \n".format(self.username, self.bastion, self.bastion_port))
+        return index, self.conns[index]
+
+    def drop(self, index, conn):
+        """
+        Forgets the bastion connection `conn` (e.g., because it failed).
+        """
+        if self.conns[index] is conn:
+            self.conns[index] = None
+            conn.close()
+
+    async def connect_ssh(self, host, port=22):
+        """
+        Establishes an SSH connection to `host`:`port` tunneled through the
+        bastion. The bastion connection is re-established once if it fails.
+
+        Returns
+        -------
+        asyncssh.SSHClientConnection
+            the connection with `host`
+        """
+        index, conn = await self.connection()
+        try:
+            return await conn.connect_ssh(host, port=port, **self._options())
+        except (OSError, asyncssh.Error) as e:
+            warn ("bastion {} failed ({}), reconnecting\n".format(self.bastion, e))
+            self.drop(index, conn)
+            index, conn = await self.connection(index)
+            return await conn.connect_ssh(host, port=port, **self._options())
+
+    def close(self):
+        for index, conn in enumerate(self.conns):
+            if conn is not None:
+                self.drop(index, conn)
+
+    @classmethod
+    def closeAll(cls, loop):
+        """
+        Closes the connections of all the bastions managed in `loop`.
+        """
+        for key, manager in list(cls.managers.items()):
+            if key[0] is loop:
+                manager.close()
+                del cls.managers[key]
+
+class PooledConnection(object):
+    """
+    asyncssh connection shared by several ASsh objects
+
+    Attributes
+    ----------
+    conn : asyncssh.SSHClientConnection
+        the SSH connection
+    users : set
+        ASsh objects using the connection
+    channels : asyncio.Semaphore
+        limits the number of channels simultaneously opened on the connection
+    watcher : asyncio.Task
+        task replacing the connection when it is lost
+    closed : bool
+        was the connection closed on purpose
+    """
+    def __init__(self, conn, maxChannels):
+        self.conn = conn
+        self.users = set()
+        self.channels = asyncio.Semaphore(maxChannels)
+        self.watcher = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+        if self.watcher is not None:
+            self.watcher.cancel()
+        self.conn.close()
+
+
+class ASshPool(object):
+    """
+    Pool of SSH connections shared by all the ASsh objects that connect to
+    the same (host, port, username, bastion).
+
+    Commands are multiplexed as channels over at most `maxConnections`
+    connections per host and each connection carries at most `maxChannels`
+    channels at the same time (keep it below the `MaxSessions` of sshd).
+    A new connection is only opened when all the existing ones already
+    serve `maxChannels` ASsh objects. A connection that is lost while it
+    still has users is re-established and given to all its users.
+
+    Attributes
+    ----------
+    loop : asyncio.unix_events._UnixSelectorEventLoop
+        the asyncio loop to work with
+    maxChannels : int
+        maximum number of simultaneous channels per connection
+    maxConnections : int
+        maximum number of connections per host
+    connections : dict
+        list of PooledConnection for each (host, port, username, bastion)
+    """
+    def __init__(self, loop, maxChannels=10, maxConnections=4):
+        self.loop = loop
+        self.maxChannels = maxChannels
+        self.maxConnections = maxConnections
+        self.connections = {}
+        self.locks = {}
+
+    @staticmethod
+    def key(ssh):
+        return (ssh.host, ssh.port, ssh.username, ssh.bastion)
+
+    async def acquire(self, ssh):
+        """
+        Returns the PooledConnection to use for `ssh`, opening a new
+        connection if needed.
+        """
+        key = self.key(ssh)
+        if key not in self.locks:
+            self.locks[key] = asyncio.Lock()
+
+        # only one connection is being opened at a time for a given host
+        async with self.locks[key]:
+            connections = self.connections.setdefault(key, [])
+            pooled = min(connections, key=lambda c: len(c.users), default=None)
+            if pooled is None or (len(pooled.users) >= self.maxChannels and
+                                  len(connections) < self.maxConnections):
+                pooled = await self._open(ssh)
+                pooled.watcher = asyncio.ensure_future(self._watch(pooled))
+                connections.append(pooled)
+            pooled.users.add(ssh)
+            return pooled
+
+    def release(self, ssh, pooled):
+        """
+        `ssh` does not use `pooled` anymore, the connection is closed when it
+        has no more users.
+        """
+        pooled.users.discard(ssh)
+        if not pooled.users:
+            # the pool may have been closed already
+            connections = self.connections.get(self.key(ssh), [])
+            if pooled in connections:
+                connections.remove(pooled)
+            pooled.close()
+
+    async def _open(self, ssh):
+        conn = await ssh._open(host=ssh.host, port=ssh.port)
+        _info ("pooled connection {}@{} via {}\n".format(ssh.username, ssh.host, ssh.bastion))
+        return PooledConnection(conn, maxChannels=self.maxChannels)
+
+    async def _watch(self, pooled, maxDelay=30):
+        """
+        Re-establishes the connection of `pooled` each time it is lost while
+        it still has users, and makes all its users use the new one.
+        """
+        while True:
+            await pooled.conn.wait_closed()
+            if pooled.closed or not pooled.users:
+                return
+            ssh = next(iter(pooled.users))
+            warn ("pooled connection {}@{} lost, reconnecting\n".format(ssh.username, ssh.host))
+            delay = 1
+            conn = None
+            while conn is None:
+                try:
+                    conn = await ssh._open(host=ssh.host, port=ssh.port)
+                except Exception as e:
+                    error ("Error for {}@{} via {}: {} \n".format(ssh.username, ssh.host, ssh.bastion, e))
+                    await asyncio.sleep(delay)
+                    delay = min(2 * delay, maxDelay)
+                if pooled.closed or not pooled.users:
+                    if conn is not None:
+                        conn.close()
+                    return
+            pooled.conn = conn
+            for user in pooled.users:
+                user.conn = user._wrap(conn)
+
+    def close(self):
+        for connections in self.connections.values():
+            for pooled in connections:
+                pooled.close()
+        self.connections = {}
+
+
+class ExecConnection(object):
+    """
+    SSH connection with an LXC machine on which the commands run in one of
+    its containers (with `lxc exec`). Offers the methods of
+    asyncssh.SSHClientConnection that are used on the connection with a node
+    so that the node does not need an SSH server nor an admin IP address.
+
+    Attributes
+    ----------
+    conn : asyncssh.SSHClientConnection
+        connection with the LXC machine
+    container : str
+        name of the container
+    """
+    def __init__(self, conn, container):
+        self.conn = conn
+        self.container = container
+
+    def command(self, cmd):
+        """
+        Returns the command running `cmd` in the container
+        """
+        return "lxc exec {} --mode=non-interactive -- bash -c {}".format(self.container, quote(cmd))
+
+    def run(self, cmd, **kwargs):
+        return self.conn.run(self.command(cmd), **kwargs)
+
+    def create_process(self, cmd, **kwargs):
+        return self.conn.create_process(self.command(cmd), **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
 class ASsh(object):
     def __init__(self, loop, host, port=22, username=None, bastion=None,
-                       bastion_port=22, client_keys=None,
-                       **params):
+                       bastion_port=22, client_keys=None, pool=None,
+                       container=None, retries=10, backoff=0.5,
+                       max_backoff=30, **params):
         # the node runs
         self.run = True
 
@@ -26,100 +446,186 @@ def __init__(self, loop, host, port=22, username=None, bastion=None,
         self.bastion = bastion
         self.bastion_port = bastion_port
 
-        # current task in execution
+        # current task in execution (concurrent.futures.Future)
         self.task = None
         self.tasks = []
 
+        # completed when the bastion (resp. the host) is connected
+        self.tunnelFuture = Future()
+        self.connectFuture = Future()
+
         # are we waiting for a task to be executed
         self.waiting = False
 
         self.readbuf = ''
 
-        # SSH tunnel through the bastion
-        self.tunnel = None
-
         # SSH connection with the host
         self.conn = None
 
-        # hostname to connect to
-        self.connection_host = self.host
-        # port number to use
-        self.connection_port = self.port
+        # pool of shared SSH connections (if any) and connection in use
+        self.pool = pool
+        self.pooled = None
+
+        # container in which the commands run (None: on the host itself)
+        self.container = container
 
+        # consecutive failed connection attempts before giving up (None:
+        # never) and delay before the next attempt, doubled at each failure
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        # asyncio task establishing (and keeping) the connection
+        self.connectTask = None
+
+
+    def bastionManager(self):
+        """
+        Returns the BastionManager to use to reach the host, None if the host
+        is directly accessible.
+        """
+        if self.bastion is None:
+            return None
+        return BastionManager.get(loop=self.loop, bastion=self.bastion,
+                                  bastion_port=self.bastion_port,
+                                  username=self.username,
+                                  client_keys=self.client_keys)
 
     def createTunnel(self):
         """
-        Creates a tunnel with the bastion if needed (i.e., a bastion is
-        specified).
+        Connects to the bastion if needed (i.e., a bastion is specified).
+        The bastion connection is shared with all the other ASsh objects
+        using the same bastion.
         """
         if self.bastion is not None:
-            self.loop.create_task(self._tunnel(bastion=self.bastion,
-                                               bastion_port=self.bastion_port,
-                                               host=self.host, port=self.port))
-   
-    async def _tunnel(self, bastion, host, bastion_port=22, port=22):
+            return self.submit(self._tunnel())
+
+    def submit(self, coro):
+        """
+        Schedules the coroutine `coro` in the asyncio loop from any thread.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            future completed with the result of the coroutine
         """
-        Establishes SSH local port forwarding to `host:port` via the bastion
-        node (`bastion`:`bastion_port`).
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
 
-        The tunnel is stored in `self.tunnel`.
-        The local port number is obtained by calling `get_port()` on the
-        `tunnel` attribute.
+    async def _tunnel(self):
+        """
+        Establishes the connection with the bastion (if not done yet).
+        """
+        try:
+            _, conn = await self.bastionManager().connection()
+            if not self.tunnelFuture.done():
+                self.tunnelFuture.set_result(conn)
+        except Exception as e:
+            if not self.tunnelFuture.done():
+                self.tunnelFuture.set_exception(e)
+            raise
+
+    def waitTunneled(self, timeout=None):
+        """
+        Waits that the connection with the bastion is established (if needed)
+        """
+        if self.bastion is not None:
+            self.tunnelFuture.result(timeout)
 
+    async def _open(self, host, port):
+        """
+        Opens an SSH connection to `host`:`port`, through the bastion if
+        needed.
 
-        Attributes
-        ----------
-        bastion : str
-            name of the bastion (i.e., SSH relay) to use to connect to
-            `host`:`port`. 
-        host : str
-            name of the host to connect to.
-        bastion_port : int
-            SSH port number to use to connect to the bastion (default is 22).
-        port : int
-            SSH port number to use (default is 22).            
+        Returns
+        -------
+        asyncssh.SSHClientConnection
+            the connection with the host
         """
+        manager = self.bastionManager()
+        if manager is not None:
+            return await manager.connect_ssh(host, port=port)
 
         connect = partial(asyncssh.connect, known_hosts=None, client_keys=self.client_keys)
         if self.username is not None:
             connect = partial(connect, username=self.username)
+        return await connect(host=host, port=port)
 
-        async with connect(host=bastion, port=bastion_port) as conn:
-            self.tunnel = await conn.forward_local_port('', 0, host, port)
-            _info ("tunnel {}:{}:{} {}@{}:{} \n".format(self.tunnel.get_port(), host, port, self.username, bastion, bastion_port))
-            while self.run:
-                await asyncio.sleep(1)
-
-    def waitTunneled(self):
+    def connect(self):
         """
-        Waits that the tunnel is established (if needed) and updates `_host`
-        and `_port` attributes to use it instead of having a direct connection
-        to the host
+        Establishes an SSH connection to the host
+
+        Returns
+        -------
+        concurrent.futures.Future
+            future completed once the connection is established
         """
-        if self.bastion is not None:
-            while self.tunnel is None:
-                time.sleep(0.001)
+        if self.pool is not None:
+            coro = self._connectPooled()
+        else:
+            coro = self._connect(host=self.host, port=self.port)
+        self.loop.call_soon_threadsafe(self._startConnect, coro)
+        return self.connectFuture
 
-            # get the local port number
-            self.connection_port = self.tunnel.get_port()
-            # when a tunnel is used, connect locally
-            self.connection_host = 'localhost'
+    def _startConnect(self, coro):
+        self.connectTask = self.loop.create_task(coro)
 
-    def connect(self):
+    async def disconnect(self):
         """
-        Establishes an SSH connection to the host
+        Stops the connection task (closing its connection) and waits for it
+        to terminate. Must run in the asyncio loop.
+        """
+        self.run = False
+        task, self.connectTask = self.connectTask, None
+        if task is not None:
+            task.cancel()
+            await asyncio.wait([task])
+
+    async def _retry(self, attempts, e):
         """
-        if self.bastion:
-            # create a tunnel via the bastion to connect to the hostA
-            self.createTunnel()
-            # wait fot th tunnel to be created
-            self.waitTunneled()
-  
-        task = self.loop.create_task(self._connect(host=self.connection_host, port=self.connection_port))
+        Waits before the next connection attempt after `attempts` consecutive
+        failures, the last one with the exception `e`.
+
+        Returns
+        -------
+        bool
+            False if the connection must not be retried anymore (then
+            `connectFuture` fails with `e`)
+        """
+        if self.retries is not None and attempts > self.retries:
+            error ("Giving up connecting to {}@{} after {} attempts\n".format(self.username, self.host, attempts))
+            self._connectFailed(e)
+            return False
+        await asyncio.sleep(min(self.backoff * 2 ** (attempts - 1), self.max_backoff))
+        return True
+
+    async def _connectPooled(self):
+        """
+        Gets a connection to the host from the pool.
+        """
+        attempts = 0
+        try:
+            while self.run:
+                try:
+                    self.pooled = await self.pool.acquire(self)
+                    self.conn = self._wrap(self.pooled.conn)
+                    self.connectFuture.set_result(self.conn)
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error ("Error for {}@{} via {}: {} \n".format(self.username, self.host, self.bastion, e))
+                    attempts += 1
+                    if not await self._retry(attempts, e):
+                        return
+        finally:
+            self._connectFailed()
 
     async def _connect(self, host, port):
         """
-        Establishes an SSH connection to `host`:`port`.
+        Establishes an SSH connection to `host`:`port`, through the bastion if
+        needed. The connection is re-established if it fails, until `run` is
+        False or `retries` consecutive attempts failed (waiting longer and
+        longer between the attempts).
 
         Parameters
         ----------
@@ -128,63 +634,139 @@ async def _connect(self, host, port):
         port : int
             port number
         """
-        connect = partial(asyncssh.connect, known_hosts=None, client_keys=self.client_keys)
-        if self.username is not None:
-            connect = partial(connect, username=self.username)
+        attempts = 0
+        try:
+            while self.run:
+                try:
+                    async with await self._open(host=host, port=port) as conn:
+                        attempts = 0
+                        self.conn = self._wrap(conn)
+                        if not self.connectFuture.done():
+                            self.connectFuture.set_result(self.conn)
+                        while self.run:
+                            await asyncio.sleep(1)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error ("Error for {}@{} via {}:{}: {} \n".format(self.username, self.host, self.bastion, port, e))
+                    attempts += 1
+                    if not await self._retry(attempts, e):
+                        return
+        finally:
+            self._connectFailed()
+
+    def _connectFailed(self, exc=None):
+        """
+        Completes `connectFuture` with an error if the connection was never
+        established (the connection task gave up or was cancelled) so that
+        nobody waits for it forever.
+        """
+        if not self.connectFuture.done():
+            if exc is None:
+                exc = ConnectionError("cannot connect to {}@{}".format(self.username, self.host))
+            self.connectFuture.set_exception(exc)
 
-        while True:
-            try:
-                async with connect(host=host, port=port) as conn:
-                    self.conn = conn
-                    while self.run:
-                        await asyncio.sleep(1)
-            except Exception as e:
-                error ("Error for {}@{} via {}:{}: {} \n".format(self.username, self.host, self.bastion, port, e))
+    def _wrap(self, conn):
+        """
+        Returns the connection to use to run commands given the SSH
+        connection `conn` with the host
+        """
+        if self.container is None:
+            return conn
+        return ExecConnection(conn, self.container)
 
-    def waitConnected(self):
+    def waitConnected(self, timeout=None):
         """
         Blocking until the node is actually started
         """
-
-        while not self.connected():
-            time.sleep(0.001)
+        self.connectFuture.result(timeout)
 
     def connected(self):
         return self.conn is not None
 
     def sendCmd(self, cmd, multi=False):
-        task = self.loop.create_task(self._run(cmd))
+        """
+        Runs `cmd` on the host without blocking.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            future completed with the standard output of the command
+        """
+        task = self.submit(self._run(cmd))
 
         if multi:
             self.tasks.append(task)
         else:
             self.task = task
+        return task
+
+    def sendScript(self, script):
+        """
+        Runs the bash `script` on the host without blocking. The script is
+        given on the standard input of bash so its size is not limited by the
+        maximum command line length.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            future completed with the standard output of the script
+        """
+        return self.submit(self._run("bash -s", input=script))
+
+    async def _copyFrom(self, source, path, dest):
+        """
+        Copies the file `path` of the host of `source` to `dest` on the host
+        (with SCP, through this machine: the hosts do not need to trust each
+        other). Must run in the asyncio loop.
+
+        Parameters
+        ----------
+        source : ASsh
+            connection with the host that has the file
+        path : str
+            path of the file on the source host (relative to the home
+            directory)
+        dest : str
+            path of the copy on the host (relative to the home directory)
+        """
+        # the copy uses a channel of each connection
+        pools = [ssh.pooled.channels for ssh in (self, source) if ssh.pooled is not None]
+        for channels in pools:
+            await channels.acquire()
+        try:
+            await asyncssh.scp((source.conn, path), (self.conn, dest))
+        finally:
+            for channels in pools:
+                channels.release()
 
     def cmd(self, cmd):
         self.sendCmd(cmd)
         return self.waitOutput()
     
-    def waitAllOutput(self):
-        while len(self.tasks) > 0:
-            if self.tasks[0].done():
-                self.tasks.pop(0)
-            else:
-                time.sleep(0.001)
-
-    def waitOutput(self):
-        while not self.task.done():
-            time.sleep(0.001)
-        return self.task.result()
-
-    async def _run(self, cmd):
-        result = await self.conn.run(cmd)
+    def waitAllOutput(self, timeout=None):
+        wait_all(self.tasks, timeout=timeout)
+        self.tasks = []
+
+    def waitOutput(self, timeout=None):
+        return self.task.result(timeout)
+
+    async def _run(self, cmd, input=None):
+        if self.pooled is not None:
+            # do not open more channels than the connection accepts
+            async with self.pooled.channels:
+                result = await self.conn.run(cmd, input=input)
+        else:
+            result = await self.conn.run(cmd, input=input)
         return result.stdout
 
     def close(self):
-        self.conn.close()
+        if self.pooled is not None:
+            self.loop.call_soon_threadsafe(self.pool.release, self, self.pooled)
+            self.pooled = None
+            return
 
-        if self.tunnel:
-            self.tunnel.close()
+        self.conn.close()
 
     async def createProcess(self, cmd, stdin=None, stdout=None, stderr=None):
         process = await self.conn.create_process(cmd, stdin=PIPE, stdout=PIPE, stderr=PIPE)
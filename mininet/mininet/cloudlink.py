@@ -26,8 +26,111 @@
 
 from mininet.log import info, error, debug
 import re
+from concurrent.futures import ThreadPoolExecutor
 
 from mininet.link import(Intf, TCIntf, Link, TCLink)
+from mininet.assh import CommandBatch, wait_all
+
+class LinkBatch( object ):
+    """Commands creating a set of links, computed up front and pushed to
+       each target in a single script, the targets running their script in
+       parallel.
+       The script of a target first creates the container interfaces (the
+       interfaces of a container one after the other, up to parallelism
+       containers at a time) and then creates the VXLAN and veth links
+       between the bridges of the interfaces."""
+
+    def __init__( self, parallelism=None, configParallelism=16,
+                  tracer=None ):
+        """parallelism: maximum number of containers whose interfaces are
+           created at the same time on a target (None: one at a time)
+           configParallelism: maximum number of nodes whose interfaces are
+           configured (tc, ethtool) at the same time
+           tracer: Tracer recording the script of each target (linkTarget)
+           and the configuration of each node (configureIntfs), optional"""
+        self.parallelism = parallelism
+        self.configParallelism = configParallelism
+        self.tracer = tracer
+        # target -> (ASsh, {container: [cmds]}, [cmds])
+        self.targets = {}
+        # (interface, params) to configure once the links exist
+        self.intfs = []
+
+    def _target( self, node ):
+        "Return the commands of the target of node"
+        return self.targets.setdefault( node.target,
+                                        ( node.targetSsh, {}, [] ) )
+
+    def addInterface( self, node, cmds ):
+        "Add the commands creating an interface of node"
+        self._target( node )[ 1 ].setdefault( node.name, [] ).extend( cmds )
+
+    def addLink( self, node, cmds ):
+        "Add the commands linking a bridge of node to its peer"
+        self._target( node )[ 2 ].extend( cmds )
+
+    def addIntf( self, intf, params ):
+        "Add an interface to configure with params once it exists"
+        self.intfs.append( ( intf, params ) )
+
+    def script( self, target ):
+        "Return the script to run on target"
+        _ssh, interfaces, links = self.targets[ target ]
+        units = [ ';'.join( cmds ) for cmds in interfaces.values() ]
+        batch = CommandBatch( parallelism=self.parallelism )
+        return batch.script( units ) + '\n'.join( links ) + '\n'
+
+    def send( self ):
+        """Send the script of each target without blocking
+           returns: dict of concurrent.futures.Future per target"""
+        futures = {}
+        for target, ( ssh, interfaces, _l ) in self.targets.items():
+            start = self.tracer.now() if self.tracer is not None else None
+            futures[ target ] = ssh.sendScript( self.script( target ) )
+            if self.tracer is not None:
+                futures[ target ].add_done_callback(
+                    lambda _f, target=target, start=start,
+                    containers=len( interfaces ): self.tracer.add(
+                        'linkTarget', 'link', target, start,
+                        self.tracer.now(), containers=containers ) )
+        return futures
+
+    def configure( self ):
+        """Configure the interfaces (e.g., tc) now that they exist, the
+           interfaces of a node one after the other (on its shell) and the
+           nodes in parallel"""
+        nodes = {}
+        for intf, params in self.intfs:
+            nodes.setdefault( intf.node, [] ).append( ( intf, params ) )
+
+        def configure( items ):
+            start = self.tracer.now() if self.tracer is not None else None
+            for intf, params in items:
+                intf.params = params
+                intf.config( **params )
+            if self.tracer is not None:
+                node = items[ 0 ][ 0 ].node
+                self.tracer.add( 'configureIntfs', 'link', node.name, start,
+                                 self.tracer.now(), intfs=len( items ) )
+
+        if nodes:
+            with ThreadPoolExecutor(
+                    max_workers=self.configParallelism ) as pool:
+                list( pool.map( configure, nodes.values() ) )
+
+    def execute( self, timeout=None ):
+        """Run the script of each target in parallel, block until they
+           are all executed and configure the interfaces
+           returns: dict of output per target"""
+        futures = self.send()
+        targets = list( futures.keys() )
+        outputs = wait_all( [ futures[ t ] for t in targets ],
+                            timeout=timeout )
+        self.configure()
+        return dict( zip( targets, outputs ) )
+
+    def __len__( self ):
+        return len( self.targets )
 
 class CloudLink( Link ):
     nextLinkId = 20 
@@ -39,7 +142,8 @@ class CloudLink( Link ):
     def __init__( self, node1, node2, port1=None, port2=None,
                   intfName1=None, intfName2=None, addr1=None, addr2=None,
                   intf=TCIntf, cls1=None, cls2=None, params1=None,
-                  params2=None, fast=True, **params ):
+                  params2=None, fast=True, batch=None, bridges=None,
+                  linkId=None, **params ):
         """Create veth link to another node, making two new interfaces.
            node1: first node
            node2: second node
@@ -53,6 +157,12 @@ def __init__( self, node1, node2, port1=None, port2=None,
            addr2: MAC address for interface 2
            params1: parameters for interface 1
            params2: parameters for interface 2
+           batch: LinkBatch collecting the commands creating the link
+                  (optional, the link is created immediately otherwise)
+           bridges: bridges of the interfaces of a link that already
+                    exists on the targets (optional, nothing is created
+                    or configured then, see Distrinet.attach)
+           linkId: VXLAN id of the link if it already exists
            params: parameters for the link"""
         # This is a bit awkward; it seems that having everything in
         # params is more orthogonal, but being able to specify
@@ -86,19 +196,32 @@ def __init__( self, node1, node2, port1=None, port2=None,
         self.params2.update(params)
         self.params2.update(params2)
 
-        # Make interfaces
-        interfaces = self.makeIntfPair( intfName1, intfName2, addr1, addr2,
-                           node1, node2, deleteIntfs=False )
-
         if not cls1:
             cls1 = intf
         if not cls2:
             cls2 = intf
-        
-        intf1 = cls1( name=intfName1, node=node1,
-                      link=self, mac=addr1, **self.params1  )
-        intf2 = cls2( name=intfName2, node=node2,
-                      link=self, mac=addr2, **self.params2 )
+
+        if bridges is not None:
+            self.attachIntfs( node1, node2, intfName1, intfName2,
+                              addr1, addr2, cls1, cls2, bridges, linkId )
+            return
+
+        # Make interfaces
+        interfaces = self.makeIntfPair( intfName1, intfName2, addr1, addr2,
+                           node1, node2, deleteIntfs=False, batch=batch )
+
+        if batch is None:
+            intf1 = cls1( name=intfName1, node=node1,
+                          link=self, mac=addr1, **self.params1  )
+            intf2 = cls2( name=intfName2, node=node2,
+                          link=self, mac=addr2, **self.params2 )
+        else:
+            # the interfaces only exist once the batch is executed: the
+            # batch configures them then
+            intf1 = self.batchIntf( batch, cls1, intfName1, node1, addr1,
+                                    self.params1 )
+            intf2 = self.batchIntf( batch, cls2, intfName2, node2, addr2,
+                                    self.params2 )
         
         # All we are is dust in the wind, and our two interfaces
         self.intf1, self.intf2 = intf1, intf2
@@ -107,10 +230,46 @@ def __init__( self, node1, node2, port1=None, port2=None,
 ##        host_iface1 = self.params1.get("host_iface", None)
 ##        host_iface2 = self.params2.get("host_iface", None)
         link_id = self.newLinkId()
+        self.linkId = link_id
 
-        node1.addContainerLink(target1=node1.target, target2=node2.target, link_id=link_id, bridge1=interfaces[0], bridge2=interfaces[1], link=self)
-        node2.addContainerLink(target1=node2.target, target2=node1.target, link_id=link_id, bridge1=interfaces[1], bridge2=interfaces[0], link=self)
+        node1.addContainerLink(target1=node1.target, target2=node2.target, link_id=link_id, bridge1=interfaces[0], bridge2=interfaces[1], link=self, batch=batch)
+        node2.addContainerLink(target1=node2.target, target2=node1.target, link_id=link_id, bridge1=interfaces[1], bridge2=interfaces[0], link=self, batch=batch)
         
+    def attachIntfs( self, node1, node2, intfName1, intfName2, addr1, addr2,
+                     cls1, cls2, bridges, linkId ):
+        """Create the objects of the interfaces of a link that already
+           exists on the targets, without running any command"""
+        intfs = []
+        for node, name, mac, cls, params, bridge in (
+                ( node1, intfName1, addr1, cls1, self.params1, bridges[ 0 ] ),
+                ( node2, intfName2, addr2, cls2, self.params2, bridges[ 1 ] ) ):
+            # Intf.__init__ would configure the interface again
+            intf = self.bareIntf( cls, name, node, mac, params )
+            node.containerInterfaces[ name ] = bridge
+            node.containerLinks[ self ] = "vx_{}".format( linkId )
+            intfs.append( intf )
+        self.intf1, self.intf2 = intfs
+        self.linkId = linkId
+
+    def bareIntf( self, cls, name, node, mac, params ):
+        """Create the object of the interface name of node and add it to
+           node without running Intf.__init__, which configures the
+           interface (commands on the shell of the node)"""
+        params = dict( params )
+        intf = cls.__new__( cls )
+        intf.node, intf.name, intf.link, intf.mac = node, name, self, mac
+        intf.ip, intf.prefixLen = None, None
+        node.addIntf( intf, port=params.pop( 'port', None ) )
+        intf.params = params
+        return intf
+
+    def batchIntf( self, batch, cls, name, node, mac, params ):
+        """Create the interface name of node and leave its configuration
+           with params to batch (the device does not exist yet)"""
+        intf = self.bareIntf( cls, name, node, mac, params )
+        batch.addIntf( intf, intf.params )
+        return intf
+
     @classmethod
     def newLinkId(cls):
         link_id = CloudLink.nextLinkId
@@ -133,7 +292,7 @@ def intfName( self, node, n ):
 
     @classmethod
     def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
-                      node1=None, node2=None, deleteIntfs=True ):
+                      node1=None, node2=None, deleteIntfs=True, batch=None ):
         """Create pair of interfaces
            intfname1: name for interface 1
            intfname2: name for interface 2
@@ -141,6 +300,7 @@ def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
            addr2: MAC address for interface 2 (optional)
            node1: home node for interface 1 (optional)
            node2: home node for interface 2 (optional)
+           batch: LinkBatch collecting the commands (optional)
            (override this method [and possibly delete()]
            to change link type)"""
         # Leave this as a class method for now
@@ -151,8 +311,8 @@ def makeIntfPair( cls, intfname1, intfname2, addr1=None, addr2=None,
             raise Exception("Must implement delete interface")
 
         # Add the interface on both ends:
-        br1 = node1.addContainerInterface(intfName=intfname1)
-        br2 = node2.addContainerInterface(intfName=intfname2)
+        br1 = node1.addContainerInterface(intfName=intfname1, batch=batch)
+        br2 = node2.addContainerInterface(intfName=intfname2, batch=batch)
         
         return (br1, br2)
 
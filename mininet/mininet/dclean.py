@@ -0,0 +1,132 @@
+"""
+Distrinet cleanup
+
+When an experiment crashes, its containers and network devices are left on
+the LXC machines (workers and master). This module connects to all of them
+at the same time and removes in bulk:
+
+- the containers created by Distrinet (tagged with DISTRINET_TAG at
+  creation)
+- the devices created by Distrinet, recognized by their name: admin-br
+  (admin network bridge), vx_N (VXLAN), intfN (container interface bridge)
+  and vintfN (veth between two bridges)
+"""
+import asyncio
+from concurrent.futures import wait
+from threading import Thread
+
+from mininet.log import info, error
+from mininet.assh import ASsh, BastionManager
+
+# LXD configuration key set on every container created by Distrinet
+DISTRINET_TAG = "user.distrinet"
+
+# names of the devices created by Distrinet
+DEVICES_REGEX = "^(admin-br|vx_[0-9]+|v?intf[0-9]+)$"
+
+def cleanScript(parallelism=16):
+    """
+    Returns the script removing the Distrinet containers (up to
+    `parallelism` at a time) and devices of a machine, printing "container
+    NAME" and "device NAME" for each one removed
+    """
+    lines = ['for name in $(lxc list {}=true --format csv -c n 2> /dev/null); do'.format(DISTRINET_TAG),
+             '    while [ $(jobs -rp | wc -l) -ge {} ]; do wait -n; done'.format(parallelism),
+             '    ( lxc delete $name --force > /dev/null 2>&1 && echo "container $name" ) &',
+             'done']
+    lines.append("wait")
+    lines.append("for name in $(ip -o link show | awk -F': ' '{{print $2}}' | cut -d@ -f1 | grep -E '{}'); do".format(DEVICES_REGEX))
+    lines.append('    ip link delete $name 2> /dev/null && echo "device $name"')
+    lines.append("done")
+    return "\n".join(lines) + "\n"
+
+def parseCleanOutput(output):
+    """
+    Returns the containers and the devices removed according to the output
+    of the clean script
+    """
+    removed = {"container": [], "device": []}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 2 and fields[0] in removed:
+            removed[fields[0]].append(fields[1])
+    return removed["container"], removed["device"]
+
+def cleanup(workers, user="root", client_keys=None, jump=None, parallelism=16, timeout=60):
+    """
+    Removes the Distrinet containers and devices of all the `workers` at
+    the same time.
+
+    Parameters
+    ----------
+    workers : list
+        names of the LXC machines (master included)
+    user : str
+        username used to connect to the machines
+    client_keys : list
+        list of private key filenames
+    jump : str
+        bastion to connect through (None: direct connections)
+    parallelism : int
+        maximum number of containers deleted at a time on a machine
+    timeout : float
+        maximum number of seconds for the whole cleanup, the workers that
+        are not cleaned by then are reported as failed (None: forever)
+
+    Returns
+    -------
+    dict
+        (removed containers, removed devices) per worker, None for the
+        workers that could not be cleaned
+    """
+    loop = asyncio.new_event_loop()
+    thread = Thread(target=loop.run_forever)
+    thread.start()
+
+    script = cleanScript(parallelism=parallelism)
+    sshs = {worker: ASsh(loop=loop, host=worker, username=user, bastion=jump, client_keys=client_keys)
+            for worker in workers}
+
+    async def clean(ssh):
+        "Connects to a worker and cleans it as soon as it is connected"
+        await asyncio.wrap_future(ssh.connectFuture)
+        return await asyncio.wrap_future(ssh.sendScript(script))
+
+    results = {}
+    futures = {}
+    try:
+        info("*** Cleaning {}\n".format(" ".join(workers)))
+        for worker, ssh in sshs.items():
+            ssh.connect()
+            futures[worker] = asyncio.run_coroutine_threadsafe(clean(ssh), loop)
+        # a single deadline for all the workers
+        wait(futures.values(), timeout=timeout)
+        for worker, future in futures.items():
+            if not sshs[worker].connectFuture.done() or sshs[worker].connectFuture.exception():
+                error("*** {}: cannot connect\n".format(worker))
+                results[worker] = None
+            elif not future.done():
+                error("*** {}: cleanup not finished after {} s\n".format(worker, timeout))
+                results[worker] = None
+            else:
+                try:
+                    containers, devices = parseCleanOutput(future.result())
+                    results[worker] = (containers, devices)
+                    info("*** {}: {} containers, {} devices removed\n".format(worker, len(containers), len(devices)))
+                except Exception as e:  # pylint: disable=broad-except
+                    error("*** {}: cleanup failed: {}\n".format(worker, e))
+                    results[worker] = None
+    finally:
+        for future in futures.values():
+            future.cancel()
+
+        async def disconnect():
+            await asyncio.gather(*[ssh.disconnect() for ssh in sshs.values()])
+
+        # stop the connection tasks (and close their connections) before
+        # stopping the loop
+        asyncio.run_coroutine_threadsafe(disconnect(), loop).result()
+        loop.call_soon_threadsafe(BastionManager.closeAll, loop)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+    return results
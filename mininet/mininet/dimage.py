@@ -0,0 +1,270 @@
+"""
+Pre-warming of the container images
+
+Before creating the containers, the images they use must be in the LXD image
+store of their target, otherwise each `lxc init` would download them (from
+the master or from the Internet) in the middle of the deployment. ImageCache
+checks the images of each target once and, for the missing ones, copies the
+image tarball (~/ALIAS.tar.gz, the file the playbooks import) from the master
+to the target and imports it. Container creation is then purely local.
+
+Optionally, a template container is made per image on each target, with the
+public key and the SSH server already set up, so that the nodes are created
+with `lxc copy` from its snapshot instead of `lxc init` (see templateScript).
+
+The state of an image on a target is one of:
+
+- hit: already in the LXD image store of the target
+- local: its tarball was on the target, only imported
+- copied: its tarball was copied from the master and imported
+- failed: not available on the target (lxc init will try to fetch it)
+"""
+import asyncio
+import re
+import zlib
+
+from mininet.log import info, error
+
+# snapshot of the template containers the nodes are copied from
+TEMPLATE_SNAPSHOT = "base"
+
+# LXD configuration key of a template holding the fingerprint of its image
+TEMPLATE_IMAGE_KEY = "user.distrinet.image"
+
+def probeScript(images):
+    """
+    Returns the script printing "IMAGE hit" for the `images` in the LXD
+    store of the machine, "IMAGE local" for the ones whose tarball is in the
+    home directory and "IMAGE miss" for the others
+    """
+    lines = []
+    for image in images:
+        lines.append('if lxc image info {0} > /dev/null 2>&1; then echo "{0} hit"; '
+                     'elif [ -f ~/{0}.tar.gz ]; then echo "{0} local"; '
+                     'else echo "{0} miss"; fi'.format(image))
+    return "\n".join(lines) + "\n"
+
+def importScript(images):
+    """
+    Returns the script importing the tarballs of `images` in the LXD store of
+    the machine, printing "IMAGE imported" or "IMAGE failed" for each one
+    """
+    lines = []
+    for image in images:
+        lines.append('( lxc image import ~/{0}.tar.gz --alias {0} --public > /dev/null 2>&1 '
+                     '&& echo "{0} imported" || echo "{0} failed" ) &'.format(image))
+    lines.append("wait")
+    return "\n".join(lines) + "\n"
+
+def exportScript(image):
+    """
+    Returns the script making the tarball ~/IMAGE.tar.gz of `image` from the
+    LXD store of the machine if it does not exist yet, printing "ok" when the
+    tarball is available
+    """
+    return ('[ -f ~/{0}.tar.gz ] || lxc image export {0} ~/{0} > /dev/null 2>&1\n'
+            '[ -f ~/{0}.tar.gz ] && echo ok\n').format(image)
+
+def templateName(image, pub_id):
+    """
+    Returns the name of the template container of `image` with the public
+    key `pub_id` (a new template is made when the key changes)
+    """
+    alias = re.sub("[^a-zA-Z0-9]+", "-", image).strip("-")[:40]
+    key = zlib.crc32((pub_id or "").encode()) & 0xffffffff
+    return "distrinet-{}-{:08x}".format(alias, key)
+
+def templateScript(templates, pub_id):
+    """
+    Returns the script making the template containers (`templates` maps the
+    images to the names of their template) that do not exist yet or that
+    were made from another version of their image, printing "IMAGE ready" or
+    "IMAGE failed" for each image
+
+    A template is a container made from the image with the public key
+    `pub_id` authorized and the SSH server enabled at boot, then stopped and
+    snapshotted so that the nodes are copied from the snapshot (copy on write
+    on a btrfs or zfs storage pool). The fingerprint of the image is kept in
+    the TEMPLATE_IMAGE_KEY key of the template: when the alias points to a
+    new image, the template is made again.
+    """
+    lines = ["key='{}'".format(pub_id or "")]
+    for image, template in sorted(templates.items()):
+        lines.append('( fp=$(lxc image info {0} 2> /dev/null | awk \'/^Fingerprint:/ {{print $2}}\')\n'
+                     '  [ -n "$fp" ] && [ "$(lxc config get {1} {3} 2> /dev/null)" = "$fp" ] &&\n'
+                     '  lxc config show {1}/{2} > /dev/null 2>&1 || {{\n'
+                     '    lxc delete {1} --force > /dev/null 2>&1\n'
+                     '    lxc init {0} {1} < /dev/null > /dev/null 2>&1 && lxc config set {1} {3} "$fp" &&\n'
+                     '    lxc start {1} > /dev/null 2>&1 &&\n'
+                     '    lxc exec {1} -- bash -c "mkdir -p /root/.ssh && echo \\"$key\\" >> /root/.ssh/authorized_keys && '
+                     '(systemctl enable ssh || update-rc.d ssh enable)" > /dev/null 2>&1 &&\n'
+                     '    lxc stop {1} > /dev/null 2>&1 && lxc snapshot {1} {2} > /dev/null 2>&1; }}\n'
+                     ') && echo "{0} ready" || echo "{0} failed" &'.format(image, template, TEMPLATE_SNAPSHOT,
+                                                                     TEMPLATE_IMAGE_KEY))
+    lines.append("wait")
+    return "\n".join(lines) + "\n"
+
+def parseStates(output):
+    """
+    Returns the state of each image according to the output of the probe
+    or import script
+    """
+    states = {}
+    for line in output.splitlines():
+        fields = line.split()
+        if len(fields) == 2:
+            states[fields[0]] = fields[1]
+    return states
+
+class ImageCache(object):
+    """
+    Makes sure that the images are present on the targets, copying them from
+    the master when they are missing. Must be used from the asyncio loop.
+
+    Attributes
+    ----------
+    status : dict
+        state of the images per target: {target: {image: state}}
+    """
+    def __init__(self, master, copies=4):
+        """
+        Parameters
+        ----------
+        master : ASsh
+            connection with the master, where the images come from
+        copies : int
+            maximum number of tarballs copied at a time
+        """
+        self.master = master
+        self.copies = asyncio.Semaphore(copies)
+        # tarball export on the master, once per image: {image: future}
+        self.exports = {}
+        self.status = {}
+
+    async def _run(self, ssh, script):
+        return await asyncio.wrap_future(ssh.sendScript(script))
+
+    async def _export(self, image):
+        """
+        Makes the tarball of `image` on the master, returns True when it is
+        available
+        """
+        output = await self._run(self.master, exportScript(image))
+        return output.strip() == "ok"
+
+    def export(self, image):
+        """
+        Returns the future of the export of `image` on the master (started on
+        the first call)
+        """
+        if image not in self.exports:
+            self.exports[image] = asyncio.ensure_future(self._export(image))
+        return self.exports[image]
+
+    async def _copy(self, ssh, target, image):
+        """
+        Copies the tarball of `image` from the master to `target`, returns
+        True on success
+        """
+        if not await self.export(image):
+            error("*** {}: no tarball of image {} on the master\n".format(target, image))
+            return False
+        tarball = "{}.tar.gz".format(image)
+        try:
+            async with self.copies:
+                await ssh._copyFrom(self.master, tarball, tarball)
+        except Exception as e:  # pylint: disable=broad-except
+            error("*** {}: cannot copy image {}: {}\n".format(target, image, e))
+            return False
+        return True
+
+    async def ensure(self, ssh, target, images):
+        """
+        Makes sure that `images` are in the LXD store of `target`
+
+        Parameters
+        ----------
+        ssh : ASsh
+            connection with the target
+        target : str
+            name of the target
+        images : list
+            images used by the containers of the target
+
+        Returns
+        -------
+        dict
+            state of each image on the target
+        """
+        images = sorted(set(images))
+        states = parseStates(await self._run(ssh, probeScript(images)))
+        missing = [image for image in images if states.get(image) == "miss"]
+        copied = await asyncio.gather(*[self._copy(ssh, target, image) for image in missing])
+        toImport = [image for image in images if states.get(image) == "local"]
+        toImport += [image for image, ok in zip(missing, copied) if ok]
+
+        if toImport:
+            imported = parseStates(await self._run(ssh, importScript(toImport)))
+            for image in toImport:
+                if imported.get(image) != "imported":
+                    states[image] = "failed"
+                elif states.get(image) == "miss":
+                    states[image] = "copied"
+        for image in images:
+            if states.get(image) not in ("hit", "local", "copied"):
+                states[image] = "failed"
+        self.status[target] = states
+        return states
+
+    async def templates(self, ssh, target, images, pub_id):
+        """
+        Makes sure that the template containers of `images` exist on
+        `target`
+
+        Parameters
+        ----------
+        ssh : ASsh
+            connection with the target
+        target : str
+            name of the target
+        images : list
+            images used by the containers of the target
+        pub_id : str
+            public key to authorize in the templates
+
+        Returns
+        -------
+        dict
+            name of the template of each image, None for the images whose
+            template could not be made
+        """
+        templates = {image: templateName(image, pub_id) for image in set(images)}
+        states = parseStates(await self._run(ssh, templateScript(templates, pub_id)))
+        for image in sorted(templates):
+            if states.get(image) != "ready":
+                error("*** {}: cannot make the template of image {}\n".format(target, image))
+                templates[image] = None
+        return templates
+
+    def counts(self):
+        """
+        Returns the number of (target, image) pairs per state
+        """
+        counts = {"hit": 0, "local": 0, "copied": 0, "failed": 0}
+        for states in self.status.values():
+            for state in states.values():
+                counts[state] += 1
+        return counts
+
+    def report(self):
+        """
+        Logs the cache hits and misses
+        """
+        counts = self.counts()
+        info("*** Images: {hit} hits, {misses} misses ({local} local, {copied} copied, "
+             "{failed} failed)\n".format(misses=counts["local"] + counts["copied"] + counts["failed"],
+                                         **counts))
+        for target, states in sorted(self.status.items()):
+            failed = [image for image, state in states.items() if state == "failed"]
+            if failed:
+                error("*** {}: images not available: {}\n".format(target, " ".join(failed)))
@@ -111,18 +111,26 @@
 
 # DSA ########################
 from mininet.dutil import _info
-
-from mininet.cloudlink import (CloudLink)
-from mininet.lxc_container import (LxcNode)
+from mininet.dtrace import Tracer
+from mininet.dtraffic import ( serverScript, stopServerScript, clientScript,
+                               parseClientOutput, flowThroughput, linkLoads )
+from mininet.resolver import NameResolver
+from mininet.dimage import ImageCache
+from mininet.dmanifest import ( MANIFEST_VERSION, nodeEntry, linkEntry,
+                                saveManifest, loadManifest )
+
+from mininet.cloudlink import (CloudLink, LinkBatch)
+from mininet.lxc_container import (LxcNode, lastIntfNum, resumeIntfNames)
 from mininet.cloudswitch import (LxcSwitch)
 from mininet.cloudcontroller import (LxcRemoteController)
 
 
 import asyncio
 import time
+from concurrent.futures import ThreadPoolExecutor
 from threading import Thread
 
-from mininet.assh import ASsh
+from mininet.assh import ASsh, ASshPool, BastionManager, CommandBatch, wait_all
 ##############################
 
 # Mininet version: should be consistent with README and LICENSE
@@ -143,7 +151,10 @@ def __init__( self, topo=None, switch=LxcSwitch, host=LxcNode,
                   autoSetMacs=False, autoPinCpus=False,
                   listenPort=None, waitConnected=False, waitConnectionTimeout=5, 
                   jump=None, user="root", client_keys=None, master=None, pub_id=None,
-                  **kwargs):
+                  sshChannels=10, sshConnections=4, containerParallelism=16,
+                  deployParallelism=64, linkParallelism=16, resolverTTL=None,
+                  trace=None, manifest=None, prewarm=True, imageCopies=4,
+                  templates=False, **kwargs):
         """Create Mininet object.
            topo: Topo (topology) object or None
            switch: default Switch class
@@ -165,7 +176,27 @@ def __init__( self, topo=None, switch=LxcSwitch, host=LxcNode,
            waitConnected: wait for the switches to be connected to their controller
            waitConnectionTimeout: timeout to wait to decide if a switch is connected to its controller
            jump: SSH jump host
-           master: master node"""
+           master: master node
+           sshChannels: maximum simultaneous channels per SSH connection to a target
+           sshConnections: maximum SSH connections per target
+           containerParallelism: maximum containers created at a time on a target
+           deployParallelism: maximum nodes being configured at a time
+           linkParallelism: maximum containers whose link interfaces are
+               created at a time on a target
+           resolverTTL: seconds a resolved LXC machine IP address stays
+               cached (None: forever)
+           trace: path prefix where to save the deployment trace when the
+               network is stopped (None: do not save)
+           manifest: path where to write the deployment manifest once the
+               network is built (None: do not write, see attach)
+           prewarm: make sure that the images of the containers are in the
+               LXD store of their target before creating them (see
+               ImageCache)
+           imageCopies: maximum image tarballs copied from the master at a
+               time
+           templates: create the containers by copying a template container
+               prepared once per image on each target, with the public key
+               and the ssh server already set up"""
         self.topo = topo
         self.switch = switch
         self.host = host
@@ -199,6 +230,23 @@ def __init__( self, topo=None, switch=LxcSwitch, host=LxcNode,
         self.waitConnectionTimeout = waitConnectionTimeout
 
         self.mapper = mapper
+        self.containerParallelism = containerParallelism
+        self.deployParallelism = deployParallelism
+        self.linkParallelism = linkParallelism
+        self.deployTimes = None
+        # number of runs of the deployment pipeline (see deployNodes)
+        self.deployRun = 0
+        self.pingResults = None
+        self.prewarm = prewarm
+        self.imageCopies = imageCopies
+        self.templates = templates
+        # state of each image per target (see ensureImages)
+        self.imageStatus = {}
+
+        # deployment phases timing
+        self.tracer = Tracer()
+        self.trace = trace
+        self.manifestPath = manifest
 #
         self.hosts = []
         self.switches = []
@@ -226,6 +274,12 @@ def runforever(loop):
         self.masterSsh.waitConnected()
         _info ("connected to master node\n")
 
+        # SSH connections to the targets shared by all their nodes
+        self.targetPool = ASshPool(loop=self.loop, maxChannels=sshChannels, maxConnections=sshConnections)
+
+        # IP addresses of the targets shared by all the nodes and links
+        self.resolver = NameResolver(ttl=resolverTTL)
+
 
 
         self.nameToNode = {}  # name to Node (Host/Switch) objects
@@ -267,7 +321,9 @@ def addHost( self, name, cls=None, **params ):
         if not cls:
             cls = self.host
 
-        if self.mapper:
+        # an explicit target wins over the mapper (e.g., nodes added by
+        # reconcile)
+        if self.mapper and "target" not in params:
             defaults.update({"target":self.mapper.place(name)})
 
         h = cls(name=name, **defaults )
@@ -296,7 +352,9 @@ def addSwitch( self, name, cls=None, **params ):
             cls = self.switch
 
 
-        if self.mapper:
+        # an explicit target wins over the mapper (e.g., nodes added by
+        # reconcile)
+        if self.mapper and "target" not in params:
             defaults.update({"target":self.mapper.place(name)})
 
         sw = cls(name=name, **defaults )
@@ -323,6 +381,8 @@ def addController( self, name='c0', controller=None, **params ):
                     username=self.user,
                     bastion=self.jump,
                     client_keys=self.client_keys,
+                    pool=self.targetPool,
+                    resolver=self.resolver,
                 **params)
         self.controllers.append(controller_new)
         self.nameToNode[ name ] = controller_new
@@ -361,13 +421,15 @@ def addNAT( self, name='nat0', connect=True, inNamespace=False,
 
     # DSA - OK
     def addLink( self, node1, node2, port1=None, port2=None,
-                 cls=None, **params ):
+                 cls=None, batch=None, **params ):
         """"Add a link from node1 to node2
             node1: source node (or name)
             node2: dest node (or name)
             port1: source port (optional)
             port2: dest port (optional)
             cls: link class (optional)
+            batch: LinkBatch collecting the commands creating the link
+                   (optional, see addLinks)
             params: additional link params (optional)
             returns: link object"""
         # Accept node objects or names
@@ -387,6 +449,8 @@ def addLink( self, node1, node2, port1=None, port2=None,
         # Set default MAC - this should probably be in Link
         options.setdefault( 'addr1', self.randMac() )
         options.setdefault( 'addr2', self.randMac() )
+        if batch is not None:
+            options[ 'batch' ] = batch
        
         params1 = None
         params2 = None
@@ -402,7 +466,11 @@ def addLink( self, node1, node2, port1=None, port2=None,
 ##        self.nextLinkId += 1 
 
         cls = self.link if cls is None else cls
-        link = cls( node1=node1, node2=node2, params1=params1, params2=params2, **options )
+        # a batched link only exists once its batch is executed (see the
+        # linkTarget and configureIntfs spans of LinkBatch)
+        name = 'addLink' if batch is None else 'prepareLink'
+        with self.tracer.span( name, 'link', '%s-%s' % ( node1, node2 ) ):
+            link = cls( node1=node1, node2=node2, params1=params1, params2=params2, **options )
         self.links.append( link )
         return link
 
@@ -455,11 +523,11 @@ def buildFromTopo( self, topo=None ):
 
         info( '*** Creating network\n' )
 
-        bastion = self.jump
         waitStart = False
         _ip = "{}/{}".format(ipAdd(self.adminNextIP, ipBaseNum=self.adminIpBaseNum, prefixLen=self.adminPrefixLen), self.adminPrefixLen)
         self.adminNextIP += 1
-        self.host.createMasterAdminNetwork(self.masterSsh, brname="admin-br", ip=_ip)
+        with self.tracer.span( 'createMasterAdminNetwork', 'build', self.masterhost ):
+            self.host.createMasterAdminNetwork(self.masterSsh, brname="admin-br", ip=_ip)
         _info (" admin network created on {}\n".format(self.masterhost))
 
 
@@ -485,110 +553,297 @@ def buildFromTopo( self, topo=None ):
 
         # == Hosts ===========================================================
         for hostName in topo.hosts():
-            _ip = "{}/{}".format(ipAdd( self.adminNextIP, ipBaseNum=self.adminIpBaseNum, prefixLen=self.adminPrefixLen),self.adminPrefixLen)
-            self.adminNextIP += 1
-#            __ip= newAdminIp(admin_ip)
-            self.addHost( name=hostName,
-                    admin_ip= _ip,
-                    loop=self.loop,
-                    master=self.masterSsh,
-                    username=self.user,
-                    bastion=bastion,
-                    client_keys=self.client_keys,
-                    waitStart=waitStart,
-                    **topo.nodeInfo( hostName ))
+            self.addTopoNode( topo, hostName, waitStart=waitStart )
             info( hostName + ' ' )
 
         info( '\n*** Adding switches:\n' )
         for switchName in topo.switches():
-            _ip = "{}/{}".format(ipAdd( self.adminNextIP, ipBaseNum=self.adminIpBaseNum, prefixLen=self.adminPrefixLen),self.adminPrefixLen)
-            self.adminNextIP += 1
-            self.addSwitch( name=switchName,
-                    admin_ip=_ip,
-                    loop=self.loop,
-                    master=self.masterSsh,
-                    username=self.user,
-                    bastion=bastion,
-                    client_keys=self.client_keys,
-                    waitStart=waitStart,
-                    **topo.nodeInfo( switchName ))
+            self.addTopoNode( topo, switchName, switch=True,
+                              waitStart=waitStart )
             info( switchName + ' ' )
 
 
         if not waitStart:
             nodes = self.hosts + self.switches
-
             _info ("[starting\n")
-            for node in nodes:
-                _info ("connectTarget {} ".format( node.name))
-                node.connectTarget()
-
-            for node in nodes:
-                node.waitConnectedTarget()
-                _info ("connectedTarget {} ".format( node.name))
-
-            count = 0
-            for node in nodes:
-                _info ("createContainer {} ".format( node.name))
-                node.createContainer()
-                count += 1
-                if count > 50:
-                    output("50 nodes created...\n")
-                    sleep(10)
-                    count = 0
-
-            for node in nodes:
-                node.waitCreated()
-                _info ("createdContainer {} ".format(node.name))
-           
-            for node in nodes:
-                _info ("create admin interface {} ".format( node.name))
-                node.addContainerInterface(intfName="admin", brname="admin-br", wait=False)
-
-            for node in nodes:
-                node.targetSshWaitOutput()
-                _info ("admin interface created on {} ".format( node.name))
-            _info ("\n")
-
-            cmds = []
-            for node in nodes:
-                cmds = cmds + node.connectToAdminNetwork(master=node.masternode.host, target=node.target, link_id=CloudLink.newLinkId(), admin_br="admin-br", wait=False)
-            if len (cmds) > 0:
-                cmd = ';'.join(cmds)
-                self.masterSsh.cmd(cmd) 
-
-            for node in nodes:
-                node.configureContainer(wait=False)
-            for node in nodes:
-                node.targetSshWaitOutput()
-
-            for node in nodes:
-                _info ("connecting {} ".format( node.name))
-                node.connect()
-
-            for node in nodes:
-                node.waitConnected()
-                _info ("connected {} ".format( node.name))
-
-            for node in nodes:
-                _info ("startshell {} ".format( node.name) )
-                node.asyncStartShell()
-            for node in nodes:
-                node.waitStarted()
-                _info ("startedshell {}".format( node.name))
-
-            for node in nodes:
-                _info ("finalize {}".format( node.name))
-                node.finalizeStartShell()
+            with self.tracer.span( 'deployNodes', 'build' ):
+                self.deployNodes( nodes )
             _info ("\n")
 
         info( '\n*** Adding links:\n' )
-        for srcName, dstName, params in topo.links(
-                sort=True, withInfo=True ):
-            self.addLink( **params )
-            info( '(%s, %s) ' % ( srcName, dstName ) )
+        with self.tracer.span( 'addLinks', 'build' ):
+            self.addLinks( [ params for _src, _dst, params in topo.links(
+                sort=True, withInfo=True ) ] )
         info( '\n' )
 
+    def addTopoNode( self, topo, name, switch=False, waitStart=False,
+                     **params ):
+        """Add a node of topo with the next admin IP address
+           topo: Topo object
+           name: name of the node in topo
+           switch: add a switch (default: a host)
+           waitStart: create and start the container right now
+           params: additional parameters for the node
+           returns: added node"""
+        _ip = "{}/{}".format(ipAdd( self.adminNextIP, ipBaseNum=self.adminIpBaseNum, prefixLen=self.adminPrefixLen),self.adminPrefixLen)
+        self.adminNextIP += 1
+        nodeParams = dict( topo.nodeInfo( name ) )
+        nodeParams.update( params )
+        add = self.addSwitch if switch else self.addHost
+        return add( name=name,
+                    admin_ip=_ip,
+                    loop=self.loop,
+                    master=self.masterSsh,
+                    username=self.user,
+                    bastion=self.jump,
+                    client_keys=self.client_keys,
+                    pool=self.targetPool,
+                    resolver=self.resolver,
+                    waitStart=waitStart,
+                    **nodeParams )
+
+    def addLinks( self, links ):
+        """Add links in bulk: the commands of all the links are computed
+           first and then pushed with one script per target, the targets
+           creating their links in parallel.
+           links: list of addLink params (node1, node2, ...)
+           returns: list of link objects"""
+        self.resolveTargets( self.hosts + self.switches ).result()
+        batch = LinkBatch( parallelism=self.linkParallelism,
+                           configParallelism=self.deployParallelism,
+                           tracer=self.tracer )
+        added = []
+        for params in links:
+            added.append( self.addLink( batch=batch, **params ) )
+            info( '(%s, %s) ' % ( params[ 'node1' ], params[ 'node2' ] ) )
+        with self.tracer.span( 'createLinks', 'build', targets=len( batch ) ):
+            batch.execute()
+        return added
+
+    def resolveTargets( self, nodes ):
+        """Resolve with a single command on the master the names of the
+           master and of the targets of nodes that are not cached yet
+           nodes: nodes whose target must be resolved
+           returns: concurrent.futures.Future of the IP address per name"""
+        names = set( node.target for node in nodes if node.target )
+        names.add( self.masterhost )
+        return self.masterSsh.submit(
+            self.resolver.prefetch( self.masterSsh, names ) )
+
+    def containerBatch( self, nodes ):
+        "Return the CommandBatch creating the containers of nodes"
+        batch = CommandBatch( parallelism=self.containerParallelism )
+        for node in nodes:
+            batch.add( node.targetSsh, node.createContainerStatusCommand() )
+        return batch
+
+    @staticmethod
+    def containerStatus( nodes, outputs ):
+        """Parse the outputs of a container batch
+           nodes: nodes whose container was created
+           outputs: output of the batch script for each target
+           returns: dict of status ('created' or 'failed') per node name"""
+        status = {}
+        for target, out in outputs.items():
+            for line in out.splitlines():
+                fields = line.split()
+                if len( fields ) == 2:
+                    status[ fields[ 0 ] ] = fields[ 1 ]
+            _info ("containers created on {}\n".format(target))
+
+        failed = [ node.name for node in nodes
+                   if status.get( node.name ) != 'created' ]
+        if failed:
+            error( '*** Failed to create containers: %s\n' %
+                   ' '.join( failed ) )
+            raise Exception( 'Failed to create %i containers' % len( failed ) )
+        return status
+
+    def createContainers( self, nodes ):
+        """Create the containers of nodes with one script per target, each
+           target creating up to containerParallelism containers at a time.
+           nodes: nodes whose container must be created
+           returns: dict of status ('created' or 'failed') per node name"""
+        outputs = self.containerBatch( nodes ).execute()
+        return self.containerStatus( nodes, outputs )
+
+    # == Deployment pipeline ==================================================
+    def _newRun( self, cat ):
+        """Start a run of the deployment pipeline
+           cat: category of the spans of the run (e.g., deploy, reconcile)
+           returns: dict of the category, id, start and node done times of
+                    the run"""
+        self.deployRun += 1
+        return { 'cat': cat, 'id': self.deployRun,
+                 'start': time.monotonic(), 'done': {} }
+
+    def _timed( self, phase, key, run, **args ):
+        "Trace phase for key (node or target) in the category of run"
+        return self.tracer.span( phase, run[ 'cat' ], key, run=run[ 'id' ],
+                                 **args )
+
+    @staticmethod
+    async def _wait( futures ):
+        "Wait from the asyncio loop for concurrent.futures.Future objects"
+        await asyncio.gather( *[ asyncio.wrap_future( f ) for f in futures ] )
+
+    def deployNodes( self, nodes, cat='deploy' ):
+        """Bring up nodes: each target and then each node progresses through
+           the deployment phases at its own pace, without waiting for the
+           other targets or nodes (at most deployParallelism nodes in their
+           own phases at a time).
+           cat: category of the spans of the phases (e.g., reconcile for the
+                nodes added to a running network), each call is also traced
+                with its own run id
+           Timings are merged in deployTimes:
+             total: duration of the deployments
+             phases: duration of each phase per target or node name
+             done: time at which each node was up (from the beginning of
+                   its deployment)
+             runs: the timings of each call (cat, run, total, phases,
+                   done)"""
+        run = self._newRun( cat )
+
+        targets = {}
+        for node in nodes:
+            targets.setdefault( node.target, [] ).append( node )
+
+        async def deploy():
+            # resolve all the targets at once before they need them
+            with self._timed( 'resolveTargets', 'master', run ):
+                await self._wait( [ self.resolveTargets( nodes ) ] )
+            semaphore = asyncio.Semaphore( self.deployParallelism )
+            images = ImageCache( self.masterSsh, self.imageCopies )
+            await asyncio.gather( *[ self._deployTarget( target, tnodes,
+                                                         semaphore, run,
+                                                         images )
+                                     for target, tnodes in targets.items() ] )
+            if self.prewarm:
+                images.report()
+
+        asyncio.run_coroutine_threadsafe( deploy(), self.loop ).result()
+        times = { 'cat': cat, 'run': run[ 'id' ],
+                  'total': time.monotonic() - run[ 'start' ],
+                  'phases': self.tracer.durations( cat, run=run[ 'id' ] ),
+                  'done': run[ 'done' ] }
+        self.mergeDeployTimes( times )
+        self.deployReport( times )
+
+    def mergeDeployTimes( self, times ):
+        "Merge the timings of a run of deployNodes in deployTimes"
+        if self.deployTimes is None:
+            self.deployTimes = { 'total': 0.0, 'phases': {}, 'done': {},
+                                 'runs': [] }
+        self.deployTimes[ 'total' ] += times[ 'total' ]
+        for phase, durations in times[ 'phases' ].items():
+            self.deployTimes[ 'phases' ].setdefault( phase, {} ).update(
+                durations )
+        self.deployTimes[ 'done' ].update( times[ 'done' ] )
+        self.deployTimes[ 'runs' ].append( times )
+
+    async def _deployTarget( self, target, nodes, semaphore, run, images ):
+        "Target-wide phases, then the pipeline of each node of target"
+        with self._timed( 'connectTarget', target, run ):
+            await self._wait( [ node.connectTarget() for node in nodes ] )
+
+        if self.prewarm:
+            with self._timed( 'ensureImages', target, run ):
+                await images.ensure( nodes[ 0 ].targetSsh, target,
+                                     [ node.image for node in nodes ] )
+            self.imageStatus.update( images.status )
+
+        if self.templates:
+            with self._timed( 'prepareTemplates', target, run ):
+                templates = await images.templates(
+                    nodes[ 0 ].targetSsh, target,
+                    [ node.image for node in nodes ], self.pub_id )
+            for node in nodes:
+                node.template = templates[ node.image ]
+
+        with self._timed( 'createContainer', target, run ):
+            batch = self.containerBatch( nodes )
+            futures = batch.send()
+            await self._wait( futures.values() )
+            outputs = { t: f.result() for t, f in futures.items() }
+            self.containerStatus( nodes, outputs )
+
+        # the nodes reached with lxc exec do not use the admin network
+        adminNodes = [ node for node in nodes if node.useAdminNetwork() ]
+        with self._timed( 'addContainerInterface', target, run ):
+            futures = []
+            for node in adminNodes:
+                node.addContainerInterface( intfName="admin",
+                                            brname="admin-br", wait=False )
+                futures.append( node.targetSsh.task )
+            await self._wait( futures )
+
+        with self._timed( 'connectToAdminNetwork', target, run ):
+            # resolved from the loop (the cached addresses may have expired
+            # since the beginning of the deployment)
+            ips = await self.resolver.prefetch(
+                self.masterSsh, [ target ] + [ node.masternode.host
+                                               for node in adminNodes ] )
+            cmds = []
+            futures = []
+            for node in adminNodes:
+                nodeCmds = node.connectToAdminNetwork(
+                    master=node.masternode.host, target=node.target,
+                    link_id=CloudLink.newLinkId(), admin_br="admin-br",
+                    wait=False, ips=ips )
+                if nodeCmds:
+                    futures.append( node.targetSsh.task )
+                cmds = cmds + nodeCmds
+            if cmds:
+                futures.append( self.masterSsh.submit(
+                    self.masterSsh._run( ';'.join( cmds ) ) ) )
+            await self._wait( futures )
+
+        await asyncio.gather( *[ self._deployNode( node, semaphore, run )
+                                 for node in nodes ] )
+
+    async def _deployNode( self, node, semaphore, run ):
+        "Per node phases, from the configuration to the shell"
+        async with semaphore:
+            if node.useAdminNetwork():
+                with self._timed( 'configureContainer', node.name, run,
+                                  target=node.target ):
+                    node.configureContainer( wait=False )
+                    await self._wait( [ node.targetSsh.task ] )
+
+            await self._startNode( node, run )
+        run[ 'done' ][ node.name ] = time.monotonic() - run[ 'start' ]
+
+    async def _startNode( self, node, run ):
+        "Connect to the container of node and start its shell"
+        with self._timed( 'connect', node.name, run, target=node.target ):
+            await self._wait( [ node.connect() ] )
+
+        with self._timed( 'startShell', node.name, run, target=node.target ):
+            await self._wait( [ node.asyncStartShell() ] )
+
+        # reading the shell prompt is blocking
+        with self._timed( 'finalizeStartShell', node.name, run,
+                          target=node.target ):
+            await asyncio.get_event_loop().run_in_executor(
+                None, node.finalizeStartShell )
+
+    def deployReport( self, times=None ):
+        """Output the total and per phase deployment times
+           times: timings of a run of deployNodes (default: deployTimes)"""
+        if times is None:
+            times = self.deployTimes
+        info( '*** Deployment (%s): %.3f s\n' % (
+              times.get( 'cat', 'all runs' ), times[ 'total' ] ) )
+        for phase, durations in times[ 'phases' ].items():
+            slowest = max( durations, key=durations.get )
+            info( '    %-24s max %.3f s (%s) mean %.3f s\n' % (
+                  phase, durations[ slowest ], slowest,
+                  sum( durations.values() ) / len( durations ) ) )
+        if times[ 'done' ]:
+            last = max( times[ 'done' ], key=times[ 'done' ].get )
+            info( '    critical path: %s up after %.3f s\n' % (
+                  last, times[ 'done' ][ last ] ) )
+
     def configureControlNetwork( self ):
         "Control net config hook: override in subclass"
         raise Exception( 'configureControlNetwork: '
@@ -597,7 +852,8 @@ def configureControlNetwork( self ):
     def build( self ):
         "Build mininet."
         if self.topo:
-            self.buildFromTopo( self.topo )
+            with self.tracer.span( 'buildFromTopo', 'build' ):
+                self.buildFromTopo( self.topo )
 
 ##            self.configureControlNetwork()
         info( '*** Configuring hosts\n' )
@@ -607,6 +863,9 @@ def build( self ):
 #        if self.autoStaticArp:
 #            self.staticArp()
         self.built = True
+        if self.manifestPath:
+            info( '*** Saving deployment manifest in %s\n' %
+                  self.saveManifest() )
 
     def startTerms( self ):
         "Start a terminal for each node."
@@ -640,15 +899,18 @@ def start( self ):
         info( '*** Starting controller\n' )
         for controller in self.controllers:
             info( controller.name + ' ')
-            controller.start()
+            with self.tracer.span( 'startController', 'start', controller.name ):
+                controller.start()
         info( '\n' )
         info( '*** Starting %s switches\n' % len( self.switches ) )
         for switch in self.switches:
             info( switch.name + ' ')
-            switch.start( self.controllers )
+            with self.tracer.span( 'startSwitch', 'start', switch.name ):
+                switch.start( self.controllers )
         started = {}
         for switch in self.switches:
-            success = switch.batchStartup([switch])
+            with self.tracer.span( 'batchStartup', 'start', switch.name ):
+                success = switch.batchStartup([switch])
             started.update( { s: s for s in success } )
 #        for swclass, switches in groupby(
 #                sorted( self.switches,
@@ -662,58 +924,815 @@ def start( self ):
             self.waitConnected()
 
 
+    @staticmethod
+    def _unique( items ):
+        "Return items without duplicates, in order"
+        seen = set()
+        return [ i for i in items if not ( i in seen or seen.add( i ) ) ]
+
+    def teardownScripts( self, nodes ):
+        """Return the script destroying the containers of nodes and the
+           devices made for them on each target: the containers are deleted
+           (up to containerParallelism at a time), then the devices.
+           nodes: LxcNodes to destroy
+           returns: dict of (ASsh, script) per target"""
+        targets = {}
+        for node in nodes:
+            targets.setdefault( node.target, [] ).append( node )
+        scripts = {}
+        for target, tnodes in targets.items():
+            batch = CommandBatch( parallelism=self.containerParallelism )
+            units = [ 'lxc delete %s --force' % node.name for node in tnodes ]
+            devices = self._unique( chain( *[ node.devices or []
+                                              for node in tnodes ] ) )
+            script = batch.script( units ) + ''.join(
+                'ip link delete %s 2> /dev/null\n' % d for d in devices )
+            scripts[ target ] = ( tnodes[ 0 ].targetSsh, script )
+        return scripts
+
+    def destroyContainers( self, containers, masterNodes=None ):
+        """Destroy the containers and their devices with one script per
+           target and the devices of the master with one command, all at
+           the same time, and release the nodes
+           containers: LxcNodes to destroy
+           masterNodes: nodes whose master devices must be deleted
+                        (default: containers)"""
+        futures = []
+        start = self.tracer.now()
+        for target, ( ssh, script ) in self.teardownScripts(
+                containers ).items():
+            future = ssh.sendScript( script )
+            future.add_done_callback(
+                lambda _f, target=target: self.tracer.add(
+                    'teardownTarget', 'stop', target, start,
+                    self.tracer.now() ) )
+            futures.append( future )
+        if masterNodes is None:
+            masterNodes = containers
+        masterDevices = self._unique( chain( *[ node.devicesMaster
+                                               for node in masterNodes ] ) )
+        if masterDevices:
+            futures.append( self.masterSsh.sendScript( ''.join(
+                'ip link delete %s 2> /dev/null\n' % d
+                for d in masterDevices ) ) )
+        wait_all( futures )
+        for node in containers:
+            node.release()
+
     def stop( self ):
-        "Stop the switches, hosts and controller(s) "
+        """Stop the switches, hosts and controller(s): the containers and
+           devices of every target are destroyed with a single script per
+           target and the devices of the master with a single command, all
+           at the same time (what runs in a container goes away with it)"""
         if self.terms:
             info( '*** Stopping %i terms\n' % len( self.terms ) )
             self.stopXterms()
-        info( '*** Stopping %i links\n' % len( self.links ) )
+        nodes = self.hosts + self.switches + self.controllers
+        containers = [ n for n in nodes if isinstance( n, LxcNode ) ]
+        for node in nodes:
+            if node not in containers:
+                # e.g., remote controller
+                node.stop()
+        # the links only consist of devices of the containers and targets
         for link in self.links:
-            info( '.' )
-            link.stop()
-        info( '\n' )
-        info( '*** Stopping %i switches\n' % len( self.switches ) )
-        stopped = {}
-########        for switch in self.switches:
-########           success = switch.batchShutdown([switch])
-########            stopped.update( { s: s for s in success } )
-#        for swclass, switches in groupby(
-#                sorted( self.switches,
-#                        key=lambda s: str( type( s ) ) ), type ):
-#            switches = tuple( switches )
-#            if hasattr( swclass, 'batchShutdown' ):
-#                success = swclass.batchShutdown( switches )
-#                stopped.update( { s: s for s in success } )
-        for switch in self.switches:
-            info( switch.name + ' ' )
-            if switch not in stopped:
-                switch.stop()
-            switch.terminate()
-        info( '\n' )
-        info( '*** Stopping %i hosts\n' % len( self.hosts ) )
-        for host in self.hosts:
-            info( host.name + ' ' )
-            host.terminate()
+            if not isinstance( link, CloudLink ):
+                link.stop()
 
-        info( '*** Stopping %i controllers\n' % len( self.controllers ) )
-        for controller in self.controllers:
-            info( controller.name + ' ' )
-            controller.stop()
+        info( '*** Destroying %i containers and %i links\n' % (
+              len( containers ), len( self.links ) ) )
+        with self.tracer.span( 'teardown', 'stop' ):
+            self.destroyContainers( containers, masterNodes=nodes )
         info( '\n' )
-       
-        info( '*** cleaning master\n' )
-        # XXX DSA need to find something nicer
-        for node in self.hosts + self.switches + self.controllers:
-            _info ("wait {} ".format( node ))
-            node.targetSshWaitOutput()
-            for device in node.devicesMaster:
-                _info ("delete device {} on master ".format(device))
-                self.masterSsh.cmd("ip link delete {} ".format(device))
-            _info ("\n")
-        _info ("\n")
-        self.loop.stop()
+        if self.trace:
+            info( '*** Saving deployment trace in %s\n' %
+                  ', '.join( self.tracer.save( self.trace ) ) )
+        self.closeConnections()
         info( '\n*** Done\n' )
 
+    def closeConnections( self ):
+        "Close the SSH connections with the targets and stop the loop"
+        self.loop.call_soon_threadsafe(self.targetPool.close)
+        self.loop.call_soon_threadsafe(BastionManager.closeAll, self.loop)
+        self.loop.stop()
+
+    # == Manifest =============================================================
+    def manifest( self ):
+        """Return the deployment manifest: what is needed to reconnect to
+           the emulation without recreating anything (see attach)"""
+        containers = [ ( node, 'host' ) for node in self.hosts ] + [
+                     ( node, 'switch' ) for node in self.switches ]
+        return {
+            'version': MANIFEST_VERSION,
+            'master': self.masterhost, 'jump': self.jump, 'user': self.user,
+            'ipBase': self.ipBase, 'adminIpBase': self.adminIpBase,
+            'nextIP': self.nextIP, 'adminNextIP': self.adminNextIP,
+            'nextLinkId': CloudLink.nextLinkId, 'intfNum': lastIntfNum(),
+            'adminTargets': sorted( LxcNode.connectedToAdminNetwork ),
+            'nodes': [ nodeEntry( node, kind ) for node, kind in containers
+                       if isinstance( node, LxcNode ) ],
+            'links': [ linkEntry( link ) for link in self.links
+                       if isinstance( link, CloudLink ) ],
+            'controllers': [ { 'name': c.name, 'ip': c.ip, 'port': c.port }
+                             for c in self.controllers
+                             if not isinstance( c, LxcNode ) ] }
+
+    def saveManifest( self, path=None ):
+        """Write the deployment manifest
+           path: JSON file (default: the manifest parameter)
+           returns: path of the file"""
+        return saveManifest( self.manifest(), path or self.manifestPath )
+
+    @classmethod
+    def attach( cls, manifest, **params ):
+        """Reconnect to an emulation deployed by another Distrinet (e.g., a
+           previous run of an experiment script) from its manifest, without
+           recreating anything: the shells of all the nodes are started in
+           parallel and the network is ready to use (no build or start).
+           Call detach() to leave it running, stop() to destroy it.
+           manifest: path of the manifest (or manifest dict)
+           params: Distrinet parameters (e.g., client_keys, controller),
+                   the master, jump host, user and IP bases default to
+                   the ones of the manifest
+           returns: Distrinet object"""
+        path = None
+        if isinstance( manifest, BaseString ):
+            path, manifest = manifest, loadManifest( manifest )
+        defaults = { 'master': manifest[ 'master' ],
+                     'jump': manifest[ 'jump' ],
+                     'user': manifest[ 'user' ],
+                     'ipBase': manifest[ 'ipBase' ],
+                     'adminIpBase': manifest[ 'adminIpBase' ],
+                     'manifest': path }
+        defaults.update( params )
+        net = cls( topo=None, build=False, **defaults )
+        with net.tracer.span( 'attach', 'build' ):
+            net.attachManifest( manifest )
+        return net
+
+    def attachManifest( self, manifest ):
+        """Recreate the nodes, links and controllers of manifest and start
+           the shells of the nodes
+           manifest: deployment manifest (see manifest)"""
+        self.nextIP = max( self.nextIP, manifest[ 'nextIP' ] )
+        self.adminNextIP = max( self.adminNextIP, manifest[ 'adminNextIP' ] )
+        CloudLink.nextLinkId = max( CloudLink.nextLinkId,
+                                    manifest[ 'nextLinkId' ] )
+        resumeIntfNames( manifest[ 'intfNum' ] )
+        LxcNode.connectedToAdminNetwork.update(
+            { target: True for target in manifest[ 'adminTargets' ] } )
+
+        info( '*** Attaching to %i nodes\n' % len( manifest[ 'nodes' ] ) )
+        nodes = [ self.attachNode( entry ) for entry in manifest[ 'nodes' ] ]
+
+        async def startNodes():
+            semaphore = asyncio.Semaphore( self.deployParallelism )
+            run = self._newRun( 'attach' )
+
+            async def startNode( node ):
+                async with semaphore:
+                    await self._startNode( node, run )
+
+            await self._wait( [ node.connectTarget() for node in nodes ] )
+            await asyncio.gather( *[ startNode( node ) for node in nodes ] )
+
+        asyncio.run_coroutine_threadsafe( startNodes(), self.loop ).result()
+
+        for entry in manifest[ 'links' ]:
+            self.attachLink( entry )
+        if self.controller:
+            for entry in manifest[ 'controllers' ]:
+                self.addController( entry[ 'name' ], ip=entry[ 'ip' ],
+                                    port=entry[ 'port' ] )
+        self.built = True
+
+    def attachNode( self, entry ):
+        """Create the object of a node whose container already runs
+           entry: manifest entry of the node
+           returns: node"""
+        params = dict( entry[ 'params' ] )
+        if entry[ 'kind' ] == 'switch':
+            cls, nodes = self.switch, self.switches
+            params.update( dpid=entry[ 'dpid' ], opts=entry[ 'opts' ],
+                           listenPort=entry[ 'listenPort' ] )
+        else:
+            cls, nodes = self.host, self.hosts
+        node = cls( name=entry[ 'name' ], admin_ip=entry[ 'admin_ip' ],
+                    target=entry[ 'target' ], loop=self.loop,
+                    master=self.masterSsh, username=self.user,
+                    bastion=self.jump, client_keys=self.client_keys,
+                    pool=self.targetPool, resolver=self.resolver,
+                    waitStart=False, **params )
+        node.devices = list( entry[ 'devices' ] )
+        node.devicesMaster = list( entry[ 'devicesMaster' ] )
+        node.containerInterfaces.update( entry[ 'containerInterfaces' ] )
+        nodes.append( node )
+        self.nameToNode[ node.name ] = node
+        return node
+
+    def attachLink( self, entry ):
+        """Create the object of a link that already exists
+           entry: manifest entry of the link
+           returns: link"""
+        intf1, intf2 = entry[ 'intf1' ], entry[ 'intf2' ]
+        link = self.link( node1=self[ entry[ 'node1' ] ],
+                          node2=self[ entry[ 'node2' ] ],
+                          intfName1=intf1[ 'name' ], intfName2=intf2[ 'name' ],
+                          addr1=intf1[ 'mac' ], addr2=intf2[ 'mac' ],
+                          intf=self.intf,
+                          params1=dict( intf1[ 'params' ], port=intf1[ 'port' ] ),
+                          params2=dict( intf2[ 'params' ], port=intf2[ 'port' ] ),
+                          bridges=( entry[ 'bridge1' ], entry[ 'bridge2' ] ),
+                          linkId=entry[ 'linkId' ] )
+        for intf, saved in ( ( link.intf1, intf1 ), ( link.intf2, intf2 ) ):
+            intf.ip, intf.prefixLen = saved[ 'ip' ], saved[ 'prefixLen' ]
+        self.links.append( link )
+        return link
+
+    def detach( self ):
+        """Disconnect from the emulation and leave it running, to attach to
+           it later (the manifest is updated first if there is one)"""
+        if self.manifestPath:
+            info( '*** Saving deployment manifest in %s\n' %
+                  self.saveManifest() )
+        for node in self.hosts + self.switches + self.controllers:
+            if isinstance( node, LxcNode ):
+                node.release()
+        self.closeConnections()
+        info( '*** Detached\n' )
+
+    # == Incremental redeployment =============================================
+    # interface parameters applied with tc and ethtool (see TCIntf.config)
+    TC_PARAMS = ( 'bw', 'delay', 'jitter', 'loss', 'max_queue_size',
+                  'speedup', 'use_hfsc', 'use_tbf', 'latency_ms',
+                  'enable_ecn', 'enable_red', 'gro', 'txo', 'rxo' )
+    # node parameters that can be changed in a running container
+    LIVE_PARAMS = { 'cpu': 'limits.cpu', 'memory': 'limits.memory' }
+
+    @classmethod
+    def tcParams( cls, params ):
+        "Return the tc parameters set in params"
+        return { k: v for k, v in params.items()
+                 if k in cls.TC_PARAMS and v is not None }
+
+    @classmethod
+    def topoTcParams( cls, info ):
+        """Return the tc parameters of both interfaces of a topology link
+           info: link info (see Topo.links)"""
+        params = []
+        for side in ( 'params1', 'params2' ):
+            p = { k: v for k, v in info.items()
+                  if k not in ( 'params1', 'params2' ) }
+            p.update( info.get( side ) or {} )
+            params.append( cls.tcParams( p ) )
+        return tuple( params )
+
+    @staticmethod
+    def _linkKeys( pairs ):
+        """Identify links by their endpoints and their rank among the links
+           between the same endpoints
+           pairs: (node1, node2) of each link
+           returns: list of (node1, node2, rank)"""
+        ranks = {}
+        keys = []
+        for pair in pairs:
+            rank = ranks.get( pair, 0 )
+            ranks[ pair ] = rank + 1
+            keys.append( pair + ( rank, ) )
+        return keys
+
+    def diffTopo( self, topo ):
+        """Compare topo with the running network
+           topo: Topo object
+           returns: dict of
+             delNodes: nodes to destroy (removed or with a new image)
+             addNodes: names of the nodes to add
+             updateNodes: (node, {param: value}) of the nodes whose cpu or
+                          memory limits changed
+             delLinks: links to remove (removed or with a removed end)
+             addLinks: info of the links to add
+             updateLinks: (link, tc params 1, tc params 2) of the links
+                          whose parameters changed"""
+        current = { node.name: node for node in self.hosts + self.switches
+                    if isinstance( node, LxcNode ) }
+        wanted = dict( [ ( name, False ) for name in topo.hosts() ] +
+                       [ ( name, True ) for name in topo.switches() ] )
+
+        # a node changing of kind or image is destroyed and created again
+        replaced = set( name for name, node in current.items()
+                        if name in wanted and (
+                            wanted[ name ] != ( node in self.switches ) or
+                            topo.nodeInfo( name ).get( 'image' ) != node.image ) )
+        delNodes = [ node for name, node in current.items()
+                     if name not in wanted or name in replaced ]
+        addNodes = [ name for name in wanted
+                     if name not in current or name in replaced ]
+        updateNodes = []
+        for name, node in current.items():
+            if name in wanted and name not in replaced:
+                nodeInfo = topo.nodeInfo( name )
+                changes = { param: nodeInfo.get( param )
+                            for param in self.LIVE_PARAMS
+                            if nodeInfo.get( param ) != getattr( node, param ) }
+                if changes:
+                    updateNodes.append( ( node, changes ) )
+
+        gone = set( node.name for node in delNodes )
+        links = [ link for link in self.links if isinstance( link, CloudLink ) ]
+        currentLinks = dict( zip( self._linkKeys(
+            [ ( link.intf1.node.name, link.intf2.node.name )
+              for link in links ] ), links ) )
+        infos = [ info for _src, _dst, info in topo.links( sort=True,
+                                                            withInfo=True ) ]
+        wantedLinks = dict( zip( self._linkKeys(
+            [ ( info[ 'node1' ], info[ 'node2' ] ) for info in infos ] ),
+            infos ) )
+        broken = set( key for key in currentLinks
+                      if key[ 0 ] in gone or key[ 1 ] in gone )
+        delLinks = [ link for key, link in currentLinks.items()
+                     if key not in wantedLinks or key in broken ]
+        addLinks = [ info for key, info in wantedLinks.items()
+                     if key not in currentLinks or key in broken ]
+        updateLinks = []
+        for key, link in currentLinks.items():
+            if key in wantedLinks and key not in broken:
+                tc1, tc2 = self.topoTcParams( wantedLinks[ key ] )
+                if ( tc1 != self.tcParams( link.intf1.params ) or
+                     tc2 != self.tcParams( link.intf2.params ) ):
+                    updateLinks.append( ( link, tc1, tc2 ) )
+
+        return { 'delNodes': delNodes, 'addNodes': addNodes,
+                 'updateNodes': updateNodes, 'delLinks': delLinks,
+                 'addLinks': addLinks, 'updateLinks': updateLinks }
+
+    def _sendScripts( self, scripts ):
+        """Run the commands of each target with one script per target, the
+           targets running their script in parallel
+           scripts: dict of (ASsh, [cmds]) per target"""
+        wait_all( [ ssh.sendScript( '\n'.join( cmds ) + '\n' )
+                    for ssh, cmds in scripts.values() if cmds ] )
+
+    def removeLinks( self, links, destroyed=() ):
+        """Remove links and their devices with one script per target
+           links: CloudLinks to remove
+           destroyed: nodes whose container is destroyed afterwards"""
+        scripts = {}
+        for link in links:
+            for intf in ( link.intf1, link.intf2 ):
+                node = intf.node
+                alive = node not in destroyed
+                if alive and node in self.switches and hasattr( node, 'detach' ):
+                    node.detach( intf )
+                cmds = node.removeContainerLinkCommandList( link, intf,
+                                                            detach=alive )
+                scripts.setdefault( node.target,
+                                    ( node.targetSsh, [] ) )[ 1 ].extend( cmds )
+            self.links.remove( link )
+        self._sendScripts( scripts )
+
+    def removeNodes( self, nodes ):
+        """Destroy the containers of nodes, whose links must have been
+           removed. The devices connecting a target to the admin network
+           are handed over to another node of the target, if any.
+           nodes: LxcNodes to destroy"""
+        gone = set( nodes )
+        for node in nodes:
+            if not node.devicesMaster:
+                continue
+            heirs = [ n for n in self.hosts + self.switches
+                      if isinstance( n, LxcNode ) and n.target == node.target
+                      and n not in gone ]
+            if heirs:
+                heirs[ 0 ].devices.extend( node.devices )
+                heirs[ 0 ].devicesMaster.extend( node.devicesMaster )
+                node.devices, node.devicesMaster = [], []
+            else:
+                LxcNode.connectedToAdminNetwork.pop( node.target, None )
+        self.destroyContainers( nodes )
+        for node in nodes:
+            if node in self.switches:
+                self.switches.remove( node )
+            else:
+                self.hosts.remove( node )
+            del self.nameToNode[ node.name ]
+
+    def updateNodes( self, updates ):
+        """Change the limits of running containers with one script per
+           target
+           updates: (node, {param: value}) for each node (see LIVE_PARAMS)"""
+        scripts = {}
+        for node, changes in updates:
+            cmds = scripts.setdefault( node.target, ( node.targetSsh, [] ) )[ 1 ]
+            for param, value in changes.items():
+                key = self.LIVE_PARAMS[ param ]
+                if value is None:
+                    cmds.append( 'lxc config unset %s %s' % ( node.name, key ) )
+                else:
+                    cmds.append( 'lxc config set %s %s %s' % (
+                                 node.name, key, value ) )
+                setattr( node, param, value )
+                node.params[ param ] = value
+        self._sendScripts( scripts )
+
+    def updateLinks( self, updates ):
+        """Apply new tc parameters to links, the interfaces of different
+           nodes being configured in parallel
+           updates: (link, tc params 1, tc params 2) for each link"""
+        intfs = {}
+        for link, tc1, tc2 in updates:
+            intfs.setdefault( link.intf1.node, [] ).append( ( link.intf1, tc1 ) )
+            intfs.setdefault( link.intf2.node, [] ).append( ( link.intf2, tc2 ) )
+
+        def configure( items ):
+            for intf, tc in items:
+                params = { k: v for k, v in intf.params.items()
+                           if k not in self.TC_PARAMS }
+                params.update( tc )
+                shaped = [ k for k in ( 'bw', 'delay', 'loss', 'max_queue_size' )
+                           if k in tc ]
+                if not shaped and hasattr( intf, 'tc' ):
+                    # TCIntf.config leaves the former shaping in place
+                    intf.tc( '%s qdisc del dev %s root' )
+                intf.params = params
+                intf.config( **params )
+
+        if intfs:
+            with ThreadPoolExecutor( max_workers=self.deployParallelism ) as pool:
+                list( pool.map( configure, intfs.values() ) )
+
+    def reconcile( self, topo, places=None ):
+        """Apply the differences between topo and the running network (see
+           diffTopo), only touching the affected nodes, links and targets:
+           removed links, removed nodes, new limits of the nodes, new nodes
+           (through the deployment pipeline), new links and new link
+           parameters, the work of each phase being done by all the targets
+           in parallel.
+           topo: new Topo object
+           places: target of each new node (optional if the mapper or the
+                   node info of topo gives it)
+           returns: the differences (see diffTopo)"""
+        start = time.monotonic()
+        diff = self.diffTopo( topo )
+        places = places or {}
+
+        # check that the new nodes can be placed before touching anything
+        targets = {}
+        for name in diff[ 'addNodes' ]:
+            target = places.get( name, topo.nodeInfo( name ).get( 'target' ) )
+            if target is None and self.mapper:
+                target = self.mapper.places.get( name )
+            if target is None:
+                raise Exception( 'No target for the new node %s' % name )
+            targets[ name ] = target
+
+        with self.tracer.span( 'removeLinks', 'reconcile',
+                               links=len( diff[ 'delLinks' ] ) ):
+            self.removeLinks( diff[ 'delLinks' ], destroyed=diff[ 'delNodes' ] )
+        if diff[ 'delNodes' ]:
+            with self.tracer.span( 'removeNodes', 'reconcile',
+                                   nodes=len( diff[ 'delNodes' ] ) ):
+                self.removeNodes( diff[ 'delNodes' ] )
+        with self.tracer.span( 'updateNodes', 'reconcile',
+                               nodes=len( diff[ 'updateNodes' ] ) ):
+            self.updateNodes( diff[ 'updateNodes' ] )
+
+        self.topo = topo
+        added = []
+        for name in diff[ 'addNodes' ]:
+            if self.mapper:
+                self.mapper.places[ name ] = targets[ name ]
+            added.append( self.addTopoNode( topo, name,
+                                            switch=name in topo.switches(),
+                                            target=targets[ name ] ) )
+        if added:
+            with self.tracer.span( 'deployNodes', 'reconcile',
+                                   nodes=len( added ) ):
+                self.deployNodes( added, cat='reconcile' )
+
+        links = []
+        for linkInfo in diff[ 'addLinks' ]:
+            params = dict( linkInfo )
+            # the ports of the new topology may be used by existing links
+            for side in ( '1', '2' ):
+                if params.get( 'port' + side ) in self[ params[ 'node' + side ] ].intfs:
+                    params.pop( 'port' + side )
+            links.append( params )
+        if links:
+            with self.tracer.span( 'addLinks', 'reconcile', links=len( links ) ):
+                for link in self.addLinks( links ):
+                    for intf in ( link.intf1, link.intf2 ):
+                        node = intf.node
+                        if ( node in self.switches and node not in added and
+                             hasattr( node, 'attach' ) ):
+                            node.attach( intf )
+        for node in added:
+            if node in self.switches:
+                node.start( self.controllers )
+                node.batchStartup( [ node ] )
+            elif node.defaultIntf():
+                node.configDefault()
+            else:
+                node.configDefault( ip=None, mac=None )
+
+        with self.tracer.span( 'updateLinks', 'reconcile',
+                               links=len( diff[ 'updateLinks' ] ) ):
+            self.updateLinks( diff[ 'updateLinks' ] )
+
+        if self.manifestPath:
+            self.saveManifest()
+        info( '*** Reconciled in %.3f s: nodes +%i -%i ~%i, '
+              'links +%i -%i ~%i\n' % (
+              time.monotonic() - start, len( diff[ 'addNodes' ] ),
+              len( diff[ 'delNodes' ] ), len( diff[ 'updateNodes' ] ),
+              len( diff[ 'addLinks' ] ), len( diff[ 'delLinks' ] ),
+              len( diff[ 'updateLinks' ] ) ) )
+        return diff
+
+    # == Commands on many nodes ===============================================
+    def runAll( self, cmd, nodes=None, timeout=None ):
+        """Run a command on many nodes at the same time, each in its own SSH
+           channel (see LxcNode.arun), and wait for all of them.
+           cmd: command (string) or function returning the command to run
+                on the node it is given
+           nodes: nodes or node names (default: all hosts and switches)
+           timeout: maximum seconds per command (None: no limit)
+           returns: dict of (out, err, exitcode) per node name, a command
+                    that failed has exitcode None and the error in err"""
+        if nodes is None:
+            nodes = self.hosts + self.switches
+        nodes = [ self[ n ] if isinstance( n, BaseString ) else n
+                  for n in nodes ]
+
+        async def runNode( node ):
+            command = cmd( node ) if callable( cmd ) else cmd
+            try:
+                return await node.arun( command, timeout=timeout )
+            except asyncio.TimeoutError:
+                return '', 'timeout after %s s' % timeout, None
+            except Exception as e:  # pylint: disable=broad-except
+                return '', str( e ), None
+
+        async def runNodes():
+            return await asyncio.gather( *[ runNode( node )
+                                            for node in nodes ] )
+
+        results = asyncio.run_coroutine_threadsafe( runNodes(),
+                                                    self.loop ).result()
+        for node, ( _out, err, exitcode ) in zip( nodes, results ):
+            if exitcode is None:
+                error( '*** %s: %s\n' % ( node.name, err ) )
+        return { node.name: result for node, result in zip( nodes, results ) }
+
+    run_all = runAll
+
+    async def stream( self, cmd, hosts=None, maxQueue=1024, rate=None ):
+        """Run a command on many hosts, each in its own SSH channel (see
+           LxcNode.alines), and yield (host, line) as the lines arrive from
+           any of them, until all the commands terminate. Must be iterated
+           in the asyncio loop of the network (see monitorStream otherwise).
+           cmd: command (string) or function returning the command to run
+                on the host it is given
+           hosts: hosts or host names (default: all hosts)
+           maxQueue: maximum lines waiting to be consumed; when reached,
+                     the channels are not read anymore until the consumer
+                     catches up (backpressure)
+           rate: maximum lines per second read from each host (None: no
+                 limit)"""
+        if hosts is None:
+            hosts = self.hosts
+        hosts = [ self[ h ] if isinstance( h, BaseString ) else h
+                  for h in hosts ]
+        queue = asyncio.Queue( maxQueue )
+
+        async def pump( host ):
+            "Copy the lines of host into the queue"
+            command = cmd( host ) if callable( cmd ) else cmd
+            lines = host.alines( command )
+            nextLine = time.monotonic()
+            try:
+                async for line in lines:
+                    await queue.put( ( host, line ) )
+                    if rate:
+                        nextLine = max( nextLine + 1.0 / rate,
+                                        time.monotonic() )
+                        await asyncio.sleep( nextLine - time.monotonic() )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:  # pylint: disable=broad-except
+                error( '*** %s: %s\n' % ( host.name, e ) )
+            finally:
+                # close the channel now, even when cancelled
+                await lines.aclose()
+            await queue.put( ( host, None ) )
+
+        tasks = [ asyncio.ensure_future( pump( host ) ) for host in hosts ]
+        running = len( tasks )
+        try:
+            while running:
+                host, line = await queue.get()
+                if line is None:
+                    running -= 1
+                else:
+                    yield host, line
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def monitorStream( self, cmd, hosts=None, **kwargs ):
+        """Blocking generator over stream(), to be used outside of the
+           asyncio loop (e.g., from the CLI or a script).
+           cmd, hosts, kwargs: see stream()
+           yields: (host, line)"""
+        lines = self.stream( cmd, hosts=hosts, **kwargs )
+        try:
+            while True:
+                try:
+                    yield asyncio.run_coroutine_threadsafe(
+                        lines.__anext__(), self.loop ).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            asyncio.run_coroutine_threadsafe( lines.aclose(),
+                                              self.loop ).result()
+
+    # == Reachability =========================================================
+    # one line per destination, with fping or with ping when fping is missing
+    pingScript = ( 'if command -v fping > /dev/null 2>&1; then '
+                   'fping -q -c1 -t {ms} {ips} 2>&1; '
+                   'else for ip in {ips}; do '
+                   '( if ping -c1 {opts} $ip > /dev/null 2>&1; '
+                   'then r=1; else r=0; fi; '
+                   'echo "$ip : xmt/rcv/%loss = 1/$r/" ) & '
+                   'done; wait; fi' )
+
+    @staticmethod
+    def _parsePingBatch( pingOutput ):
+        """Parse the output of a ping batch
+           returns: dict of (sent, received) per destination IP"""
+        results = {}
+        r = r'^(\S+)\s*: xmt/rcv/%loss = (\d+)/(\d+)/'
+        for m in re.finditer( r, pingOutput, re.MULTILINE ):
+            results[ m.group( 1 ) ] = ( int( m.group( 2 ) ),
+                                        int( m.group( 3 ) ) )
+        return results
+
+    def pingMatrix( self, hosts=None, timeout=None ):
+        """Ping between all specified hosts: each host pings all the others
+           with a single batch (fping if available), all hosts at the same
+           time.
+           hosts: list of hosts (default: all hosts)
+           timeout: time to wait for a response, as string (seconds)
+           returns: dict of dict of (sent, received) per source and
+                    destination names"""
+        if not hosts:
+            hosts = self.hosts
+        dests = [ dest for dest in hosts if dest.intfs ]
+        ips = sorted( set( dest.IP() for dest in dests ) )
+        opts = '-W %s' % timeout if timeout else ''
+        ms = int( float( timeout ) * 1000 ) if timeout else 1000
+
+        def pingCmd( node ):
+            "Ping all the destinations but node itself"
+            others = [ ip for ip in ips if ip != node.IP() ]
+            return self.pingScript.format( ms=ms, opts=opts,
+                                           ips=' '.join( others ) )
+
+        sources = [ node for node in hosts if node.intfs ]
+        results = self.runAll( pingCmd, nodes=sources ) if ips else {}
+        matrix = {}
+        for node in hosts:
+            parsed = self._parsePingBatch( results.get( node.name,
+                                                        ( '', ) )[ 0 ] )
+            matrix[ node.name ] = {}
+            for dest in hosts:
+                if node != dest:
+                    matrix[ node.name ][ dest.name ] = parsed.get(
+                        dest.IP(), ( 0, 0 ) ) if dest.intfs else ( 0, 0 )
+        return matrix
+
+    def ping( self, hosts=None, timeout=None ):
+        """Ping between all specified hosts, all sources at the same time
+           (see pingMatrix); the matrix is kept in pingResults.
+           hosts: list of hosts
+           timeout: time to wait for a response, as string
+           returns: ploss packet loss percentage"""
+        packets = 0
+        lost = 0
+        ploss = None
+        if not hosts:
+            hosts = self.hosts
+            output( '*** Ping: testing ping reachability\n' )
+        self.pingResults = self.pingMatrix( hosts, timeout=timeout )
+        for node in hosts:
+            output( '%s -> ' % node.name )
+            for dest in hosts:
+                if node != dest:
+                    sent, received = self.pingResults[ node.name ][ dest.name ]
+                    packets += sent
+                    lost += sent - received
+                    output( ( '%s ' % dest.name ) if received else 'X ' )
+            output( '\n' )
+        if packets > 0:
+            ploss = 100.0 * lost / packets
+            received = packets - lost
+            output( "*** Results: %i%% dropped (%d/%d received)\n" %
+                    ( ploss, received, packets ) )
+        else:
+            ploss = 0
+            output( "*** Warning: No packets sent\n" )
+        return ploss
+
+    # == Traffic matrix =======================================================
+    def linkAdjacency( self ):
+        "Return the set of neighbor names of each node, from the links"
+        adjacency = {}
+        for link in self.links:
+            n1, n2 = link.intf1.node.name, link.intf2.node.name
+            adjacency.setdefault( n1, set() ).add( n2 )
+            adjacency.setdefault( n2, set() ).add( n1 )
+        return adjacency
+
+    def iperfMatrix( self, flows, udp=False, port=5201, timeout=None ):
+        """Run many iperf3 flows at the same time: all the servers are
+           started first (one command per destination), then all the
+           clients (one command per source) and the JSON reports of the
+           sources are collected concurrently. The servers left (i.e., whose
+           client failed) are stopped at the end.
+           flows: list of (src, dst, rate, duration), src and dst being
+                  nodes or names, rate an iperf3 bandwidth (e.g., '10M',
+                  None for unlimited TCP) and duration in seconds
+           udp: UDP flows instead of TCP ones
+           port: first server port on each destination
+           timeout: maximum seconds for the commands of a host (default:
+                    longest duration + 30)
+           returns: dict with
+                    flows: per flow dict (src, dst, rate, duration, bps,
+                           error)
+                    links: per link dict (node1, node2, bw in Mbps, bps
+                           in each direction, utilization of the most
+                           loaded direction, None if bw is unknown)"""
+        flows = [ ( self[ src ] if isinstance( src, BaseString ) else src,
+                    self[ dst ] if isinstance( dst, BaseString ) else dst,
+                    rate, duration ) for src, dst, rate, duration in flows ]
+        if timeout is None:
+            timeout = max( [ f[ 3 ] for f in flows ] + [ 0 ] ) + 30
+
+        # one port per flow on its destination
+        serverPorts = {}
+        clientFlows = {}
+        for index, ( src, dst, rate, duration ) in enumerate( flows ):
+            ports = serverPorts.setdefault( dst, [] )
+            ports.append( port + len( ports ) )
+            clientFlows.setdefault( src, [] ).append(
+                ( index, dst.IP(), ports[ -1 ], rate, duration, udp ) )
+
+        info( '*** Starting %i iperf3 servers on %i hosts\n' % (
+              len( flows ), len( serverPorts ) ) )
+        try:
+            self.runAll( lambda node: serverScript( serverPorts[ node ] ),
+                         nodes=list( serverPorts ), timeout=timeout )
+            info( '*** Running %i iperf3 clients on %i hosts\n' % (
+                  len( flows ), len( clientFlows ) ) )
+            outputs = self.runAll(
+                lambda node: clientScript( clientFlows[ node ] ),
+                nodes=list( clientFlows ), timeout=timeout )
+        finally:
+            # the servers of the failed clients still wait for them
+            self.runAll( lambda node: stopServerScript( serverPorts[ node ] ),
+                         nodes=list( serverPorts ), timeout=timeout )
+
+        reports = {}
+        for out, _err, _exitcode in outputs.values():
+            reports.update( parseClientOutput( out ) )
+        results = []
+        for index, ( src, dst, rate, duration ) in enumerate( flows ):
+            bps, err = flowThroughput( reports.get( index ), udp=udp )
+            results.append( { 'src': src.name, 'dst': dst.name,
+                              'rate': rate, 'duration': duration,
+                              'bps': bps, 'error': err } )
+
+        loads = linkLoads( self.linkAdjacency(),
+                           [ ( r[ 'src' ], r[ 'dst' ], r[ 'bps' ] )
+                             for r in results ] )
+        links = []
+        for link in self.links:
+            n1, n2 = link.intf1.node.name, link.intf2.node.name
+            bw = getattr( link.intf1, 'params', {} ).get( 'bw' )
+            bps1 = loads.get( ( n1, n2 ), 0.0 )
+            bps2 = loads.get( ( n2, n1 ), 0.0 )
+            utilization = max( bps1, bps2 ) / ( bw * 1e6 ) if bw else None
+            links.append( { 'node1': n1, 'node2': n2, 'bw': bw,
+                            'bps1': bps1, 'bps2': bps2,
+                            'utilization': utilization } )
+
+        output( '*** Results: %i flows, %i failed, %.3f Mbits/sec in total\n' % (
+                len( results ), len( [ r for r in results if r[ 'error' ] ] ),
+                sum( r[ 'bps' ] for r in results ) / 1e6 ) )
+        for r in results:
+            output( '    %s -> %s: %.3f Mbits/sec%s\n' % (
+                    r[ 'src' ], r[ 'dst' ], r[ 'bps' ] / 1e6,
+                    ' (%s)' % r[ 'error' ] if r[ 'error' ] else '' ) )
+        return { 'flows': results, 'links': links }
+
     # XXX These test methods should be moved out of this class.
     # Probably we should create a tests.py for them
 
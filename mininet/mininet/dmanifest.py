@@ -0,0 +1,99 @@
+"""
+Deployment manifest of a Distrinet emulation
+
+The manifest records everything needed to reconnect to an emulation that is
+already deployed without recreating anything: where each container runs,
+its admin IP address, the devices made for it on its target and on the
+master, the bridges and VXLAN ids of the links and the counters used to
+name new devices. It is written as JSON.
+"""
+import json
+import os
+
+from mininet.util import writeJson
+
+# version of the manifest format
+MANIFEST_VERSION = 1
+
+def jsonParams(params):
+    """
+    Returns the parameters of `params` that can be written in JSON (e.g.,
+    image, cpu, ip, bw), the others (e.g., classes, functions) are dropped
+    """
+    kept = {}
+    for key, value in params.items():
+        try:
+            json.dumps(value)
+        except (TypeError, ValueError):
+            continue
+        kept[key] = value
+    return kept
+
+def nodeEntry(node, kind):
+    """
+    Returns the manifest entry of `node`
+
+    Parameters
+    ----------
+    node : LxcNode
+        node to record
+    kind : str
+        "host" or "switch"
+    """
+    entry = {"name": node.name, "kind": kind,
+             "target": node.target, "admin_ip": node.admin_ip,
+             "params": jsonParams(node.params),
+             "devices": list(node.devices or []),
+             "devicesMaster": list(node.devicesMaster or []),
+             "containerInterfaces": dict(node.containerInterfaces)}
+    if kind == "switch":
+        entry.update({"dpid": node.dpid, "opts": node.opts,
+                      "listenPort": node.listenPort})
+    return entry
+
+def intfEntry(intf):
+    """
+    Returns the manifest entry of the interface `intf` of a link
+    """
+    return {"name": intf.name, "port": intf.node.ports[intf], "mac": intf.mac,
+            "ip": intf.ip, "prefixLen": intf.prefixLen,
+            "params": jsonParams(intf.params)}
+
+def linkEntry(link):
+    """
+    Returns the manifest entry of the CloudLink `link`
+    """
+    node1, node2 = link.intf1.node, link.intf2.node
+    return {"node1": node1.name, "node2": node2.name,
+            "intf1": intfEntry(link.intf1), "intf2": intfEntry(link.intf2),
+            "bridge1": node1.containerInterfaces.get(link.intf1.name),
+            "bridge2": node2.containerInterfaces.get(link.intf2.name),
+            "linkId": link.linkId}
+
+def saveManifest(manifest, path):
+    """
+    Writes `manifest` in the JSON file `path`
+
+    Returns
+    -------
+    str
+        path of the file
+    """
+    path = os.path.expanduser(path)
+    writeJson(path, manifest, indent=1)
+    return path
+
+def loadManifest(path):
+    """
+    Reads the manifest written in `path`
+
+    Raises
+    ------
+    ValueError
+        the file is not a manifest of a supported version
+    """
+    with open(os.path.expanduser(path), "r") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError("{}: unsupported manifest version {}".format(path, manifest.get("version")))
+    return manifest
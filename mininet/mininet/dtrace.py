@@ -0,0 +1,126 @@
+"""
+Deployment tracing for Distrinet
+
+Every phase of a deployment (per node, per target, per link) is recorded as a
+span with monotonic timestamps. Spans can be exported as JSON or in the Chrome
+trace event format (open it with chrome://tracing or https://ui.perfetto.dev).
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+class Tracer(object):
+    """
+    Records spans of the deployment
+
+    Attributes
+    ----------
+    origin : float
+        monotonic time at which the tracer was created, spans are relative
+        to it
+    spans : list
+        recorded spans as dicts with keys name, cat, key, start, end (in
+        seconds since `origin`) and args
+    """
+
+    def __init__(self):
+        self.origin = time.monotonic()
+        self.wallOrigin = time.time()
+        self.spans = []
+
+    def now(self):
+        """
+        Returns the number of seconds since the creation of the tracer
+        """
+        return time.monotonic() - self.origin
+
+    def add(self, name, cat, key, start, end, **args):
+        """
+        Records a span
+
+        Parameters
+        ----------
+        name : str
+            name of the phase (e.g., createContainer)
+        cat : str
+            category of the phase (e.g., build, link, start, stop)
+        key : str
+            what the phase applies to (node, target or link name)
+        start : float
+            beginning of the span, in seconds since `origin`
+        end : float
+            end of the span, in seconds since `origin`
+        args : dict
+            additional information about the span
+        """
+        self.spans.append({"name": name, "cat": cat, "key": key,
+                           "start": start, "end": end, "args": args})
+
+    @contextmanager
+    def span(self, name, cat, key=None, **args):
+        """
+        Context manager recording a span for the duration of its block
+        """
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add(name, cat, key, start, self.now(), **args)
+
+    def durations(self, cat=None, **args):
+        """
+        Returns the duration of the spans of category `cat` (all categories
+        if None) whose args include `args` (e.g., run=2), as {name: {key:
+        duration}}
+        """
+        durations = {}
+        for span in self.spans:
+            if cat is not None and span["cat"] != cat:
+                continue
+            if all(span["args"].get(k) == v for k, v in args.items()):
+                durations.setdefault(span["name"], {})[span["key"]] = span["end"] - span["start"]
+        return durations
+
+    def toJSON(self):
+        """
+        Returns the trace as a JSON serializable dict
+        """
+        return {"origin": self.wallOrigin, "spans": list(self.spans)}
+
+    def toChromeTrace(self):
+        """
+        Returns the trace in the Chrome trace event format, one row per
+        category and key
+        """
+        events = []
+        tids = {}
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            row = (span["cat"], span["key"])
+            if row not in tids:
+                tids[row] = len(tids) + 1
+                events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": tids[row],
+                               "args": {"name": "{} {}".format(span["cat"], span["key"] or "")}})
+            events.append({"ph": "X", "name": span["name"], "cat": span["cat"],
+                           "pid": 1, "tid": tids[row],
+                           "ts": span["start"] * 1e6,
+                           "dur": (span["end"] - span["start"]) * 1e6,
+                           "args": span["args"]})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, prefix):
+        """
+        Writes the trace in `prefix`.json and in the Chrome trace format in
+        `prefix`.trace.json
+
+        Returns
+        -------
+        tuple
+            paths of the JSON file and of the Chrome trace file
+        """
+        prefix = os.path.expanduser(prefix)
+        paths = ("{}.json".format(prefix), "{}.trace.json".format(prefix))
+        for path, trace in zip(paths, (self.toJSON(), self.toChromeTrace())):
+            with open(path, "w") as f:
+                json.dump(trace, f)
+        return paths
@@ -0,0 +1,177 @@
+"""
+Traffic matrices for Distrinet
+
+A traffic matrix is a list of iperf3 flows (src, dst, rate, duration). The
+servers of all the flows are started at once (one command per destination
+host), then the clients (one command per source host, the clients of a
+host running in parallel) and the JSON reports are collected from all the
+sources at the same time. The servers whose client failed are then stopped
+so that they do not hold their port.
+
+The utilization of the links is estimated by spreading the throughput of
+each flow evenly over all the shortest paths between its endpoints (i.e.,
+as ECMP would do in a fat-tree or a spine and leaf topology).
+"""
+import json
+from collections import deque
+
+# marker preceding the JSON report of a flow in the output of a source
+FLOW_MARKER = "### distrinet flow"
+
+def serverScript(ports):
+    """
+    Returns the script starting one single-use iperf3 server daemon per
+    port of `ports`
+    """
+    return ";".join("iperf3 -s -1 -D -p {}".format(port) for port in ports)
+
+def stopServerScript(ports):
+    """
+    Returns the script stopping the iperf3 server daemons of `ports` (the
+    ones started by `serverScript` that did not serve a client)
+    """
+    return ";".join("pkill -f '^iperf3 -s -1 -D -p {}$'".format(port) for port in ports) + "; true"
+
+def clientScript(flows, retries=10):
+    """
+    Returns the script running the iperf3 clients of `flows` in parallel
+    and printing their JSON report, each one preceded by FLOW_MARKER and
+    the index of the flow
+
+    Parameters
+    ----------
+    flows : list
+        (index, destination IP, port, rate, duration, udp) of each flow
+    retries : int
+        number of connection attempts of a client (the server of the flow
+        may not be listening yet)
+    """
+    lines = []
+    for index, ip, port, rate, duration, udp in flows:
+        opts = "-J -c {} -p {} -t {}".format(ip, port, duration)
+        if udp:
+            opts += " -u"
+        if rate:
+            opts += " -b {}".format(rate)
+        out = "/tmp/distrinet-flow-{}.json".format(index)
+        lines.append("( for i in $(seq {}); do iperf3 {} > {} && break; sleep 0.2; done ) &".format(retries, opts, out))
+    lines.append("wait")
+    for index, _ip, _port, _rate, _duration, _udp in flows:
+        out = "/tmp/distrinet-flow-{}.json".format(index)
+        lines.append('echo "{} {}"; cat {}; rm -f {}'.format(FLOW_MARKER, index, out, out))
+    return "\n".join(lines) + "\n"
+
+def parseClientOutput(output):
+    """
+    Splits the output of a client script
+
+    Returns
+    -------
+    dict
+        iperf3 report (dict, None if it cannot be parsed) per flow index
+    """
+    reports = {}
+    for chunk in output.split(FLOW_MARKER)[1:]:
+        header, _, body = chunk.partition("\n")
+        try:
+            reports[int(header.strip())] = json.loads(body)
+        except ValueError:
+            reports[int(header.strip())] = None
+    return reports
+
+def flowThroughput(report, udp=False):
+    """
+    Returns the throughput (bits per second) measured by the iperf3
+    `report` and the error it contains (None if the flow succeeded)
+    """
+    if report is None:
+        return 0.0, "no iperf3 report"
+    if "error" in report:
+        return 0.0, report["error"]
+    end = report.get("end", {})
+    summary = end.get("sum") if udp else end.get("sum_received")
+    if not summary:
+        return 0.0, "no summary in the iperf3 report"
+    return float(summary.get("bits_per_second", 0.0)), None
+
+def _bfs(adjacency, root):
+    """
+    Returns the distance and the number of shortest paths from `root` to
+    each node reachable from `root`
+    """
+    dist = {root: 0}
+    count = {root: 1}
+    queue = deque([root])
+    while queue:
+        node = queue.popleft()
+        for neighbor in adjacency.get(node, ()):
+            if neighbor not in dist:
+                dist[neighbor] = dist[node] + 1
+                count[neighbor] = 0
+                queue.append(neighbor)
+            if dist[neighbor] == dist[node] + 1:
+                count[neighbor] += count[node]
+    return dist, count
+
+def pathFractions(adjacency, src, dst, cache=None):
+    """
+    Returns the fraction of a flow from `src` to `dst` that goes through
+    each directed edge when the flow is spread evenly over all the shortest
+    paths
+
+    Parameters
+    ----------
+    adjacency : dict
+        set of neighbors of each node
+    cache : dict
+        result of the breadth-first searches per root, shared between calls
+        on the same `adjacency` (optional)
+
+    Returns
+    -------
+    dict
+        fraction of the flow per edge (u, v), empty if `dst` is not
+        reachable from `src`
+    """
+    if cache is None:
+        cache = {}
+    for root in (src, dst):
+        if root not in cache:
+            cache[root] = _bfs(adjacency, root)
+    distSrc, countSrc = cache[src]
+    if dst not in distSrc:
+        return {}
+    distDst, countDst = cache[dst]
+    total = countSrc[dst]
+    length = distSrc[dst]
+    fractions = {}
+    for u, du in distSrc.items():
+        for v in adjacency.get(u, ()):
+            if v in distDst and du + 1 + distDst[v] == length:
+                fractions[(u, v)] = countSrc[u] * countDst[v] / total
+    return fractions
+
+def linkLoads(adjacency, flows):
+    """
+    Estimates the load of each directed edge
+
+    Parameters
+    ----------
+    adjacency : dict
+        set of neighbors of each node
+    flows : list
+        (src, dst, bits per second) of each flow
+
+    Returns
+    -------
+    dict
+        bits per second per edge (u, v)
+    """
+    loads = {}
+    cache = {}
+    for src, dst, bps in flows:
+        if not bps:
+            continue
+        for edge, fraction in pathFractions(adjacency, src, dst, cache).items():
+            loads[edge] = loads.get(edge, 0.0) + bps * fraction
+    return loads
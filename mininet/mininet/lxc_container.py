@@ -1,6 +1,5 @@
 import os
 import pty
-import re
 import signal
 import select
 from subprocess import Popen, PIPE
@@ -18,10 +17,14 @@ def info(*args, **kwargs):
 
 ###
 import asyncio
+import asyncssh
+from concurrent.futures import Future
 from threading import Thread
-import time
 
 from mininet.assh import ASsh
+from mininet.resolver import NameResolver
+from mininet.dclean import DISTRINET_TAG
+from mininet.dimage import TEMPLATE_SNAPSHOT
 
 # XXX TODO DSA - make it clean
 # #####################
@@ -31,6 +34,20 @@ def genIntfName():
     intfnum = intfnum + 1
     return "intf{}".format(intfnum)
 
+def lastIntfNum():
+    """
+    Returns the number of the last generated interface name
+    """
+    return intfnum
+
+def resumeIntfNames(num):
+    """
+    Continues the generation of interface names after intf`num` (e.g., when
+    attaching to an emulation that already has these interfaces)
+    """
+    global intfnum
+    intfnum = max(intfnum, num)
+
 from mininet.node import Node
 from mininet.cloudlink import CloudLink
 
@@ -61,6 +78,8 @@ class LxcNode (Node):
         hostname of the bastion (i.e., SSH relay)
     bastion_port : int
         SSH port number of the bastion
+    transport : str
+        "ssh" or "exec", how the node is reached (see the class attribute)
     task : _asyncio.Task
         current task under execution
     waiting : bool
@@ -85,12 +104,28 @@ class LxcNode (Node):
     adminNetworkCreated = False
     connectedToAdminNetwork = {}
 
+    # maximum number of bytes read at a time from the shell
+    readSize = 65536
+
+    # how the shell and the commands of the node reach the container:
+    #   "ssh": SSH connection with the admin IP address of the container
+    #          (through the admin network)
+    #   "exec": `lxc exec` on a connection with the target (no admin
+    #           network, ssh server nor key needed in the container)
+    # can be overridden per node with the "transport" parameter
+    transport = "ssh"
+
+    # maximum number of arun() commands running at the same time on the
+    # connection with a node (sshd accepts 10 sessions per connection by
+    # default and the shell uses one of them)
+    maxChannels = 9
+
     def __init__(self, name, loop,
                        admin_ip,
                        master,
                        target=None, port=22, username=None, pub_id=None,
                        bastion=None, bastion_port=22, client_keys=None,
-                       waitStart=True, inNamespace=False,
+                       pool=None, resolver=None, waitStart=True, inNamespace=False,
                        **params):
         """
         Parameters
@@ -118,16 +153,26 @@ def __init__(self, name, loop,
             SSH port number to use to connect to the bastion (default is 22).
         client_keys : list
             list of private key filenames to use to connect to the host
+        pool : ASshPool
+            pool of SSH connections to share with the other nodes on the
+            same target. If None, the node has its own connection to the
+            target (default is None).
+        resolver : NameResolver
+            cache of the IP address of the LXC machines to share with the
+            other nodes. If None, the node has its own cache (default is
+            None).
         waitStart : bool
             should we block while waiting for the node to be started (default is True)
         """
         # == distrinet
+        # the container is named after the node (set again by Node)
+        self.name = name
         self._preInit(loop=loop,
                    admin_ip=admin_ip,
                    master=master,
                    target=target, port=port, username=username, pub_id=pub_id,
                    bastion=bastion, bastion_port=bastion_port, client_keys=client_keys,
-                   waitStart=waitStart,
+                   pool=pool, resolver=resolver, waitStart=waitStart,
                    **params)
         # =====================================================================
 
@@ -142,7 +187,7 @@ def _preInit(self,
                    master,
                    target=None, port=22, username=None, pub_id=None,
                    bastion=None, bastion_port=22, client_keys=None,
-                   waitStart=True,
+                   pool=None, resolver=None, waitStart=True,
                    **params):
         self.run = True
         # asyncio loop
@@ -166,6 +211,7 @@ def _preInit(self,
         self.admin_ip = admin_ip
 
         self.masternode = master
+        self.resolver = resolver if resolver is not None else NameResolver()
         self.containerInterfaces = {}
         self.containerLinks = {}
 
@@ -173,20 +219,39 @@ def _preInit(self,
         self.image = params.get("image", None)
         self.memory = params.get("memory", None)
         self.cpu = params.get("cpu", None)
+        # template container to copy instead of initialising the image (see
+        # mininet.dimage)
+        self.template = None
 
         # network devices created on the target
         self.devices = []
         self.devicesMaster = []
 
+        # completed when the shell of the node is started
+        self.startedFuture = Future()
+
         # prepare the machine
         # SSH with the target
         if self.target:
-            self.targetSsh = ASsh(loop=self.loop, host=self.target, username=self.username, bastion=self.bastion, client_keys=self.client_keys)
+            self.targetSsh = ASsh(loop=self.loop, host=self.target, username=self.username, bastion=self.bastion, client_keys=self.client_keys, pool=pool)
         # SSH with the node
-        admin_ip = self.admin_ip
-        if "/" in admin_ip:
-                admin_ip, prefix = admin_ip.split("/")
-        self.ssh = ASsh(loop=self.loop, host=admin_ip, username=self.username, bastion=self.bastion, client_keys=self.client_keys)
+        self.transport = params.get("transport", self.transport)
+        if self.transport == "exec":
+            # its own connection with the target: the shell and the commands
+            # of the node hold channels for long
+            self.ssh = ASsh(loop=self.loop, host=self.target, username=self.username, bastion=self.bastion, client_keys=self.client_keys, container=self.name)
+        else:
+            admin_ip = self.admin_ip
+            if "/" in admin_ip:
+                    admin_ip, prefix = admin_ip.split("/")
+            self.ssh = ASsh(loop=self.loop, host=admin_ip, username=self.username, bastion=self.bastion, client_keys=self.client_keys)
+
+    def useAdminNetwork(self):
+        """
+        Returns True if the node must be connected to the admin network
+        (i.e., it is reached through its admin IP address)
+        """
+        return self.transport != "exec"
 
     def configureContainer(self, adminbr="admin-br", wait=True):
 #        # connect the node to the admin network
@@ -205,10 +270,12 @@ def configureContainer(self, adminbr="admin-br", wait=True):
         # configure the container to have
         #       an admin IP address
         cmds.append("lxc exec {} -- ifconfig admin {}".format(self.name, self.admin_ip))
-        #       a public key
-        cmds.append("lxc exec {} -- bash -c 'echo \"{}\" >> /root/.ssh/authorized_keys'".format(self.name, self.pub_id))
-        #       a ssh server
-        cmds.append("lxc exec {} -- service ssh start".format(self.name))
+        # the template already has the key and starts the ssh server
+        if not self.template:
+            #       a public key
+            cmds.append("lxc exec {} -- bash -c 'echo \"{}\" >> /root/.ssh/authorized_keys'".format(self.name, self.pub_id))
+            #       a ssh server
+            cmds.append("lxc exec {} -- service ssh start".format(self.name))
 
         cmd = ';'.join(cmds)
         if wait:
@@ -224,35 +291,38 @@ def createMasterAdminNetwork(cls, master, brname="admin-br", ip="192.168.42.1/24
         cmd = ";".join(cmds)
         master.cmd(cmd)
 
-    import re
-
-    def _findNameIP(self, name):
-        """
-        Resolves name to IP as seen by the eyeball
+    def _findNameIP(self, name, ips=None):
         """
-        _ipMatchRegex = re.compile( r'\d+\.\d+\.\d+\.\d+' )
-
-        # First, check for an IP address
-        ipmatch = _ipMatchRegex.findall( name )
-        if ipmatch:
-            return ipmatch[ 0 ]
-        # Otherwise, look up remote server
-        output = self.masternode.cmd('getent ahostsv4 {}'.format(name))
+        Resolves name to IP as seen by the eyeball (cached)
 
-        ips = _ipMatchRegex.findall( output )
-
-        ip = ips[ 0 ] if ips else None
+        `ips` (IP address per name, as returned by `NameResolver.prefetch`)
+        is used first so that names resolved from the asyncio loop are not
+        looked up again with a blocking command.
+        """
+        if ips is not None and name in ips:
+            ip = ips[name]
+        else:
+            ip = self.resolver.resolve(self.masternode, name)
+        if ip is None:
+            raise Exception("cannot resolve {}".format(name))
         return ip
 
     def addContainerLink(self, target1, target2, link_id, bridge1, bridge2, iface1=None,
-                         vxlan_dst_port=4789, **params):
-        """Add the link between 2 containers"""
+                         vxlan_dst_port=4789, batch=None, **params):
+        """Add the link between 2 containers
+
+        If `batch` (LinkBatch) is given, the commands are added to the batch
+        instead of being executed.
+        """
         vxlan_name = "vx_{}".format(link_id)
         cmds = self.createContainerLinkCommandList(target1, target2, link_id, vxlan_name, bridge1, bridge2,
                                                            iface1=iface1, vxlan_dst_port=vxlan_dst_port, **params)
 
-        cmd = ';'.join(cmds)
-        self.targetSsh.cmd(cmd)
+        if batch is not None:
+            batch.addLink(self, cmds)
+        else:
+            cmd = ';'.join(cmds)
+            self.targetSsh.cmd(cmd)
         link = params["link"]
         self.containerLinks[link] = vxlan_name
 
@@ -261,12 +331,40 @@ def addContainerLink(self, target1, target2, link_id, bridge1, bridge2, iface1=N
     def deleteContainerLink(self, link, **kwargs):
         self.targetSsh.cmd("ip link delete {}".format(self.containerLinks[link]))
 
+    def removeContainerLinkCommandList(self, link, intf, detach=True):
+        """
+        Returns the commands to run on the target to remove the end of
+        `link` on the node (interface `intf`) and forgets about it
+
+        Parameters
+        ----------
+        link : CloudLink
+            link to remove
+        intf : Intf
+            interface of the node on `link`
+        detach : bool
+            detach the interface from the container (useless if the
+            container is destroyed afterwards)
+        """
+        bridge = self.containerInterfaces.pop(intf.name, None)
+        vxlan_name = self.containerLinks.pop(link, None)
+        cmds = []
+        if bridge is not None and detach:
+            cmds.append("lxc network detach {} {}".format(bridge, self.name))
+        devices = [name for name in (vxlan_name, "v{}".format(bridge), bridge) if name]
+        for device in devices:
+            cmds.append("ip link delete {} 2> /dev/null".format(device))
+        if self.devices:
+            self.devices = [device for device in self.devices if device not in devices]
+        self.delIntf(intf)
+        return cmds
+
     def createContainerLinkCommandList(self, target1, target2, vxlan_id, vxlan_name, bridge1, bridge2, iface1=None,
-                                       vxlan_dst_port=4789, **params):
+                                       vxlan_dst_port=4789, ips=None, **params):
         cmds = []
         if target1 != target2:
-            ip1 = self._findNameIP(target1)
-            ip2 = self._findNameIP(target2)
+            ip1 = self._findNameIP(target1, ips)
+            ip2 = self._findNameIP(target2, ips)
             if ip1 == ip2:
                 return cmds
             comm = "ip link add {} type vxlan id {} remote {} local {} dstport {}".format(vxlan_name, vxlan_id, ip2,
@@ -301,7 +399,14 @@ def createContainerLinkCommandList(self, target1, target2, vxlan_id, vxlan_name,
                 self.devices.append(bridge2)
         return cmds 
 
-    def connectToAdminNetwork(self, master, target, link_id, admin_br, wait=True, **params):
+    def connectToAdminNetwork(self, master, target, link_id, admin_br, wait=True, ips=None, **params):
+        """
+        Connects the target to the admin network of the master (once per
+        target) and returns the commands to run on the master.
+
+        `ips` (IP address per name) must contain the master and the target
+        when called from the asyncio loop.
+        """
         cmds = []
         if not self.target in self.__class__.connectedToAdminNetwork:
             self.__class__.connectedToAdminNetwork[self.target] = True
@@ -311,7 +416,8 @@ def connectToAdminNetwork(self, master, target, link_id, admin_br, wait=True, **
 
             # locally
             # DSA - TODO - XXX beurk bridge2 = None
-            cmds = self.createContainerLinkCommandList(target, master, link_id, vxlan_name, bridge1=admin_br, bridge2=None)
+            cmds = self.createContainerLinkCommandList(target, master, link_id, vxlan_name, bridge1=admin_br, bridge2=None,
+                                                       ips=ips)
             cmd = ';'.join(cmds)
 
             if wait:
@@ -321,7 +427,8 @@ def connectToAdminNetwork(self, master, target, link_id, admin_br, wait=True, **
 
             # on master
             # DSA - TODO - XXX beurk bridge2 = None
-            cmds = self.createContainerLinkCommandList(master, target, link_id, vxlan_name, bridge1=admin_br, bridge2=None)
+            cmds = self.createContainerLinkCommandList(master, target, link_id, vxlan_name, bridge1=admin_br, bridge2=None,
+                                                       ips=ips)
             cmd = ';'.join(cmds)
             self.devicesMaster.append(vxlan_name)
 
@@ -334,16 +441,26 @@ def connectToAdminNetwork(self, master, target, link_id, admin_br, wait=True, **
 
 
     def connectTarget(self):
-        self.targetSsh.connect()
+        return self.targetSsh.connect()
     def waitConnectedTarget(self):
         self.targetSsh.waitConnected()
 
     def createContainer(self, **params): 
 ################################################################################        time.sleep(1.0)
         info ("create container ({} {} {}) ".format(self.image, self.cpu, self.memory))
+        cmd = ";".join(self.createContainerCommandList())
+        return self.targetSsh.sendCmd(cmd)
+
+    def createContainerCommandList(self):
+        """
+        Returns the list of commands that create and start the container
+        """
         cmds = []
-        # initialise the container
-        cmd = "lxc init {} {} < /dev/null ".format(self.image, self.name)
+        # initialise the container (tagged so that dclean can find it)
+        if self.template:
+            cmd = "lxc copy {}/{} {} -c {}=true < /dev/null ".format(self.template, TEMPLATE_SNAPSHOT, self.name, DISTRINET_TAG)
+        else:
+            cmd = "lxc init {} {} -c {}=true < /dev/null ".format(self.image, self.name, DISTRINET_TAG)
         info ("{}\n".format(cmd))
         cmds.append(cmd)
 
@@ -355,9 +472,15 @@ def createContainer(self, **params):
 
         # start the container
         cmds.append("lxc start {}".format(self.name))
+        return cmds
 
-        cmd = ";".join(cmds)
-        self.targetSsh.sendCmd(cmd)
+    def createContainerStatusCommand(self):
+        """
+        Returns the command that creates and starts the container and prints
+        "<name> created" or "<name> failed" depending on the outcome
+        """
+        cmd = " && ".join(self.createContainerCommandList())
+        return "( {} ) > /dev/null 2>&1 && echo '{} created' || echo '{} failed'".format(cmd, self.name, self.name)
 
     def targetSshWaitOutput(self):
         """
@@ -371,10 +494,13 @@ def waitCreated(self):
         info ("container created")
 
 
-    def addContainerInterface(self, intfName, devicename=None, brname=None, wait=True, **params):
+    def addContainerInterface(self, intfName, devicename=None, brname=None, wait=True, batch=None, **params):
         """
         Add the interface with name intfName to the container that is
         associated to the bridge named name-intfName-br on the host
+
+        If `batch` (LinkBatch) is given, the commands are added to the batch
+        instead of being executed.
         """
         if devicename is None:
             devicename = genIntfName()
@@ -387,7 +513,9 @@ def addContainerInterface(self, intfName, devicename=None, brname=None, wait=Tru
 
         cmd = ";".join(cmds)
 
-        if wait:
+        if batch is not None:
+            batch.addInterface(self, cmds)
+        elif wait:
             self.targetSsh.cmd(cmd)
         else:
             self.targetSsh.sendCmd(cmd)
@@ -414,13 +542,11 @@ def connect(self):
         Establishes an SSH connection to the host
         """
 
-        self.ssh.connect()
+        return self.ssh.connect()
 
     def waitTunneled(self):
         """
-        Waits that the tunnel is established (if needed) and updates `_host`
-        and `_port` attributes to use it instead of having a direct connection
-        to the host
+        Waits that the connection with the bastion is established (if needed)
         """
         self.ssh.waitTunneled()
 
@@ -436,10 +562,11 @@ def startShell( self, mnopts=None):
 
             self.createContainer(**self.params)
             self.waitCreated()
-            self.addContainerInterface(intfName="admin", brname="admin-br")
-            self.connectToAdminNetwork(master=self.masternode.host, target=self.target, link_id=CloudLink.newLinkId(), admin_br="admin-br")
+            if self.useAdminNetwork():
+                self.addContainerInterface(intfName="admin", brname="admin-br")
+                self.connectToAdminNetwork(master=self.masternode.host, target=self.target, link_id=CloudLink.newLinkId(), admin_br="admin-br")
 
-            self.configureContainer()
+                self.configureContainer()
             self.connect()
             self.waitConnected()
             self.asyncStartShell()
@@ -452,39 +579,54 @@ def startShell( self, mnopts=None):
     def asyncStartShell( self, mnopts=None ):
 
         async def run_shell():
-            async def trick(shell, stdin):
-                while self.run:
-                    c = await shell.stdout.read(n=1)
-                    os.write(stdin.fileno(), c.encode('utf-8'))
-
-            # Spawn a shell subprocess in a pseudo-tty, to disable buffering
-            # in the subprocess and insulate it from signals (e.g. SIGINT)
-            # received by the parent
-            self.master, self.slave = pty.openpty()
-
-            bash = "bash --rcfile <( echo 'PS1=\x7f') --noediting -is mininet:{}".format(self.name)
-            self.shell = await self.ssh.conn.create_process(bash, stdin=self.slave, stdout=self.slave, stderr=self.slave)
-
-            self.stdin = os.fdopen(self.master, 'r')
-            self.stdout = self.stdin
-
-            self.pollOut = select.poll()
-            self.pollOut.register( self.stdout )
-
-            # Maintain mapping between file descriptors and nodes
-            # This is useful for monitoring multiple nodes
-            # using select.poll()
-            self.outToNode[ self.stdout.fileno() ] = self
-            self.inToNode[ self.stdin.fileno() ] = self
-
-            await trick(self.shell, self.stdin)
+            try:
+                # Spawn a shell subprocess in a pseudo-tty, to disable buffering
+                # in the subprocess and insulate it from signals (e.g. SIGINT)
+                # received by the parent
+                self.master, self.slave = pty.openpty()
+
+                # exec: no intermediate shell (e.g., of lxc exec) holding the
+                # mininet:NAME tag that sendInt looks for
+                bash = "exec bash --rcfile <( echo 'PS1=\x7f') --noediting -is mininet:{}".format(self.name)
+                self.shell = await self.ssh.conn.create_process(bash, stdin=self.slave, stdout=self.slave, stderr=asyncssh.STDOUT)
+
+                self.stdin = os.fdopen(self.master, 'r')
+                self.stdout = self.stdin
+
+                self.pollOut = select.poll()
+                self.pollOut.register( self.stdout )
+
+                # Maintain mapping between file descriptors and nodes
+                # This is useful for monitoring multiple nodes
+                # using select.poll()
+                self.outToNode[ self.stdout.fileno() ] = self
+                self.inToNode[ self.stdin.fileno() ] = self
+            except Exception as e:
+                # do not leave waitStarted() blocked forever
+                error( "%s: cannot start the shell: %s\n" % ( self.name, e ) )
+                self.startedFuture.set_exception(e)
+                return
+            self.startedFuture.set_result(self.shell)
+
+            # asyncssh relays the output of the shell into the pty by chunks
+            # (with flow control), nothing to copy here: just wait for the
+            # shell to exit
+            await self.shell.wait_closed()
 
         "Start a shell process for running commands"
         if self.shell:
             error( "%s: shell is already running\n" % self.name )
             return
 
-        self.loop.create_task(run_shell())
+        asyncio.run_coroutine_threadsafe(run_shell(), self.loop)
+        return self.startedFuture
+
+    def read( self, size=1024 ):
+        """Buffered read from node, potentially blocking.
+           Reads up to readSize bytes at a time from the pty so that large
+           outputs cost a few system calls and monitor() iterations.
+           size: maximum number of characters to return (at least readSize)"""
+        return super( LxcNode, self ).read( max( size, self.readSize ) )
 
     def _popen( self, cmd, **params ):
         """Internal method: spawn and return a process
@@ -515,6 +657,16 @@ def terminate( self ):
         "Send kill signal to Node and clean up after it."
         self.unmountPrivateDirs()
 
+        cmd = ";".join(self.terminateCommandList())
+        self.targetSsh.sendCmd(cmd)
+
+        self.release()
+
+    def terminateCommandList(self):
+        """
+        Returns the commands to run on the target to destroy the container
+        and the devices made for it
+        """
         cmds = []
         # destroy the container
         cmds.append("lxc delete {} --force".format(self.name))
@@ -522,10 +674,13 @@ def terminate( self ):
         # remove all locally made devices
         for device in self.devices:
             cmds.append("ip link delete {}".format(device))
+        return cmds
 
-        cmd = ";".join(cmds)
-        self.targetSsh.sendCmd(cmd)
-
+    def release(self):
+        """
+        Closes the SSH connection with the node and cleans up after it (the
+        container is destroyed by `terminate` or by the caller)
+        """
         # close the SSH connection
         self.ssh.close()
 
@@ -541,9 +696,7 @@ async def _sendInt(self, intr):
     def sendInt( self, intr=chr( 3 ) ):
         "Interrupt running command."
         debug( 'sendInt: writing chr(%d)\n' % ord( intr ) )
-        task = self.loop.create_task(self._sendInt(intr))
-        while not task.done():
-            time.sleep(0.0001)
+        task = asyncio.run_coroutine_threadsafe(self._sendInt(intr), self.loop)
         return task.result()
 
     # XXX - OK
@@ -560,12 +713,87 @@ def popen( self, *args, **kwargs ):
     def pexec(self, *args, **kwargs ):
         """Execute a command using popen
            returns: out, err, exitcode"""
-        task = self.loop.create_task(self._pexec(*args, **kwargs))
-        while not task.done():
-            time.sleep(0.001)
+        task = asyncio.run_coroutine_threadsafe(self._pexec(*args, **kwargs), self.loop)
         out,err, exitcode = task.result()
         return out.replace( chr( 127 ), '' ).rstrip(), err.replace( chr( 127 ), '' ), exitcode
 
+    async def arun(self, cmd, timeout=None):
+        """
+        Runs `cmd` on the node in its own SSH channel, independently of the
+        shell of the node (several commands can run at the same time). At
+        most `maxChannels` commands run at the same time on the node, the
+        others wait for a channel. Must run in the asyncio loop of the node.
+
+        Parameters
+        ----------
+        cmd : str
+            command to run
+        timeout : float
+            maximum number of seconds the command can take. If None, wait
+            forever (default is None).
+
+        Returns
+        -------
+        tuple
+            out, err, exitcode
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            if the command did not terminate in `timeout` seconds
+        """
+        async with self._channels():
+            result = await asyncio.wait_for(self.ssh.conn.run(cmd, check=False), timeout)
+        return result.stdout, result.stderr, result.exit_status
+
+    def _channels(self):
+        """
+        Returns the semaphore limiting the number of channels opened at the
+        same time by `arun` and `alines` on the connection with the node
+        """
+        if getattr(self, "channels", None) is None:
+            # created in the loop (asyncio primitives are bound to it)
+            self.channels = asyncio.Semaphore(self.maxChannels)
+        return self.channels
+
+    async def alines(self, cmd):
+        """
+        Runs `cmd` on the node in its own SSH channel (see `arun`) and
+        yields the lines of its output (stdout and stderr merged) as they
+        arrive, without the trailing newline. The channel is not read while
+        the consumer does not ask for the next line (i.e., the node slows
+        down when the consumer does). Must run in the asyncio loop of the
+        node.
+
+        Parameters
+        ----------
+        cmd : str
+            command to run
+        """
+        async with self._channels():
+            process = await self.ssh.conn.create_process(cmd, stderr=asyncssh.STDOUT)
+            # nothing to send to the command
+            process.stdin.write_eof()
+            try:
+                async for line in process.stdout:
+                    if line:
+                        yield line.rstrip("\n")
+                await process.wait_closed()
+            finally:
+                process.close()
+
+    def acmd(self, cmd, timeout=None):
+        """
+        Runs `cmd` on the node in its own SSH channel without blocking (see
+        `arun`).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            future completed with (out, err, exitcode)
+        """
+        return asyncio.run_coroutine_threadsafe(self.arun(cmd, timeout=timeout), self.loop)
+
     ####################################################################
 
     # XXX - OK
@@ -605,13 +833,12 @@ def waitConnected(self):
 
         self.ssh.waitConnected()
 
-    def waitStarted(self):
+    def waitStarted(self, timeout=None):
         """
         Blocking until the node is actually started
         """
 
-        while (self.stdin is None) or (self.stdout is None):
-            time.sleep(0.001)
+        self.startedFuture.result(timeout)
    # =========================================================================
 
     # == Time for coroutines black magic ======================================
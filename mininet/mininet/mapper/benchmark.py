@@ -0,0 +1,252 @@
+"""
+Offline benchmark of the mappers
+
+Builds topologies of several families and sizes, maps them with every
+mapper of MAPPERS on synthetic physical infrastructures and measures, for
+each run:
+
+    time: solve time (s)
+    memory: peak of the memory allocated by Python during the solve (KiB),
+        measured in a second solve (tracing the allocations slows the pure
+        Python mappers much more than the native ones)
+    cross_links: number of links between different workers
+    cut_bw: bandwidth of the links between different workers (Mbps)
+    max_load: highest number of cores asked on a worker, relative to its
+        cores (1.0: exactly full)
+    max_nodes: highest number of nodes on a worker
+
+The results are written as JSON (and CSV) so that they can be compared from
+one version to the other. Runs that fail (e.g., a mapper not suited to the
+topology, or distriopt solvers that are not installed) are recorded with
+their error. The packing mappers are not run: they choose cloud instances
+from their prices instead of placing the nodes on given workers.
+
+usage: python -m mininet.mapper.benchmark [--sizes small|medium|large]
+           [--mappers roundRobin,bandwidth,...] [--json FILE] [--csv FILE]
+"""
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+
+from mininet.topolib import TreeTopo, TorusTopo
+from mininet.topodc import FatTreeTopo, SpineAndLeafTopo, DumbbellTopo
+from mininet.mapper.mapper import (MAPPERS, WORKER_MAPPERS, EMBEDDING_MAPPERS, PACKING_MAPPERS,
+                                   Mapper, MaxinetMapper, BandwidthMapper)
+from mininet.mapper.partition import load_physical
+
+# bandwidth (Mbps) given to the links of the topologies
+HOST_BW = 1000
+SWITCH_BW = 10000
+
+# (family, topology class, build parameters) per size
+TOPOLOGIES = {
+    "small": [("fattree", FatTreeTopo, {"k": 4}),
+              ("spineleaf", SpineAndLeafTopo, {"k": 4}),
+              ("dumbbell", DumbbellTopo, {"n": 16}),
+              ("tree", TreeTopo, {"depth": 2, "fanout": 4}),
+              ("torus", TorusTopo, {"x": 3, "y": 3, "n": 2})],
+    "medium": [("fattree", FatTreeTopo, {"k": 8}),
+               ("spineleaf", SpineAndLeafTopo, {"k": 16}),
+               ("dumbbell", DumbbellTopo, {"n": 128}),
+               ("tree", TreeTopo, {"depth": 3, "fanout": 5}),
+               ("torus", TorusTopo, {"x": 6, "y": 6, "n": 4})],
+    "large": [("fattree", FatTreeTopo, {"k": 16}),
+              ("spineleaf", SpineAndLeafTopo, {"k": 32}),
+              ("dumbbell", DumbbellTopo, {"n": 512}),
+              ("tree", TreeTopo, {"depth": 4, "fanout": 6}),
+              ("torus", TorusTopo, {"x": 12, "y": 12, "n": 4})],
+}
+
+# synthetic infrastructures: (name, number of workers, cores, memory (MB),
+# NIC rate (Mbps))
+INFRASTRUCTURES = [("4x48", 4, 48, 131072.0, 10000.0),
+                   ("8x16", 8, 16, 65536.0, 10000.0)]
+
+FIELDS = ["topology", "size", "nodes", "links", "infrastructure", "workers", "mapper",
+          "status", "time", "memory", "cross_links", "cut_bw", "max_load", "max_nodes", "error"]
+
+
+def build_topology(cls, params):
+    """ Builds a topology, with bandwidth on all its links
+        returns: Topo"""
+    topo = cls(**params)
+    hosts = set(topo.hosts())
+    for src, dst, info in topo.links(withInfo=True):
+        info.setdefault("bw", HOST_BW if src in hosts or dst in hosts else SWITCH_BW)
+    return topo
+
+
+def write_infrastructure(directory, name, workers, cores, memory, rate):
+    """ Writes a physical infrastructure JSON file (conf/gros_partial.json
+        format) of identical workers connected to a gateway
+        returns: path of the file without .json (as in the configuration)"""
+    names = ["{}-w{}".format(name, i) for i in range(workers)]
+    infrastructure = {
+        "nodes": [{"id": worker, "cores": cores, "memory": memory} for worker in names],
+        "links": [{"source": worker, "target": "gw",
+                   "devices": [{"source_device": "eth0", "target_device": "port{}".format(i),
+                                "rate": rate}]} for i, worker in enumerate(names)]}
+    path = os.path.join(directory, name)
+    with open(path + ".json", "w") as f:
+        json.dump(infrastructure, f, indent=1)
+    return path
+
+
+def make_mapper(name, topo, workers, physical_path):
+    """ Maps topo with the mapper name
+        returns: the mapper (with its places)"""
+    if name in EMBEDDING_MAPPERS:
+        return Mapper(virtual_topo=topo, physical_topo=physical_path, solver=MAPPERS[name], cache=False)
+    if name == "maxinet":
+        return MaxinetMapper(virtual_topo=topo, physical_topo=workers, physical_path=physical_path)
+    if name == "bandwidth":
+        return BandwidthMapper(virtual_topo=topo, physical_topo=workers, physical_path=physical_path)
+    if name in WORKER_MAPPERS:
+        return MAPPERS[name](virtual_topo=topo, physical_topo=workers)
+    raise ValueError("unknown mapper {}".format(name))
+
+
+def solve(name, topo, workers, physical_path):
+    """ Maps topo with the mapper name, what the mapper prints going to
+        stderr (stdout may carry the JSON results)
+        returns: the mapper"""
+    with redirect_stdout(sys.stderr):
+        return make_mapper(name, topo, workers, physical_path)
+
+
+def peak_memory(name, topo, workers, physical_path):
+    "Peak of the memory allocated by Python while mapping topo (KiB)"
+    tracemalloc.start()
+    try:
+        solve(name, topo, workers, physical_path)
+        return tracemalloc.get_traced_memory()[1] // 1024
+    finally:
+        tracemalloc.stop()
+
+
+def evaluate(topo, places, workers, machines):
+    "Quality metrics of the placement places"
+    cross_links = cut_bw = 0
+    for src, dst, info in topo.links(withInfo=True):
+        if places[src] != places[dst]:
+            cross_links += 1
+            cut_bw += info.get("bw", 0)
+    cores = {worker: 0.0 for worker in workers}
+    nodes = {worker: 0 for worker in workers}
+    for node in topo.nodes():
+        worker = places[node]
+        cores[worker] = cores.get(worker, 0.0) + float(topo.nodeInfo(node).get("cpu") or 1)
+        nodes[worker] = nodes.get(worker, 0) + 1
+    max_load = max(cores[worker] / machines[worker]["cores"] for worker in workers)
+    return {"cross_links": cross_links, "cut_bw": cut_bw,
+            "max_load": round(max_load, 3), "max_nodes": max(nodes.values())}
+
+
+def run(name, topo, workers, physical_path, machines):
+    """ Maps topo with the mapper name and measures it
+        returns: partial result record"""
+    record = {"mapper": name}
+    try:
+        start = time.perf_counter()
+        mapper = solve(name, topo, workers, physical_path)
+        record["time"] = round(time.perf_counter() - start, 4)
+        record["memory"] = peak_memory(name, topo, workers, physical_path)
+        missing = [node for node in topo.nodes() if node not in mapper.places]
+        if missing:
+            raise ValueError("{} nodes not placed (e.g., {})".format(len(missing), missing[0]))
+        record.update(evaluate(topo, mapper.places, workers, machines))
+        record["status"] = "ok"
+    except (Exception, SystemExit) as e:  # pylint: disable=broad-except
+        # SystemExit: BlockMapper exits on unsuited topologies
+        record.update(status="error", error="{}: {}".format(type(e).__name__, e))
+    return record
+
+
+def benchmark(sizes=("small",), mappers=None, infrastructures=INFRASTRUCTURES, log=None):
+    """ Runs the benchmark
+        sizes: topology sizes to run (keys of TOPOLOGIES)
+        mappers: names of the mappers to run (None: all of MAPPERS)
+        infrastructures: synthetic infrastructures to map on
+        log: function called with each record as it is produced
+        returns: list of result records"""
+    mappers = list(MAPPERS) if mappers is None else mappers
+    packing = [name for name in mappers if name in PACKING_MAPPERS]
+    if packing:
+        sys.stderr.write("not benchmarking {}: packing mappers need cloud instance prices, "
+                         "not workers\n".format(", ".join(packing)))
+        mappers = [name for name in mappers if name not in PACKING_MAPPERS]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="distrinet-benchmark-") as directory:
+        for infra, count, cores, memory, rate in infrastructures:
+            physical_path = write_infrastructure(directory, infra, count, cores, memory, rate)
+            machines = load_physical(physical_path)
+            workers = sorted(machines)
+            for size in sizes:
+                for family, cls, params in TOPOLOGIES[size]:
+                    topo = build_topology(cls, params)
+                    for name in mappers:
+                        record = {"topology": family, "size": size, "nodes": len(topo.nodes()),
+                                  "links": len(topo.links()), "infrastructure": infra,
+                                  "workers": count}
+                        record.update(run(name, topo, workers, physical_path, machines))
+                        results.append(record)
+                        if log is not None:
+                            log(record)
+    return results
+
+
+def write_csv(results, path):
+    "Writes the result records in the CSV file path"
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for record in results:
+            writer.writerow({field: record.get(field, "") for field in FIELDS})
+
+
+def main(argv=None):
+    parser = ArgumentParser(description="Benchmark the Distrinet mappers")
+    parser.add_argument("--sizes", default="small",
+                        help="comma separated topology sizes among {}".format(", ".join(TOPOLOGIES)))
+    parser.add_argument("--mappers", default=None,
+                        help="comma separated mappers among {} (default: all)".format(", ".join(MAPPERS)))
+    parser.add_argument("--json", default=None, help="write the results in this JSON file")
+    parser.add_argument("--csv", default=None, help="write the results in this CSV file")
+    args = parser.parse_args(argv)
+
+    sizes = args.sizes.split(",")
+    for size in sizes:
+        if size not in TOPOLOGIES:
+            parser.error("unknown size {}".format(size))
+    mappers = args.mappers.split(",") if args.mappers else None
+    for name in mappers or []:
+        if name not in MAPPERS:
+            parser.error("unknown mapper {}".format(name))
+
+    def log(record):
+        if record["status"] == "ok":
+            sys.stderr.write("{topology:10} {nodes:5} nodes {infrastructure:5} {mapper:18} "
+                             "{time:8.3f} s cut {cut_bw:9} Mbps load {max_load}\n".format(**record))
+        else:
+            sys.stderr.write("{topology:10} {nodes:5} nodes {infrastructure:5} {mapper:18} "
+                             "{status}: {error}\n".format(**record))
+
+    results = benchmark(sizes=sizes, mappers=mappers, log=log)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=1)
+    if args.csv:
+        write_csv(results, args.csv)
+    if not args.json and not args.csv:
+        json.dump(results, sys.stdout, indent=1)
+    return results
+
+
+if __name__ == "__main__":
+    main()
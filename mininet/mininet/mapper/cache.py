@@ -0,0 +1,102 @@
+"""
+Persistent cache of the mappings
+
+Solving an embedding (e.g., EmbedPartition, BestFitDopProduct) can take
+minutes on large topologies while dmn is often run again on the same
+topology and infrastructure. The placements are saved under
+~/.distrinet/mappings, keyed by a hash of the canonical form of the virtual
+topology (nodes, links and their information), of the physical
+infrastructure (content of its JSON file, or list of workers) and of the
+solver name.
+"""
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from mininet.util import writeJson
+
+CACHE_DIR = Path.home() / ".distrinet" / "mappings"
+
+# bump when the key or the file format change
+CACHE_VERSION = 1
+
+
+def canonical(value):
+    "JSON form of value with sorted keys, objects that JSON ignores as str"
+    return json.dumps(value, sort_keys=True, default=str, separators=(",", ":"))
+
+
+def topo_fingerprint(topo):
+    """ Canonical form of the virtual topology
+        topo: Topo"""
+    nodes = [[name, topo.nodeInfo(name)] for name in sorted(topo.nodes(sort=False))]
+    links = sorted(canonical([src, dst, info]) for src, dst, info in topo.links(withInfo=True))
+    return {"nodes": nodes, "links": links}
+
+
+def physical_fingerprint(physical):
+    """ Canonical form of the physical infrastructure
+        physical: path of its JSON file (with or without .json), name of
+            the cloud instance description, or list of workers"""
+    if isinstance(physical, (str, Path)):
+        for path in (str(physical), "{}.json".format(physical)):
+            if os.path.isfile(path):
+                with open(path, "r") as f:
+                    return {"file": json.load(f)}
+        return {"name": str(physical)}
+    return {"workers": list(physical)}
+
+
+def solver_name(solver):
+    "Name of a solver class (or of a mapper class)"
+    return getattr(solver, "__module__", "") + "." + getattr(solver, "__name__", str(solver))
+
+
+def mapping_key(topo, physical, solver):
+    """ Key of the mapping of topo on physical with solver
+        returns: hexadecimal SHA-256"""
+    content = {"version": CACHE_VERSION, "topo": topo_fingerprint(topo),
+               "physical": physical_fingerprint(physical), "solver": solver_name(solver)}
+    return hashlib.sha256(canonical(content).encode()).hexdigest()
+
+
+def load_mapping(key, cache_dir=None):
+    """ Returns the placement cached for key, None if there is none"""
+    path = Path(cache_dir or CACHE_DIR) / "{}.json".format(key)
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if entry.get("version") != CACHE_VERSION:
+        return None
+    # JSON turned the tuples (e.g., packing placements) into lists
+    return {node: tuple(place) if isinstance(place, list) else place
+            for node, place in entry["places"].items()}
+
+
+def save_mapping(key, places, cache_dir=None):
+    """ Saves the placement places for key
+        returns: path of the cache file"""
+    cache_dir = Path(cache_dir or CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / "{}.json".format(key)
+    writeJson(str(path), {"version": CACHE_VERSION, "places": places})
+    return path
+
+
+def cached_places(topo, physical, solver, compute, cache=True):
+    """ Returns the placement of topo on physical with solver, computed by
+        compute() only if it is not cached yet
+        cache: use the cache at all?
+        returns: (places, True if it came from the cache)"""
+    if not cache:
+        return compute(), False
+    key = mapping_key(topo, physical, solver)
+    places = load_mapping(key)
+    if places is not None:
+        return places, True
+    places = compute()
+    save_mapping(key, places)
+    return places, False
@@ -13,8 +13,10 @@
 from distriopt.packing import CloudInstance
 from distriopt.packing.algorithms import BestFitDopProduct,FirstFitDecreasingPriority,FirstFitOrderedDeviation
 from random import randint
-import subprocess
-from pathlib import Path
+import re
+
+from mininet.mapper.partition import get_partitioner, load_physical, normalize, physical_shares
+from mininet.mapper.cache import cached_places
 
 class DummyMapper(object):
     def __init__(self, places={}):
@@ -60,48 +62,36 @@ def place(self, node):
 
 
 class MaxinetMapper(DummyMapper):
-    def __init__(self, virtual_topo, physical_topo=[], share_path="/Users/giuseppe/Desktop/algo_experiments/algo_experiments/distrinet/mininet/mininet/mapper/shares/equal10.txt"):
+    def __init__(self, virtual_topo, physical_topo=[], share_path=None, physical_path=None, backend=None):
+        """ virtual_topo: virtual topology to map
+            physical_topo: names of the workers
+            share_path: file giving the share of each worker, one "N = share"
+                line per worker in the order of physical_topo (None: see
+                physical_path)
+            physical_path: physical infrastructure JSON file, the shares are
+                proportional to the cores of the workers (None: equal shares)
+            backend: partitioning backend (see mapper.partition, None: the
+                first available one)"""
         self.physical = physical_topo
         self.virtual_network = virtual_topo
         self.vNodes = virtual_topo.hosts()+virtual_topo.switches()
         self.vHosts = virtual_topo.hosts()
         self.vSwitches = virtual_topo.switches()
         self.vlinks = virtual_topo.links()
+        self.build_index()
         self.metis_node_mapping = None
         self.node_metis_mapping = None
         self.metis_dict = None
         maxinet_dict = self.convert_in_maxinet_dict()
-        # OK
         metis_dict = self.convert_in_metis_dict(maxinet_dict=maxinet_dict)
-        print(metis_dict) # OK
-        self.create_metis_file(metis_dict=metis_dict, path="/tmp/metis_file") #OK
-        print("USING {}".format(share_path))
-        self.run_metis(graph_path="/tmp/metis_file", share_path=share_path) # OK
-        mapping = self.get_mapping(graph_path="/tmp/metis_file", share_path=share_path) # OK
-        print(mapping)
-        mapping_converted = self.convert_mapping(mapping) # OK
-        print("MAPPING CONVERTED")
-        print(mapping_converted)
-
-        complete_mapping = self.get_mapping_for_all_nodes(mapping_converted) # OK
-        print("COMPLETE MAPPING")
-        print(complete_mapping)
-        print(self.metis_node_mapping)
-        compute_nodes = sorted(self.physical)
-        mapping = complete_mapping
-        sorted_keys = sorted(mapping.keys(), key=lambda x: int(x), reverse=True)
-
-        physical_names_mapping = {phy_name: metis_name for phy_name, metis_name in
-                                  zip(compute_nodes, sorted_keys)}
-
-        metis_name_mapping = {physical_names_mapping[x]: x for x in physical_names_mapping.keys()}
-
-        mapping_with_pyhisical_names = {metis_name_mapping[node]: mapping[node] for node in mapping.keys()}
-
-        print(mapping_with_pyhisical_names)
-        self.places = self.__places(mapping_with_pyhisical_names)
-        print("FINAL")
-        print(self.places)
+
+        shares = self.get_shares(share_path=share_path, physical_path=physical_path)
+        self.partitioner = get_partitioner(shares, backend=backend)
+        mapping = self.get_mapping(metis_dict, shares)
+        mapping_converted = self.convert_mapping(mapping)
+
+        complete_mapping = self.get_mapping_for_all_nodes(mapping_converted)
+        self.places = self.__places(complete_mapping)
 
     def __places(self, mapping):
         final = dict()
@@ -111,38 +101,36 @@ def __places(self, mapping):
 
         return final
 
-
-    def get_mapping(self, graph_path, share_path):
-        gr_path = Path(graph_path)
-        if gr_path.is_file():
-            file_name = gr_path.name
-        else:
-            raise RuntimeError()
-
-        if Path(share_path).is_file():
-            physical_hosts = self.get_physical_hosts(share_path)
-        else:
-            raise RuntimeError()
-
-        mapping_file_name = file_name +".part."+ str(len(physical_hosts))
-        mapping_file_path = gr_path.parent / mapping_file_name
-        mapping = {host: [] for host in physical_hosts}
-        with open(mapping_file_path,"r") as file:
-            lines = list(map(lambda x:x.strip(), file.readlines()))
-
-        for c, m in enumerate(lines):
-            switch = c + 1
-            mapping[m].append(switch)
-
+    def get_shares(self, share_path=None, physical_path=None):
+        if share_path is not None:
+            shares = self.get_physical_shares(share_path)
+            if len(shares) != len(self.physical):
+                raise ValueError("{} gives {} shares for {} workers".format(share_path, len(shares), len(self.physical)))
+            return normalize(shares)
+        if physical_path is not None:
+            return physical_shares(physical_path, self.physical)
+        return normalize([1] * len(self.physical))
+
+    def get_mapping(self, metis_dict, shares):
+        """ Partitions the METIS graph in memory
+            returns: METIS nodes placed on each worker"""
+        nums = sorted(metis_dict.keys())
+        index = {num: i for i, num in enumerate(nums)}
+        vweights = [metis_dict[num]["weight"] for num in nums]
+        adjacency = [{} for _ in nums]
+        for num in nums:
+            edges = metis_dict[num]["edges"]
+            neighbors = adjacency[index[num]]
+            for neighbor, rate in zip(edges[::2], edges[1::2]):
+                # parallel links add up
+                neighbors[index[neighbor]] = neighbors.get(index[neighbor], 0) + rate
+        parts = self.partitioner.partition(vweights, adjacency, shares) if nums else []
+
+        mapping = {host: [] for host in self.physical}
+        for num, part in zip(nums, parts):
+            mapping[self.physical[part]].append(num)
         return mapping
 
-    def run_metis(self, graph_path, share_path):
-        n_physical_hosts = len(self.get_physical_hosts(share_path))
-        cmd=f"gpmetis -ptype=rb -tpwgts={str(share_path)} {str(graph_path)} {n_physical_hosts}"
-        output = subprocess.check_output(cmd, shell=True)
-        out = output.decode("utf-8")
-        return out
-
     def get_mapping_for_all_nodes(self, mapping_node_names):
         total_mapping={host: mapping_node_names[host] for host in mapping_node_names.keys()}
         for host in total_mapping.keys():
@@ -154,7 +142,7 @@ def get_mapping_for_all_nodes(self, mapping_node_names):
     def get_connected_hosts(self, node_name):
         nodes = []
         for node in self.getNeighbors(node_name):
-            if node in self.vHosts:
+            if node in self.vHostSet:
                 nodes.append(node)
         return nodes
 
@@ -164,33 +152,29 @@ def convert_mapping(self, mapping):
             mapping_node_names[host] = [self.metis_node_mapping[node] for node in mapping[host]]
         return mapping_node_names
 
-    def create_metis_file(self, metis_dict, path):
-        nodes, edges = len(self.get_metis_nodes()), len(self.get_metis_edges())
-
-        sorted_keys = sorted(list(metis_dict.keys()))
-        metis_lines = [[nodes, edges, "011", "0"]]
-
-        for k in sorted_keys:
-            weight = metis_dict[k]["weight"]
-            edges = metis_dict[k]["edges"]
-            line = [weight] + edges
-            metis_lines.append(line)
-
-        with open(Path(path), "w") as file:
-            for line in metis_lines:
-                file.write(" ".join([str(x) for x in line]) + "\n")
-
-        return metis_lines
-
-    def get_physical_hosts(self, share_path):
+    def get_physical_shares(self, share_path):
         with open(share_path, "r") as file:
-            lines = file.readlines()
-            lines = list(map(lambda x: x.strip(), lines))
-            while [] in lines:
-                lines.remove([])
-        hosts = [x.split('=')[0].strip() for x in lines]
-        return hosts
+            lines = [x.strip() for x in file.readlines()]
+        return [float(x.split('=')[1]) for x in lines if x]
+
 
+    def build_index(self):
+        """
+        Indexes the virtual topology once so that the neighbors of a node,
+        the rate of a link and the kind of a node are found in constant time
+        """
+        self.vHostSet = set(self.vHosts)
+        self.vSwitchSet = set(self.vSwitches)
+        # neighbors of each node (dict as an ordered set, for a stable METIS
+        # input)
+        self.adjacency = {n: {} for n in self.vNodes}
+        # information of the first link between two nodes, in both directions
+        self.link_info = {}
+        for u, v, d in self.virtual_network.links(withInfo=True):
+            self.adjacency.setdefault(u, {})[v] = None
+            self.adjacency.setdefault(v, {})[u] = None
+            self.link_info.setdefault((u, v), d)
+            self.link_info.setdefault((v, u), d)
 
     def get_metis_nodes(self):
         return self.vSwitches
@@ -198,17 +182,13 @@ def get_metis_nodes(self):
     def get_metis_edges(self):
         edges = []
         for u, v in self.vlinks:
-            if u in self.vSwitches and v in self.vSwitches:
+            if u in self.vSwitchSet and v in self.vSwitchSet:
                 edges.append((u, v))
 
         return edges
 
     def getNeighbors(self, n):
-        links = self.vlinks
-        links = list(filter(lambda x: x[0] == n or x[1] == n, links))
-        neighbors = set([x[0] for x in links]+[x[1] for x in links] )
-        neighbors.remove(n)
-        return list(neighbors)
+        return [neighbor for neighbor in self.adjacency.get(n, ()) if neighbor != n]
 
     def convert_in_maxinet_dict(self):
         maxinet_nodes = dict()
@@ -218,18 +198,17 @@ def convert_in_maxinet_dict(self):
         for n in maxinet_nodes.keys():
             connected_nodes = self.getNeighbors(n)
             for connected_node in connected_nodes:
-                if connected_node in self.vHosts:
+                if connected_node in self.vHostSet:
                     maxinet_nodes[n]["weight"] += 1
                 else:
                     maxinet_nodes[n]["connected_switches"].append(connected_node)
         return maxinet_nodes
 
     def req_rate(self, n1, n2):
-        links = self.virtual_network.links(withInfo=True)
-        for u, v, d in links:
-            if (u, v) == (n1,n2) or (v,u) == (n1,n2):
-                return d["bw"]
-        raise ValueError("Link {}-{} does not exist")
+        if (n1, n2) not in self.link_info:
+            raise ValueError("Link {}-{} does not exist".format(n1, n2))
+        # links without bandwidth weigh as 1 Mbps ones
+        return self.link_info[(n1, n2)].get("bw", 1)
 
     def convert_in_metis_dict(self, maxinet_dict):
         metis_node_mapping = {num+1: node for num, node in enumerate(maxinet_dict.keys())}
@@ -253,6 +232,161 @@ def convert_in_metis_dict(self, maxinet_dict):
 
 
 
+def parse_memory(memory):
+    """ Returns the memory in MB of a "memory" node parameter (e.g., 512MB,
+        2GB, or a number of MB)"""
+    if memory is None:
+        return 0
+    if isinstance(memory, (int, float)):
+        return float(memory)
+    match = re.match(r"^\s*([0-9.]+)\s*([kKMGT]?)(i?B)?\s*$", memory)
+    if match is None:
+        raise ValueError("invalid memory {}".format(memory))
+    value, unit = float(match.group(1)), match.group(2).upper()
+    return value * {"K": 1.0 / 1024, "": 1, "M": 1, "G": 1024, "T": 1024 ** 2}[unit]
+
+
+class BandwidthMapper(DummyMapper):
+    """ Places the nodes so that the bandwidth of the links between workers
+        (i.e., VXLAN tunnels) is minimal, within the cores and the memory of
+        each worker: greedy placement of the nodes by decreasing bandwidth
+        next to their placed neighbors, then local search moving single
+        nodes while it lowers the inter-worker bandwidth"""
+
+    # bandwidth (Mbps) of the links without bw
+    default_bw = 1
+
+    def __init__(self, virtual_topo, physical_topo=[], physical_path=None, passes=10, slack=0.1):
+        """ virtual_topo: virtual topology to map
+            physical_topo: names of the workers
+            physical_path: physical infrastructure JSON file giving the cores,
+                memory and NIC rate of the workers (None: the cores needed are
+                split evenly with slack, no memory limit)
+            passes: maximum local search passes
+            slack: extra capacity given to each worker when the cores are
+                split evenly or overcommitted"""
+        self.physical = list(physical_topo)
+        self.virtual_network = virtual_topo
+        self.vNodes = virtual_topo.hosts()+virtual_topo.switches()
+        self.passes = passes
+
+        # demand of each node and bandwidth between neighbors
+        self.cores = {n: float(virtual_topo.nodeInfo(n).get("cpu") or 1) for n in self.vNodes}
+        self.memory = {n: parse_memory(virtual_topo.nodeInfo(n).get("memory")) for n in self.vNodes}
+        self.adjacency = {n: {} for n in self.vNodes}
+        for u, v, d in virtual_topo.links(withInfo=True):
+            if u == v:
+                continue
+            bw = d.get("bw") or self.default_bw
+            self.adjacency[u][v] = self.adjacency[u].get(v, 0) + bw
+            self.adjacency[v][u] = self.adjacency[v].get(u, 0) + bw
+
+        self.capacity = self.get_capacity(physical_path, slack)
+        self.places = self.__places()
+        self.traffic = self.get_traffic()
+
+    def get_capacity(self, physical_path, slack):
+        "Cores, memory (MB) and NIC rate (Mbps) of each worker"
+        if physical_path is not None:
+            machines = load_physical(physical_path)
+            missing = [w for w in self.physical if w not in machines]
+            if missing:
+                raise ValueError("workers {} not in {}".format(", ".join(missing), physical_path))
+            # the containers share the cores: when the nodes need more cores
+            # than the workers have, every worker is overcommitted as much
+            needed = sum(self.cores.values())
+            available = sum(float(machines[w]["cores"]) for w in self.physical)
+            overcommit = max(1.0, needed / available * (1 + slack))
+            return {w: {"cores": float(machines[w]["cores"]) * overcommit,
+                        "memory": float(machines[w]["memory"] or float("inf")),
+                        "rate": machines[w]["rate"] or None} for w in self.physical}
+        cores = sum(self.cores.values()) / len(self.physical) * (1 + slack)
+        cores = max(cores, max(self.cores.values()))
+        return {w: {"cores": cores, "memory": float("inf"), "rate": None} for w in self.physical}
+
+    def __fits(self, node, worker, load):
+        cores, memory = load[worker]
+        capacity = self.capacity[worker]
+        return (cores + self.cores[node] <= capacity["cores"] + 1e-9 and
+                memory + self.memory[node] <= capacity["memory"] + 1e-9)
+
+    def __places(self):
+        places = {}
+        load = {w: [0.0, 0.0] for w in self.physical}
+
+        def add(node, worker, sign=1):
+            load[worker][0] += sign * self.cores[node]
+            load[worker][1] += sign * self.memory[node]
+
+        def attraction(node, worker):
+            return sum(bw for v, bw in self.adjacency[node].items() if places.get(v) == worker)
+
+        # greedy: heaviest nodes first, next to their placed neighbors
+        # (ties: the least loaded worker)
+        order = sorted(self.vNodes, key=lambda n: (-sum(self.adjacency[n].values()), n))
+        for node in order:
+            feasible = [w for w in self.physical if self.__fits(node, w, load)]
+            if not feasible:
+                raise ValueError("Not a valid Mapper for this instance: no worker can host {}".format(node))
+            worker = max(feasible, key=lambda w: (attraction(node, w),
+                                                  -load[w][0] / self.capacity[w]["cores"]))
+            places[node] = worker
+            add(node, worker)
+
+        # local search: move a node to the worker of its neighbors while it
+        # lowers the bandwidth between workers
+        for _ in range(self.passes):
+            moved = False
+            for node in order:
+                current = places[node]
+                stay = attraction(node, current)
+                add(node, current, -1)
+                best, gain = current, 0
+                for worker in set(places[v] for v in self.adjacency[node]):
+                    if worker != current and self.__fits(node, worker, load):
+                        g = attraction(node, worker) - stay
+                        if g > gain:
+                            best, gain = worker, g
+                places[node] = best
+                add(node, best)
+                moved = moved or best != current
+            if not moved:
+                break
+        return places
+
+    def get_traffic(self):
+        """ Predicted bandwidth between each pair of workers
+            returns: {(worker1, worker2): Mbps} with worker1 < worker2"""
+        traffic = {}
+        for u in self.vNodes:
+            for v, bw in self.adjacency[u].items():
+                p1, p2 = self.places[u], self.places[v]
+                if u < v and p1 != p2:
+                    pair = tuple(sorted((p1, p2)))
+                    traffic[pair] = traffic.get(pair, 0) + bw
+        return traffic
+
+    def cut_bandwidth(self):
+        "Total bandwidth of the links between workers"
+        return sum(self.traffic.values())
+
+    def report(self):
+        """ Returns the predicted traffic between the workers and, when the
+            NIC rates are known, the workers whose NIC cannot carry it"""
+        lines = ["inter-worker bandwidth: {} Mbps".format(self.cut_bandwidth())]
+        for (w1, w2), bw in sorted(self.traffic.items()):
+            lines.append("    {} <-> {}: {} Mbps".format(w1, w2, bw))
+        for worker in self.physical:
+            rate = self.capacity[worker]["rate"]
+            total = sum(bw for pair, bw in self.traffic.items() if worker in pair)
+            if rate is not None and total > rate:
+                lines.append("    WARNING: {} needs {} Mbps, its NIC carries {} Mbps".format(worker, total, rate))
+        return "\n".join(lines) + "\n"
+
+    def place(self, node):
+        return self.places[node]
+
+
 class BlockMapper(DummyMapper):
     def __init__(self, virtual_topo, physical_topo=[],block=10):
         self.physical = physical_topo
@@ -280,18 +414,25 @@ def place(self, node):
 
 
 class Mapper(object):
-    def __init__(self, virtual_topo, physical_topo, solver=EmbedGreedy):
+    def __init__(self, virtual_topo, physical_topo, solver=EmbedGreedy, cache=True):
         """ virtual_topo: virtual topology to map
             physical_topo: physical topology to map on
-            solver: solver class to use to solve the mapping"""
+            solver: solver class to use to solve the mapping
+            cache: reuse the placement found earlier for the same virtual
+                topology, physical topology and solver (see mapper.cache)"""
         self.virtual_topo =  VirtualNetwork.from_mininet(virtual_topo)
         self.mininet_virtual=virtual_topo
         self.physical_topo = PhysicalNetwork.from_files(physical_topo)
         self.prob = None
         self.solver = solver
-        self.solve()
+        self.places = None
 
-        self.places= self.__places()
+        self.places, self.cached = cached_places(virtual_topo, physical_topo, solver,
+                                                 self.__solvedPlaces, cache=cache)
+
+    def __solvedPlaces(self):
+        self.solve()
+        return self.__places()
 
     def solve(self, solver=None):
         """ Solve the mapping problem of the virtual topology on the physical
@@ -326,6 +467,9 @@ def place(self, node):
             return: name of the physical host to use
         """
         if self.prob == None:
+            if self.places is not None:
+                # placement from the cache
+                return self.places[node]
             self.solve()
 
         place = self.prob.solution.node_info(node)
@@ -337,7 +481,9 @@ def placeLink(self, link):
             link: link in the virtual topology
             returns: list of placements for the link
         """
-        if self.prob == None:
+        if self.prob == None and self.places is None:
+            # nothing to solve when the placement comes from the cache: the
+            # links get no specific placement
             self.solve()
         n1,n2=link
         #p1,p2 = self.prob.solution.node_info(n1),self.prob.solution.node_info(n2)
@@ -349,13 +495,16 @@ class Packing(object):
     def __init__(self, virtual_topo, cloud_prices,solver=BestFitDopProduct):
         """ virtual_topo: virtual topology to map
             physical_topo: physical topology to map on
-            solver: solver class to use to solve the mapping"""
+            solver: solver class to use to solve the mapping
+            The placement is not cached (see mapper.cache): placeLink needs
+            the link mapping of the solved problem"""
         self.virtual_topo =  VirtualNetwork.from_mininet(virtual_topo)
         self.cloud = CloudInstance.read_ec2_instances(vm_type=cloud_prices)
         self.mininet_virtual=virtual_topo
         self.prob = None
 
         self.solver = solver
+        self.cached = False
 
         self.places=self.__places()
 
@@ -411,6 +560,18 @@ def placeLink(self, link):
 
         return place
 
+# mappers by name (dmn --mapper)
+MAPPERS = {"roundRobin": RoundRobinMapper, "block": BlockMapper, "maxinet": MaxinetMapper,
+           "bandwidth": BandwidthMapper, "embeddedGreedy": EmbedGreedy,
+           "embeddedBalanced": EmbedBalanced, "embeddedPartition": EmbedPartition, "random": RandomMapper,
+           "bfdp": BestFitDopProduct, "ffdp": FirstFitDecreasingPriority, "ffod": FirstFitOrderedDeviation}
+# mappers placing the nodes on a list of workers
+WORKER_MAPPERS = ["roundRobin", "block", "random", "maxinet", "bandwidth"]
+# embedding solvers, used through Mapper with the physical infrastructure
+EMBEDDING_MAPPERS = ["embeddedGreedy", "embeddedBalanced", "embeddedPartition"]
+# packing solvers, used through Packing with the cloud instance prices
+PACKING_MAPPERS = ["bfdp", "ffdp", "ffod"]
+
 if __name__ == '__main__':
     #physical = PhysicalNetwork.from_files("/Users/giuseppe/.distrinet/gros_partial")
     virtual_topo = VirtualNetwork.create_fat_tree(k=2, density=2, req_cores=2, req_memory=100,
@@ -0,0 +1,300 @@
+"""
+Graph partitioning backends for the mappers
+
+A graph is given as the weight of each vertex (vertices are numbered from 0)
+and, for each vertex, a dict {neighbor: edge weight}. It is split in parts
+whose weights are proportional to target shares (e.g., the cores of each
+worker), minimizing the weight of the edges between parts.
+
+Backends:
+    PymetisPartitioner: METIS in process (pymetis module)
+    GpmetisPartitioner: gpmetis command with temporary files
+    KLPartitioner: pure Python recursive bisection refined with
+        Kernighan-Lin/Fiduccia-Mattheyses passes (always available)
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+try:
+    import pymetis
+except ImportError:
+    pymetis = None
+
+
+def int_weight(weight):
+    "METIS only takes positive integer weights"
+    return max(1, int(round(weight)))
+
+
+def uniform(shares, tolerance=1e-6):
+    "Are the shares all equal?"
+    return max(shares) - min(shares) <= tolerance * max(shares)
+
+
+def normalize(shares):
+    "Shares scaled to sum to 1"
+    total = float(sum(shares))
+    return [share / total for share in shares]
+
+
+def load_physical(physical_path):
+    """ Reads the physical infrastructure JSON file (conf/gros_partial.json
+        format)
+        physical_path: path of the JSON file (with or without .json)
+        returns: {machine: {"cores": .., "memory": .. (MB), "rate": ..
+            (Mbps, total of its devices)}}"""
+    if not os.path.isfile(physical_path) and os.path.isfile(physical_path + ".json"):
+        physical_path = physical_path + ".json"
+    with open(physical_path, "r") as f:
+        infrastructure = json.load(f)
+    machines = {node["id"]: {"cores": node.get("cores", 1), "memory": node.get("memory"), "rate": 0}
+                for node in infrastructure.get("nodes", [])}
+    for link in infrastructure.get("links", []):
+        for end in ("source", "target"):
+            if link[end] in machines:
+                machines[link[end]]["rate"] += sum(device.get("rate", 0) for device in link.get("devices", []))
+    return machines
+
+
+def physical_shares(physical_path, workers):
+    """ Shares of the workers proportional to their cores in the physical
+        infrastructure JSON file, equal shares for the workers it does not
+        describe
+        physical_path: path of the JSON file (with or without .json)
+        workers: names of the workers
+        returns: list of shares (sum 1), in the order of workers"""
+    cores = {name: machine["cores"] for name, machine in load_physical(physical_path).items()}
+    known = [cores[worker] for worker in workers if worker in cores]
+    default = sum(known) / float(len(known)) if known else 1
+    return normalize([cores.get(worker, default) for worker in workers])
+
+
+def cut_weight(adjacency, parts):
+    "Total weight of the edges between different parts"
+    return sum(w for u, neighbors in enumerate(adjacency)
+               for v, w in neighbors.items() if u < v and parts[u] != parts[v])
+
+
+class Partitioner(object):
+    "Interface of the partitioning backends"
+    name = None
+
+    @classmethod
+    def available(cls):
+        "Can the backend be used here?"
+        return True
+
+    def supports(self, shares):
+        "Can the backend honor the target shares?"
+        return True
+
+    def partition(self, vweights, adjacency, shares):
+        """ Splits the graph
+            vweights: weight of each vertex
+            adjacency: {neighbor: edge weight} of each vertex (symmetric)
+            shares: target share of each part (sum 1)
+            returns: part of each vertex"""
+        raise NotImplementedError()
+
+
+class PymetisPartitioner(Partitioner):
+    "METIS in process, only for equal shares (pymetis has no tpwgts)"
+    name = "pymetis"
+
+    @classmethod
+    def available(cls):
+        return pymetis is not None
+
+    def supports(self, shares):
+        return uniform(shares)
+
+    def partition(self, vweights, adjacency, shares):
+        if len(shares) == 1:
+            return [0] * len(vweights)
+        xadj, adjncy, eweights = [0], [], []
+        for neighbors in adjacency:
+            for v, w in sorted(neighbors.items()):
+                adjncy.append(v)
+                eweights.append(int_weight(w))
+            xadj.append(len(adjncy))
+        _, parts = pymetis.part_graph(len(shares), xadj=xadj, adjncy=adjncy,
+                                      vweights=[int_weight(w) for w in vweights],
+                                      eweights=eweights, recursive=True)
+        return list(parts)
+
+
+class GpmetisPartitioner(Partitioner):
+    "gpmetis command, the graph and the shares in a temporary directory"
+    name = "gpmetis"
+
+    @classmethod
+    def available(cls):
+        return shutil.which("gpmetis") is not None
+
+    def partition(self, vweights, adjacency, shares):
+        if len(shares) == 1:
+            return [0] * len(vweights)
+        nedges = sum(len(neighbors) for neighbors in adjacency) // 2
+        with tempfile.TemporaryDirectory(prefix="distrinet-metis-") as tmp:
+            graph_path = os.path.join(tmp, "graph")
+            share_path = os.path.join(tmp, "shares")
+            with open(graph_path, "w") as f:
+                f.write("{} {} 011\n".format(len(vweights), nedges))
+                for weight, neighbors in zip(vweights, adjacency):
+                    line = [int_weight(weight)]
+                    for v, w in sorted(neighbors.items()):
+                        line += [v + 1, int_weight(w)]
+                    f.write(" ".join(str(x) for x in line) + "\n")
+            with open(share_path, "w") as f:
+                for part, share in enumerate(shares):
+                    f.write("{} = {}\n".format(part, share))
+            subprocess.check_output(["gpmetis", "-ptype=rb", "-tpwgts={}".format(share_path),
+                                     graph_path, str(len(shares))])
+            with open("{}.part.{}".format(graph_path, len(shares)), "r") as f:
+                return [int(line) for line in f if line.strip()]
+
+
+class KLPartitioner(Partitioner):
+    """ Recursive bisection: each bisection grows the first side from a
+        peripheral vertex up to its share and is then refined by
+        Kernighan-Lin/Fiduccia-Mattheyses passes (moves of single boundary
+        vertices, keeping the best prefix of each pass)"""
+    name = "kl"
+
+    def __init__(self, passes=8, imbalance=0.03):
+        """ passes: maximum refinement passes per bisection
+            imbalance: tolerated relative imbalance of a side"""
+        self.passes = passes
+        self.imbalance = imbalance
+
+    def partition(self, vweights, adjacency, shares):
+        parts = [0] * len(vweights)
+        self._split(list(range(len(vweights))), list(range(len(shares))),
+                    vweights, adjacency, shares, parts)
+        return parts
+
+    def _split(self, vertices, partIds, vweights, adjacency, shares, parts):
+        "Assigns vertices to the parts partIds"
+        if len(partIds) == 1 or not vertices:
+            for u in vertices:
+                parts[u] = partIds[0]
+            return
+        half = len(partIds) // 2
+        left, right = partIds[:half], partIds[half:]
+        fraction = sum(shares[p] for p in left) / float(sum(shares[p] for p in partIds))
+        side = self._bisect(vertices, vweights, adjacency, fraction)
+        self._split([u for u in vertices if side[u] == 0], left, vweights, adjacency, shares, parts)
+        self._split([u for u in vertices if side[u] == 1], right, vweights, adjacency, shares, parts)
+
+    def _bisect(self, vertices, vweights, adjacency, fraction):
+        "Returns {vertex: 0 or 1}, side 0 weighing fraction of the vertices"
+        inside = set(vertices)
+        total = float(sum(vweights[u] for u in vertices))
+        target = total * fraction
+        slack = max(self.imbalance * total, max(vweights[u] for u in vertices))
+        side = self._grow(vertices, inside, vweights, adjacency, target)
+        for _ in range(self.passes):
+            if not self._refine(vertices, inside, vweights, adjacency, side, target, slack):
+                break
+        return side
+
+    def _grow(self, vertices, inside, vweights, adjacency, target):
+        "Greedy graph growing of side 0 up to the target weight"
+        side = {u: 1 for u in vertices}
+        # gain of moving a vertex to side 0: edges to side 0 - edges to side 1
+        gain = {u: -sum(w for v, w in adjacency[u].items() if v in inside) for u in vertices}
+        frontier = set()
+        weight = 0
+        seed = self._peripheral(vertices, inside, adjacency)
+        while weight < target:
+            if not frontier:
+                candidates = [u for u in vertices if side[u] == 1]
+                if not candidates:
+                    break
+                frontier.add(seed if side.get(seed) == 1 else candidates[0])
+            u = max(frontier, key=lambda x: (gain[x], -x))
+            frontier.discard(u)
+            if weight + vweights[u] / 2.0 > target and weight > 0:
+                break
+            side[u] = 0
+            weight += vweights[u]
+            for v, w in adjacency[u].items():
+                if v in inside and side[v] == 1:
+                    gain[v] += 2 * w
+                    frontier.add(v)
+        return side
+
+    def _peripheral(self, vertices, inside, adjacency):
+        "Last vertex reached by a breadth-first search (far from the center)"
+        last = vertices[0]
+        seen = {last}
+        queue = [last]
+        while queue:
+            nextQueue = []
+            for u in queue:
+                last = u
+                for v in adjacency[u]:
+                    if v in inside and v not in seen:
+                        seen.add(v)
+                        nextQueue.append(v)
+            queue = nextQueue
+        return last
+
+    def _refine(self, vertices, inside, vweights, adjacency, side, target, slack):
+        "One refinement pass, returns True if the cut improved"
+        # gain of moving a vertex to the other side
+        gain = {}
+        for u in vertices:
+            gain[u] = sum(w if side[v] != side[u] else -w
+                          for v, w in adjacency[u].items() if v in inside)
+        weight = sum(vweights[u] for u in vertices if side[u] == 0)
+        locked = set()
+        moves = []
+        total = best = 0
+        bestMoves = 0
+        while True:
+            candidates = [u for u in vertices if u not in locked and
+                          abs(weight + (vweights[u] if side[u] == 1 else -vweights[u]) - target) <= slack]
+            if not candidates:
+                break
+            u = max(candidates, key=lambda x: (gain[x], -x))
+            locked.add(u)
+            weight += vweights[u] if side[u] == 1 else -vweights[u]
+            side[u] = 1 - side[u]
+            total += gain[u]
+            moves.append(u)
+            gain[u] = -gain[u]
+            for v, w in adjacency[u].items():
+                if v in inside and v != u:
+                    gain[v] += 2 * w if side[v] != side[u] else -2 * w
+            if total > best:
+                best, bestMoves = total, len(moves)
+        # undo the moves after the best prefix
+        for u in moves[bestMoves:]:
+            side[u] = 1 - side[u]
+        return best > 0
+
+
+# backends in order of preference
+PARTITIONERS = [PymetisPartitioner, GpmetisPartitioner, KLPartitioner]
+
+
+def get_partitioner(shares, backend=None):
+    """ Returns the partitioner to use
+        shares: target shares of the parts
+        backend: name of the backend (None: the first available one that
+            honors the shares)"""
+    for cls in PARTITIONERS:
+        if backend is not None and cls.name != backend:
+            continue
+        if not cls.available():
+            if backend is not None:
+                raise RuntimeError("partitioner {} is not available".format(backend))
+            continue
+        partitioner = cls()
+        if backend is not None or partitioner.supports(shares):
+            return partitioner
+    raise ValueError("unknown partitioner {}".format(backend))
@@ -0,0 +1,158 @@
+"""
+Name resolution of the LXC machines, shared by all the nodes and links
+
+The IPv4 address of a machine is the one seen by the master (i.e., the
+first address returned by `getent ahostsv4` on the master). Resolutions are
+cached so that each name is looked up only once (or once per `ttl`).
+"""
+import re
+import time
+from asyncio.events import _get_running_loop
+
+class NameResolver(object):
+    """
+    Cache of the IPv4 address of the LXC machines, as resolved by the master
+
+    Attributes
+    ----------
+    ttl : float
+        number of seconds a resolution stays valid. If None, resolutions
+        never expire.
+    cache : dict
+        (IP address, time of the resolution) for each name
+    """
+    ipMatchRegex = re.compile(r'\d+\.\d+\.\d+\.\d+')
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl
+        self.cache = {}
+
+    @classmethod
+    def literal(cls, name):
+        """
+        Returns the IP address contained in `name` if `name` is an IP
+        address, None otherwise
+        """
+        ipmatch = cls.ipMatchRegex.findall(name)
+        return ipmatch[0] if ipmatch else None
+
+    def get(self, name):
+        """
+        Returns the cached IP address of `name`, None if `name` is not in
+        the cache or if its resolution expired
+        """
+        ip = self.literal(name)
+        if ip:
+            return ip
+        entry = self.cache.get(name)
+        if entry is None:
+            return None
+        ip, resolved = entry
+        if self.ttl is not None and time.monotonic() - resolved > self.ttl:
+            del self.cache[name]
+            return None
+        return ip
+
+    def set(self, name, ip):
+        """
+        Caches the IP address of `name` (unresolved names are not cached so
+        that they are looked up again later)
+        """
+        if ip:
+            self.cache[name] = (ip, time.monotonic())
+
+    def invalidate(self, name=None):
+        """
+        Removes `name` from the cache (all names if None)
+        """
+        if name is None:
+            self.cache.clear()
+        else:
+            self.cache.pop(name, None)
+
+    def first(self, output):
+        """
+        Returns the first IP address of the `getent` `output` (None if there
+        is none)
+        """
+        ips = self.ipMatchRegex.findall(output)
+        return ips[0] if ips else None
+
+    def resolve(self, ssh, name):
+        """
+        Returns the IP address of `name`, looked up with `ssh` (connection
+        with the master) if not cached. Blocking: from the asyncio loop of
+        `ssh`, use `aresolve` or `prefetch` instead.
+
+        Parameters
+        ----------
+        ssh : ASsh
+            connection with the master
+        name : str
+            name to resolve
+
+        Returns
+        -------
+        str
+            IP address of `name` (None if it cannot be resolved)
+
+        Raises
+        ------
+        RuntimeError
+            if `name` is not cached and the call is made from the asyncio
+            loop of `ssh` (waiting for the lookup would dead-lock the loop)
+        """
+        ip = self.get(name)
+        if ip is None:
+            if _get_running_loop() is ssh.loop:
+                raise RuntimeError("{} is not resolved yet and cannot be looked up from the asyncio loop".format(name))
+            ip = self.first(ssh.cmd('getent ahostsv4 {}'.format(name)))
+            self.set(name, ip)
+        return ip
+
+    async def aresolve(self, ssh, name):
+        """
+        Same as `resolve` but must run in the asyncio loop of `ssh`
+        """
+        ip = self.get(name)
+        if ip is None:
+            ip = self.first(await ssh._run('getent ahostsv4 {}'.format(name)))
+            self.set(name, ip)
+        return ip
+
+    def command(self, names):
+        """
+        Returns the command printing "name IP" for each name of `names`
+        """
+        return ('for name in {}; do echo "$name $(getent ahostsv4 $name | head -n 1 | cut -d" " -f1)"; done'
+                .format(" ".join(names)))
+
+    async def prefetch(self, ssh, names):
+        """
+        Resolves all the `names` that are not cached with a single command
+        on the master. Must run in the asyncio loop of `ssh`.
+
+        Parameters
+        ----------
+        ssh : ASsh
+            connection with the master
+        names : iterable
+            names to resolve
+
+        Returns
+        -------
+        dict
+            IP address of each name (None if it cannot be resolved)
+        """
+        # the result does not depend on the ttl (it may be shorter than
+        # the lookup itself)
+        ips = {name: self.get(name) for name in set(names)}
+        missing = [name for name, ip in ips.items() if ip is None]
+        if missing:
+            output = await ssh._run(self.command(missing))
+            for line in output.splitlines():
+                fields = line.split()
+                if len(fields) == 2 and fields[0] in ips:
+                    ips[fields[0]] = fields[1]
+                    self.set(fields[0], fields[1])
+        return ips
@@ -8,6 +8,7 @@
 from select import poll, POLLIN, POLLHUP
 from subprocess import call, check_call, Popen, PIPE, STDOUT
 import re
+import json
 from fcntl import fcntl, F_GETFL, F_SETFL
 from os import O_NONBLOCK
 import os
@@ -693,3 +694,13 @@ def waitListening( client=None, server='127.0.0.1', port=80, timeout=None ):
         time += .5
         result = runCmd( cmd )
     return True
+
+def writeJson( path, data, **kwargs ):
+    """Write data as JSON in the file path through a temporary file that
+       replaces path once complete, so that path is never left truncated
+       (e.g., when interrupted)
+       kwargs: options of json.dump (e.g., indent)"""
+    tmp = '%s.tmp' % path
+    with open( tmp, 'w' ) as f:
+        json.dump( data, f, **kwargs )
+    os.replace( tmp, path )
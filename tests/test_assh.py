@@ -0,0 +1,127 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+try:
+    from mininet.assh import ASshPool, CommandBatch, PooledConnection
+except ImportError:
+    # assh needs asyncssh
+    ASshPool = None
+
+
+class FakeConnection(object):
+    def __init__(self):
+        self.closed = 0
+
+    def close(self):
+        self.closed += 1
+
+
+class FakeSsh(object):
+    host = "target1"
+    port = 22
+    username = "root"
+    bastion = None
+
+
+@unittest.skipIf(ASshPool is None, "asyncssh is not installed")
+class ASshPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.pool = ASshPool(self.loop)
+        self.ssh = FakeSsh()
+        self.pooled = PooledConnection(FakeConnection(), maxChannels=10)
+        self.pooled.users.add(self.ssh)
+        self.pool.connections[ASshPool.key(self.ssh)] = [self.pooled]
+
+    def tearDown(self):
+        self.loop.close()
+
+    def test_release(self):
+        other = FakeSsh()
+        self.pooled.users.add(other)
+        self.pool.release(other, self.pooled)
+        self.assertEqual(self.pool.connections[ASshPool.key(self.ssh)], [self.pooled])
+        self.assertEqual(self.pooled.conn.closed, 0)
+
+        self.pool.release(self.ssh, self.pooled)
+        self.assertEqual(self.pool.connections[ASshPool.key(self.ssh)], [])
+        self.assertTrue(self.pooled.closed)
+
+    def test_release_after_close(self):
+        self.pool.close()
+        self.pool.release(self.ssh, self.pooled)
+        self.assertTrue(self.pooled.closed)
+
+    def test_release_dropped(self):
+        self.pool.connections[ASshPool.key(self.ssh)] = []
+        self.pool.release(self.ssh, self.pooled)
+        self.assertTrue(self.pooled.closed)
+
+
+@unittest.skipIf(ASshPool is None, "asyncssh is not installed")
+@unittest.skipIf(shutil.which("bash") is None, "bash is not installed")
+class CommandBatchTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_script(self, batch, units):
+        return subprocess.run(["bash", "-s"], input=batch.script(units), cwd=self.dir,
+                              stdout=subprocess.PIPE, universal_newlines=True, timeout=30)
+
+    def unit(self, i, fail=False):
+        # each unit logs when it starts and ends
+        return "echo start >> log; sleep 0.05; echo end >> log; echo {}; {}".format(i, "false" if fail else "true")
+
+    def concurrency(self):
+        # highest number of units running at the same time
+        running = highest = 0
+        with open(os.path.join(self.dir, "log")) as f:
+            for line in f:
+                running += 1 if line.strip() == "start" else -1
+                highest = max(highest, running)
+        return highest
+
+    def test_sequential(self):
+        result = self.run_script(CommandBatch(), [self.unit(i) for i in range(4)])
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.split(), ["0", "1", "2", "3"])
+        self.assertEqual(self.concurrency(), 1)
+
+    def test_parallelism(self):
+        result = self.run_script(CommandBatch(parallelism=3), [self.unit(i) for i in range(12)])
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(sorted(result.stdout.split(), key=int), [str(i) for i in range(12)])
+        self.assertLessEqual(self.concurrency(), 3)
+        self.assertGreater(self.concurrency(), 1)
+
+    def test_sequential_failure(self):
+        result = self.run_script(CommandBatch(), [self.unit(0, fail=True), self.unit(1)])
+        self.assertEqual(result.returncode, 1)
+        # the other units still run
+        self.assertEqual(result.stdout.split(), ["0", "1"])
+
+    def test_parallel_failure(self):
+        # a unit failing early, before the others are waited for
+        units = [self.unit(0, fail=True)] + [self.unit(i) for i in range(1, 8)]
+        result = self.run_script(CommandBatch(parallelism=100), units)
+        self.assertEqual(result.returncode, 1)
+        self.assertEqual(len(result.stdout.split()), 8)
+
+        result = self.run_script(CommandBatch(parallelism=2), [self.unit(i) for i in range(7)] + [self.unit(7, fail=True)])
+        self.assertEqual(result.returncode, 1)
+
+    def test_appended(self):
+        # commands can be appended to the script of the batch
+        batch = CommandBatch(parallelism=2)
+        script = batch.script([self.unit(0, fail=True)]) + "echo done\n"
+        result = subprocess.run(["bash", "-s"], input=script, cwd=self.dir,
+                                stdout=subprocess.PIPE, universal_newlines=True, timeout=30)
+        self.assertEqual(result.returncode, 0)
+        self.assertEqual(result.stdout.split(), ["0", "done"])
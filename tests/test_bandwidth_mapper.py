@@ -0,0 +1,120 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.topodc import FatTreeTopo
+
+try:
+    from mininet.mapper.mapper import BandwidthMapper, RoundRobinMapper, parse_memory
+except ImportError:
+    # the mapper module needs distriopt
+    BandwidthMapper = None
+
+WORKERS = ["w1", "w2", "w3", "w4"]
+
+
+def fat_tree(cpu=None, memory=None):
+    "k=4 fat-tree, 1 Gbps to the hosts and 10 Gbps between switches"
+    topo = FatTreeTopo(k=4)
+    hosts = set(topo.hosts())
+    for src, dst, info in topo.links(withInfo=True):
+        info["bw"] = 1000 if src in hosts or dst in hosts else 10000
+    for node in topo.nodes():
+        if cpu is not None:
+            topo.nodeInfo(node)["cpu"] = cpu
+        if memory is not None:
+            topo.nodeInfo(node)["memory"] = memory
+    return topo
+
+
+def cut(topo, places):
+    return sum(info["bw"] for src, dst, info in topo.links(withInfo=True) if places[src] != places[dst])
+
+
+@unittest.skipIf(BandwidthMapper is None, "distriopt is not installed")
+class ParseMemoryTestCase(unittest.TestCase):
+    def test_units(self):
+        self.assertEqual(parse_memory(None), 0)
+        self.assertEqual(parse_memory(300), 300)
+        self.assertEqual(parse_memory("512MB"), 512)
+        self.assertEqual(parse_memory("2GB"), 2048)
+        self.assertEqual(parse_memory("1 GiB"), 1024)
+        self.assertEqual(parse_memory("512K"), 0.5)
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_memory("a lot")
+
+
+@unittest.skipIf(BandwidthMapper is None, "distriopt is not installed")
+class BandwidthMapperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def physical(self, cores, memory=65536, rate=10000):
+        path = os.path.join(self.dir, "infra")
+        with open(path + ".json", "w") as f:
+            json.dump({"nodes": [{"id": w, "cores": cores, "memory": memory} for w in WORKERS],
+                       "links": [{"source": w, "target": "gw", "devices": [{"rate": rate}]}
+                                 for w in WORKERS]}, f)
+        return path
+
+    def loads(self, topo, mapper):
+        loads = {w: 0.0 for w in WORKERS}
+        for node in topo.nodes():
+            loads[mapper.place(node)] += mapper.cores[node]
+        return loads
+
+    def test_lower_cut_than_round_robin(self):
+        topo = fat_tree()
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS)
+        self.assertEqual(sorted(mapper.places), sorted(topo.nodes()))
+        self.assertEqual(mapper.cut_bandwidth(), cut(topo, mapper.places))
+        robin = RoundRobinMapper(virtual_topo=topo, physical_topo=WORKERS)
+        self.assertLess(mapper.cut_bandwidth(), cut(topo, robin.places))
+
+    def test_even_split_with_slack(self):
+        topo = fat_tree()
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS, slack=0.1)
+        for worker, load in self.loads(topo, mapper).items():
+            self.assertLessEqual(load, 36 / 4.0 * 1.1)
+
+    def test_capacity_of_the_infrastructure(self):
+        topo = fat_tree(cpu=1)
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS,
+                                 physical_path=self.physical(cores=16))
+        for worker, load in self.loads(topo, mapper).items():
+            self.assertLessEqual(load, 16)
+            self.assertEqual(mapper.capacity[worker]["rate"], 10000)
+
+    def test_overcommit(self):
+        # 36 cores needed, 16 available: every worker is overcommitted as much
+        topo = fat_tree(cpu=1)
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS,
+                                 physical_path=self.physical(cores=4), slack=0.1)
+        self.assertAlmostEqual(mapper.capacity["w1"]["cores"], 4 * 36 / 16.0 * 1.1)
+        self.assertEqual(sorted(mapper.places), sorted(topo.nodes()))
+
+    def test_memory_limit(self):
+        topo = fat_tree(memory="1GB")
+        with self.assertRaises(ValueError):
+            BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS,
+                            physical_path=self.physical(cores=16, memory=4096))
+
+    def test_report_warns_about_the_nics(self):
+        topo = fat_tree()
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS,
+                                 physical_path=self.physical(cores=16, rate=100))
+        self.assertIn("WARNING", mapper.report())
+        mapper = BandwidthMapper(virtual_topo=topo, physical_topo=WORKERS,
+                                 physical_path=self.physical(cores=16, rate=10 ** 6))
+        self.assertNotIn("WARNING", mapper.report())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mininet.topolib import TreeTopo
+
+try:
+    from mininet.mapper import benchmark
+    from mininet.mapper.partition import load_physical
+except ImportError:
+    # the mapper module needs distriopt
+    benchmark = None
+
+
+class StubMapper(object):
+    "Places the nodes in turn on the workers, printing like BlockMapper"
+    def __init__(self, topo, workers, skip=0):
+        print("stub mapper")
+        nodes = sorted(topo.nodes())[skip:]
+        self.places = {node: workers[i % len(workers)] for i, node in enumerate(nodes)}
+
+
+@unittest.skipIf(benchmark is None, "distriopt is not installed")
+class BenchmarkTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = benchmark.write_infrastructure(self.dir, "2x8", 2, 8, 16384.0, 10000.0)
+        self.machines = load_physical(self.path)
+        self.workers = sorted(self.machines)
+        self.topo = benchmark.build_topology(TreeTopo, {"depth": 1, "fanout": 4})
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_stub(self, **kwargs):
+        def make_mapper(name, topo, workers, physical_path):
+            return StubMapper(topo, workers, **kwargs)
+        with mock.patch.object(benchmark, "make_mapper", make_mapper):
+            return benchmark.run("stub", self.topo, self.workers, self.path, self.machines)
+
+    def test_record(self):
+        record = self.run_stub()
+        self.assertEqual(set(record), {"mapper", "status", "time", "memory",
+                                       "cross_links", "cut_bw", "max_load", "max_nodes"})
+        self.assertEqual(record["mapper"], "stub")
+        self.assertEqual(record["status"], "ok")
+        self.assertGreaterEqual(record["time"], 0)
+        self.assertGreaterEqual(record["memory"], 0)
+        # h1 h2 h3 h4 s1 on w0 w1 w0 w1 w0: the links of s1 to h2 and h4 cross
+        self.assertEqual(record["cross_links"], 2)
+        self.assertEqual(record["cut_bw"], 2 * benchmark.HOST_BW)
+        self.assertEqual(record["max_nodes"], 3)
+        self.assertEqual(record["max_load"], round(3 / 8, 3))
+        self.assertTrue(set(record) <= set(benchmark.FIELDS))
+
+    def test_missing_nodes(self):
+        record = self.run_stub(skip=1)
+        self.assertEqual(record["status"], "error")
+        self.assertTrue(record["error"].startswith("ValueError: 1 nodes not placed"))
+
+    def test_stdout(self):
+        # what the mapper prints does not go to stdout (JSON results)
+        with mock.patch("sys.stdout") as stdout:
+            self.run_stub()
+        stdout.write.assert_not_called()
+
+    def test_packing_not_run(self):
+        name = benchmark.PACKING_MAPPERS[0]
+        with mock.patch.object(benchmark, "run") as run, mock.patch("sys.stderr"):
+            results = benchmark.benchmark(mappers=[name], infrastructures=benchmark.INFRASTRUCTURES[:1])
+        self.assertEqual(results, [])
+        run.assert_not_called()
+
+    def test_not_implemented(self):
+        # a failing mapper is an error, whatever the exception
+        def make_mapper(name, topo, workers, physical_path):
+            raise NotImplementedError("solver")
+        with mock.patch.object(benchmark, "make_mapper", make_mapper):
+            record = benchmark.run("stub", self.topo, self.workers, self.path, self.machines)
+        self.assertEqual(record["status"], "error")
+        self.assertEqual(record["error"], "NotImplementedError: solver")
@@ -0,0 +1,97 @@
+import os
+import re
+import shutil
+import stat
+import subprocess
+import tempfile
+import unittest
+
+try:
+    from mininet.dclean import DEVICES_REGEX, DISTRINET_TAG, cleanScript, parseCleanOutput
+except ImportError:
+    # dclean needs asyncssh
+    cleanScript = None
+
+# ip -o link show of a worker
+LINKS = """1: lo: <LOOPBACK,UP,LOWER_UP> mtu 65536 qdisc noqueue state UNKNOWN mode DEFAULT\\    link/loopback 00:00:00:00:00:00
+2: eth0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc mq state UP mode DEFAULT\\    link/ether 52:54:00:12:34:56
+3: admin-br: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1450 qdisc noqueue state UP mode DEFAULT\\    link/ether 1a:2b:3c:4d:5e:6f
+4: vx_21: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1450 qdisc noqueue master admin-br state UNKNOWN\\    link/ether 2a:2b:3c:4d:5e:6f
+5: intf3: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP mode DEFAULT\\    link/ether 3a:2b:3c:4d:5e:6f
+6: vintf3@vintf4: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue master intf3 state UP\\    link/ether 4a:2b:3c:4d:5e:6f
+7: vintf4@vintf3: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue master intf4 state UP\\    link/ether 5a:2b:3c:4d:5e:6f
+8: lxdbr0: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP mode DEFAULT\\    link/ether 6a:2b:3c:4d:5e:6f
+9: vx_lan: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1450 qdisc noqueue state UNKNOWN\\    link/ether 7a:2b:3c:4d:5e:6f
+10: myintf1: <BROADCAST,MULTICAST,UP,LOWER_UP> mtu 1500 qdisc noqueue state UP\\    link/ether 8a:2b:3c:4d:5e:6f
+"""
+
+FAKE_IP = """#!/bin/bash
+if [ "$1" = "-o" ]; then
+    cat "$(dirname "$0")/links"
+elif [ "$1 $2" = "link delete" ]; then
+    echo "$3" >> "$(dirname "$0")/deleted"
+fi
+"""
+
+FAKE_LXC = """#!/bin/bash
+if [ "$1" = "list" ]; then
+    [ "$2" = "{tag}=true" ] && printf "h1\\nh2\\ns1\\n"
+elif [ "$1" = "delete" ]; then
+    [ "$2" != "h2" ]
+fi
+"""
+
+
+@unittest.skipIf(cleanScript is None, "asyncssh is not installed")
+class DevicesRegexTestCase(unittest.TestCase):
+    def test_distrinet_devices(self):
+        for name in ["admin-br", "vx_1", "vx_21", "intf3", "vintf3", "vintf12"]:
+            self.assertTrue(re.match(DEVICES_REGEX, name), name)
+
+    def test_other_devices(self):
+        for name in ["lo", "eth0", "lxdbr0", "vx_lan", "vx_", "intf", "myintf1", "intf3x",
+                     "admin-br0", "vvintf1", "veth1234"]:
+            self.assertFalse(re.match(DEVICES_REGEX, name), name)
+
+
+@unittest.skipIf(cleanScript is None, "asyncssh is not installed")
+class ParseCleanOutputTestCase(unittest.TestCase):
+    def test_parse(self):
+        output = "container h1\ncontainer s1\ndevice admin-br\ndevice vx_21\n"
+        self.assertEqual(parseCleanOutput(output), (["h1", "s1"], ["admin-br", "vx_21"]))
+
+    def test_noise(self):
+        # errors and unknown lines are ignored
+        output = "Error: not found\ncontainer h1\ndevice\nnetwork lxdbr0\ncontainer a b\n\n"
+        self.assertEqual(parseCleanOutput(output), (["h1"], []))
+
+    def test_empty(self):
+        self.assertEqual(parseCleanOutput(""), ([], []))
+
+
+@unittest.skipIf(cleanScript is None, "asyncssh is not installed")
+@unittest.skipIf(shutil.which("bash") is None, "bash is not installed")
+class CleanScriptTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        for name, content in [("ip", FAKE_IP), ("lxc", FAKE_LXC.format(tag=DISTRINET_TAG))]:
+            path = os.path.join(self.dir, name)
+            with open(path, "w") as f:
+                f.write(content)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+        with open(os.path.join(self.dir, "links"), "w") as f:
+            f.write(LINKS)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_script(self):
+        env = dict(os.environ, PATH="{}:{}".format(self.dir, os.environ["PATH"]))
+        result = subprocess.run(["bash", "-s"], input=cleanScript(parallelism=2), env=env,
+                                stdout=subprocess.PIPE, universal_newlines=True, timeout=30)
+        containers, devices = parseCleanOutput(result.stdout)
+        # the deletion of h2 failed
+        self.assertEqual(sorted(containers), ["h1", "s1"])
+        self.assertEqual(devices, ["admin-br", "vx_21", "intf3", "vintf3", "vintf4"])
+        with open(os.path.join(self.dir, "deleted")) as f:
+            self.assertEqual(f.read().split(), devices)
@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from mininet.topo import Topo
+from mininet.mapper import cache
+
+try:
+    import distriopt
+except ImportError:
+    distriopt = None
+
+
+def make_topo(bw=100, cpu=1, reverse=False):
+    topo = Topo()
+    names = ["h1", "h2", "s1"]
+    for name in reversed(names) if reverse else names:
+        if name.startswith("h"):
+            topo.addHost(name, cpu=cpu)
+        else:
+            topo.addSwitch(name)
+    topo.addLink("h1", "s1", bw=bw)
+    topo.addLink("h2", "s1", bw=bw)
+    return topo
+
+
+class Solver(object):
+    "Embedding solver counting its solves"
+    solves = 0
+
+    def __init__(self, virtual, physical):
+        self.solution = self
+
+    def solve(self):
+        Solver.solves += 1
+        return 0.1, 1
+
+    def node_info(self, node):
+        return "w1" if node == "h1" else "w2"
+
+
+class MappingKeyTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.physical = os.path.join(self.dir, "infra")
+        self.writePhysical(cores=8)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def writePhysical(self, cores):
+        with open(self.physical + ".json", "w") as f:
+            json.dump({"nodes": [{"id": "w1", "cores": cores}, {"id": "w2", "cores": cores}],
+                       "links": []}, f)
+
+    def test_key_is_stable(self):
+        key = cache.mapping_key(make_topo(), self.physical, Solver)
+        self.assertEqual(key, cache.mapping_key(make_topo(), self.physical, Solver))
+        # the order in which the nodes were added does not matter
+        self.assertEqual(key, cache.mapping_key(make_topo(reverse=True), self.physical, Solver))
+        # with or without .json
+        self.assertEqual(key, cache.mapping_key(make_topo(), self.physical + ".json", Solver))
+
+    def test_key_changes_with_the_topology(self):
+        key = cache.mapping_key(make_topo(), self.physical, Solver)
+        self.assertNotEqual(key, cache.mapping_key(make_topo(bw=1000), self.physical, Solver))
+        self.assertNotEqual(key, cache.mapping_key(make_topo(cpu=2), self.physical, Solver))
+        topo = make_topo()
+        topo.addLink("h1", "h2")
+        self.assertNotEqual(key, cache.mapping_key(topo, self.physical, Solver))
+
+    def test_key_changes_with_the_infrastructure(self):
+        key = cache.mapping_key(make_topo(), self.physical, Solver)
+        self.writePhysical(cores=16)
+        self.assertNotEqual(key, cache.mapping_key(make_topo(), self.physical, Solver))
+        self.assertNotEqual(cache.mapping_key(make_topo(), ["w1", "w2"], Solver),
+                            cache.mapping_key(make_topo(), ["w1", "w2", "w3"], Solver))
+
+    def test_key_changes_with_the_solver(self):
+        class OtherSolver(Solver):
+            pass
+        self.assertNotEqual(cache.mapping_key(make_topo(), self.physical, Solver),
+                            cache.mapping_key(make_topo(), self.physical, OtherSolver))
+
+
+class MappingStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_round_trip(self):
+        places = {"h1": "w1", "h2": ("m5.large", 0)}
+        cache.save_mapping("k", places, cache_dir=self.dir)
+        self.assertEqual(cache.load_mapping("k", cache_dir=self.dir), places)
+        self.assertEqual(os.listdir(self.dir), ["k.json"])
+
+    def test_missing_or_other_version(self):
+        self.assertIsNone(cache.load_mapping("k", cache_dir=self.dir))
+        with open(os.path.join(self.dir, "k.json"), "w") as f:
+            json.dump({"version": cache.CACHE_VERSION + 1, "places": {"h1": "w1"}}, f)
+        self.assertIsNone(cache.load_mapping("k", cache_dir=self.dir))
+
+    def test_cached_places(self):
+        computed = []
+
+        def compute():
+            computed.append(1)
+            return {"h1": "w1"}
+
+        with mock.patch.object(cache, "CACHE_DIR", self.dir):
+            self.assertEqual(cache.cached_places(make_topo(), ["w1"], Solver, compute),
+                             ({"h1": "w1"}, False))
+            self.assertEqual(cache.cached_places(make_topo(), ["w1"], Solver, compute),
+                             ({"h1": "w1"}, True))
+            self.assertEqual(cache.cached_places(make_topo(bw=10), ["w1"], Solver, compute)[1], False)
+            self.assertEqual(cache.cached_places(make_topo(), ["w1"], Solver, compute, cache=False)[1],
+                             False)
+        self.assertEqual(len(computed), 3)
+
+
+@unittest.skipIf(distriopt is None, "distriopt is not installed")
+class MapperCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        from mininet.mapper import mapper
+        self.dir = tempfile.mkdtemp()
+        self.patches = [mock.patch.object(cache, "CACHE_DIR", self.dir),
+                        mock.patch.object(mapper.VirtualNetwork, "from_mininet", lambda topo: topo),
+                        mock.patch.object(mapper.PhysicalNetwork, "from_files", lambda path: path)]
+        for patch in self.patches:
+            patch.start()
+        Solver.solves = 0
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+        shutil.rmtree(self.dir)
+
+    def test_cache_hit_does_not_solve(self):
+        from mininet.mapper.mapper import Mapper
+        first = Mapper(make_topo(), "infra", solver=Solver)
+        self.assertFalse(first.cached)
+        self.assertEqual(Solver.solves, 1)
+
+        mapper = Mapper(make_topo(), "infra", solver=Solver)
+        self.assertTrue(mapper.cached)
+        self.assertEqual(mapper.places, first.places)
+        # Distrinet.addLink places every link
+        for link in make_topo().links():
+            self.assertEqual(mapper.placeLink(link), ({}, {}))
+        self.assertEqual(mapper.place("h2"), "w2")
+        self.assertEqual(Solver.solves, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
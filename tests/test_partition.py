@@ -0,0 +1,135 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mininet.mapper import partition
+from mininet.mapper.partition import (KLPartitioner, PymetisPartitioner, cut_weight,
+                                      get_partitioner, physical_shares, load_physical)
+
+
+def cliques(count, size, bridge=1):
+    """ count cliques of size vertices (edges of weight 10) in a ring, the
+        cliques joined by edges of weight bridge
+        returns: vertex weights, adjacency"""
+    n = count * size
+    adjacency = [{} for _ in range(n)]
+
+    def link(u, v, w):
+        adjacency[u][v] = adjacency[v][u] = w
+
+    for c in range(count):
+        first = c * size
+        for u in range(first, first + size):
+            for v in range(u + 1, first + size):
+                link(u, v, 10)
+        if count > 1:
+            link(first, ((c + 1) % count) * size + 1, bridge)
+    return [1] * n, adjacency
+
+
+def part_weights(parts, vweights, count):
+    weights = [0] * count
+    for part, weight in zip(parts, vweights):
+        weights[part] += weight
+    return weights
+
+
+class HelpersTestCase(unittest.TestCase):
+    def test_weights_and_shares(self):
+        self.assertEqual(partition.int_weight(0.2), 1)
+        self.assertEqual(partition.int_weight(2.6), 3)
+        self.assertTrue(partition.uniform([0.25] * 4))
+        self.assertFalse(partition.uniform([0.5, 0.25, 0.25]))
+        self.assertEqual(partition.normalize([1, 3]), [0.25, 0.75])
+
+    def test_cut_weight(self):
+        vweights, adjacency = cliques(2, 3, bridge=4)
+        # a ring of two cliques: two bridges
+        self.assertEqual(cut_weight(adjacency, [0, 0, 0, 1, 1, 1]), 8)
+        self.assertEqual(cut_weight(adjacency, [0] * 6), 0)
+
+
+class PhysicalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "infra")
+        with open(self.path + ".json", "w") as f:
+            json.dump({"nodes": [{"id": "w1", "cores": 8, "memory": 1024},
+                                 {"id": "w2", "cores": 24, "memory": 2048},
+                                 {"id": "gw"}],
+                       "links": [{"source": "w1", "target": "gw",
+                                  "devices": [{"rate": 1000}, {"rate": 1000}]},
+                                 {"source": "gw", "target": "w2", "devices": [{"rate": 10000}]}]}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_physical(self):
+        machines = load_physical(self.path)
+        self.assertEqual(machines["w1"], {"cores": 8, "memory": 1024, "rate": 2000})
+        self.assertEqual(machines["w2"]["rate"], 10000)
+        self.assertEqual(machines["gw"]["cores"], 1)
+
+    def test_physical_shares(self):
+        self.assertEqual(physical_shares(self.path, ["w1", "w2"]), [0.25, 0.75])
+        # a worker the file does not describe gets the mean of the others
+        for share, expected in zip(physical_shares(self.path, ["w1", "w2", "w3"]), [8, 24, 16]):
+            self.assertAlmostEqual(share, expected / 48.0)
+
+
+class KLPartitionerTestCase(unittest.TestCase):
+    def test_finds_the_bridges(self):
+        vweights, adjacency = cliques(4, 6)
+        parts = KLPartitioner().partition(vweights, adjacency, [0.25] * 4)
+        self.assertEqual(part_weights(parts, vweights, 4), [6] * 4)
+        # each clique in its own part: only the 4 bridges are cut
+        self.assertEqual(cut_weight(adjacency, parts), 4)
+
+    def test_follows_the_shares(self):
+        vweights, adjacency = cliques(8, 5)
+        shares = [0.125, 0.125, 0.25, 0.5]
+        parts = KLPartitioner().partition(vweights, adjacency, shares)
+        self.assertEqual(sorted(set(parts)), [0, 1, 2, 3])
+        total = sum(vweights)
+        for weight, share in zip(part_weights(parts, vweights, 4), shares):
+            # the imbalance tolerated at each level of the bisection
+            self.assertLessEqual(abs(weight - share * total), 0.1 * total)
+
+    def test_single_part(self):
+        vweights, adjacency = cliques(2, 3)
+        self.assertEqual(KLPartitioner().partition(vweights, adjacency, [1.0]), [0] * 6)
+
+    def test_more_parts_than_vertices(self):
+        vweights, adjacency = cliques(1, 3)
+        parts = KLPartitioner().partition(vweights, adjacency, [0.25] * 4)
+        self.assertEqual(len(parts), 3)
+        self.assertTrue(all(0 <= part < 4 for part in parts))
+
+
+class GetPartitionerTestCase(unittest.TestCase):
+    def test_by_name(self):
+        self.assertIsInstance(get_partitioner([0.5, 0.5], backend="kl"), KLPartitioner)
+        with self.assertRaises(ValueError):
+            get_partitioner([0.5, 0.5], backend="nope")
+
+    def test_pymetis_only_for_equal_shares(self):
+        self.assertTrue(PymetisPartitioner().supports([0.5, 0.5]))
+        self.assertFalse(PymetisPartitioner().supports([0.25, 0.75]))
+        self.assertNotIsInstance(get_partitioner([0.25, 0.75]), PymetisPartitioner)
+        # KLPartitioner is always available
+        self.assertIsNotNone(get_partitioner([0.25, 0.75]))
+
+
+@unittest.skipUnless(PymetisPartitioner.available(), "pymetis is not installed")
+class PymetisPartitionerTestCase(unittest.TestCase):
+    def test_balance(self):
+        vweights, adjacency = cliques(4, 6)
+        parts = PymetisPartitioner().partition(vweights, adjacency, [0.25] * 4)
+        self.assertEqual(part_weights(parts, vweights, 4), [6] * 4)
+        self.assertEqual(cut_weight(adjacency, parts), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+try:
+    from mininet.distrinet import Distrinet
+except ImportError:
+    # Distrinet needs asyncssh
+    Distrinet = None
+
+# fping -q -c1 (names aligned, ICMP errors mixed in)
+FPING_OUTPUT = """ICMP Host Unreachable from 10.0.0.1 for ICMP Echo sent to 10.0.0.4
+10.0.0.2  : xmt/rcv/%loss = 1/1/0%, min/avg/max = 0.061/0.061/0.061
+10.0.0.3  : xmt/rcv/%loss = 1/0/100%
+10.0.0.12 : xmt/rcv/%loss = 1/1/0%, min/avg/max = 1.20/1.20/1.20
+"""
+
+# fallback with ping when fping is missing
+PING_OUTPUT = """10.0.0.3 : xmt/rcv/%loss = 1/0/
+10.0.0.2 : xmt/rcv/%loss = 1/1/
+"""
+
+
+@unittest.skipIf(Distrinet is None, "asyncssh is not installed")
+class PingBatchTestCase(unittest.TestCase):
+    def test_fping(self):
+        self.assertEqual(Distrinet._parsePingBatch(FPING_OUTPUT),
+                         {"10.0.0.2": (1, 1), "10.0.0.3": (1, 0), "10.0.0.12": (1, 1)})
+
+    def test_ping_fallback(self):
+        self.assertEqual(Distrinet._parsePingBatch(PING_OUTPUT),
+                         {"10.0.0.2": (1, 1), "10.0.0.3": (1, 0)})
+
+    def test_no_result(self):
+        self.assertEqual(Distrinet._parsePingBatch(""), {})
+        self.assertEqual(Distrinet._parsePingBatch("bash: fping: command not found\n"), {})
+
+    def test_script(self):
+        script = Distrinet.pingScript.format(ms=500, opts="-W 0.5", ips="10.0.0.2 10.0.0.3")
+        self.assertIn("fping -q -c1 -t 500 10.0.0.2 10.0.0.3", script)
+        self.assertIn("for ip in 10.0.0.2 10.0.0.3; do", script)
+        self.assertIn("ping -c1 -W 0.5 $ip", script)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import unittest
+
+from mininet.topo import Topo
+
+try:
+    from mininet.distrinet import Distrinet
+    from mininet.lxc_container import LxcNode
+    from mininet.cloudlink import CloudLink
+except ImportError:
+    # Distrinet needs asyncssh
+    Distrinet = None
+
+
+class FakeIntf(object):
+    def __init__(self, node, params):
+        self.node = node
+        self.params = params
+
+
+def node(name, target="t1", image="ubuntu", cpu=None, memory=None):
+    "LxcNode of a running network, without its container"
+    n = LxcNode.__new__(LxcNode)
+    n.name, n.target, n.image, n.cpu, n.memory = name, target, image, cpu, memory
+    n.params = {}
+    n.devices, n.devicesMaster = [], []
+    return n
+
+
+def link(node1, node2, params1=None, params2=None):
+    "CloudLink of a running network, without its devices"
+    l = CloudLink.__new__(CloudLink)
+    l.intf1 = FakeIntf(node1, params1 or {})
+    l.intf2 = FakeIntf(node2, params2 or {})
+    return l
+
+
+@unittest.skipIf(Distrinet is None, "asyncssh is not installed")
+class ReconcileTestCase(unittest.TestCase):
+    def setUp(self):
+        # running network: h1 - s1 - h2, h1 and s1 on t1, h2 on t2
+        self.h1 = node("h1", cpu=2)
+        self.h2 = node("h2", target="t2")
+        self.s1 = node("s1", image="switch")
+        self.l1 = link(self.h1, self.s1, {"bw": 10}, {"bw": 10})
+        self.l2 = link(self.h2, self.s1, {"bw": 10}, {"bw": 10})
+        self.net = Distrinet.__new__(Distrinet)
+        self.net.hosts = [self.h1, self.h2]
+        self.net.switches = [self.s1]
+        self.net.links = [self.l1, self.l2]
+        self.net.nameToNode = {n.name: n for n in (self.h1, self.h2, self.s1)}
+        self.destroyed = []
+        self.net.destroyContainers = self.destroyed.extend
+
+        self.adminNetwork = dict(LxcNode.connectedToAdminNetwork)
+        LxcNode.connectedToAdminNetwork.clear()
+        LxcNode.connectedToAdminNetwork.update({"t1": True, "t2": True})
+
+    def tearDown(self):
+        LxcNode.connectedToAdminNetwork.clear()
+        LxcNode.connectedToAdminNetwork.update(self.adminNetwork)
+
+    def topo(self, hosts=("h1", "h2"), links=(("h1", "s1"), ("h2", "s1")), bw=10, **h1):
+        "Topology of the same shape as the running network by default"
+        topo = Topo()
+        for name in hosts:
+            opts = {"image": "ubuntu"}
+            if name == "h1":
+                opts["cpu"] = 2
+                opts.update(h1)
+            topo.addHost(name, **opts)
+        topo.addSwitch("s1", image="switch")
+        for node1, node2 in links:
+            topo.addLink(node1, node2, bw=bw)
+        return topo
+
+    def test_unchanged(self):
+        diff = self.net.diffTopo(self.topo())
+        self.assertEqual(diff, {"delNodes": [], "addNodes": [], "updateNodes": [],
+                                "delLinks": [], "addLinks": [], "updateLinks": []})
+
+    def test_added(self):
+        diff = self.net.diffTopo(self.topo(hosts=("h1", "h2", "h3"),
+                                           links=(("h1", "s1"), ("h2", "s1"), ("h3", "s1"))))
+        self.assertEqual(diff["addNodes"], ["h3"])
+        self.assertEqual([(info["node1"], info["node2"]) for info in diff["addLinks"]], [("h3", "s1")])
+        self.assertEqual(diff["delNodes"], [])
+        self.assertEqual(diff["delLinks"], [])
+
+    def test_removed(self):
+        diff = self.net.diffTopo(self.topo(hosts=("h1",), links=(("h1", "s1"),)))
+        self.assertEqual(diff["delNodes"], [self.h2])
+        # the links of a removed node are removed
+        self.assertEqual(diff["delLinks"], [self.l2])
+        self.assertEqual(diff["addNodes"], [])
+        self.assertEqual(diff["addLinks"], [])
+
+    def test_link_removed(self):
+        diff = self.net.diffTopo(self.topo(links=(("h1", "s1"),)))
+        self.assertEqual(diff["delLinks"], [self.l2])
+        self.assertEqual(diff["delNodes"], [])
+
+    def test_image_changed(self):
+        # a node with a new image is destroyed and created again, with its links
+        diff = self.net.diffTopo(self.topo(image="alpine"))
+        self.assertEqual(diff["delNodes"], [self.h1])
+        self.assertEqual(diff["addNodes"], ["h1"])
+        self.assertEqual(diff["delLinks"], [self.l1])
+        self.assertEqual([(info["node1"], info["node2"]) for info in diff["addLinks"]], [("h1", "s1")])
+        self.assertEqual(diff["updateNodes"], [])
+
+    def test_kind_changed(self):
+        topo = Topo()
+        topo.addHost("h1", image="ubuntu", cpu=2)
+        topo.addSwitch("h2", image="ubuntu")
+        topo.addSwitch("s1", image="switch")
+        topo.addLink("h1", "s1", bw=10)
+        topo.addLink("h2", "s1", bw=10)
+        diff = self.net.diffTopo(topo)
+        self.assertEqual(diff["delNodes"], [self.h2])
+        self.assertEqual(diff["addNodes"], ["h2"])
+
+    def test_limits_changed(self):
+        diff = self.net.diffTopo(self.topo(cpu=4, memory="1GB"))
+        self.assertEqual(diff["updateNodes"], [(self.h1, {"cpu": 4, "memory": "1GB"})])
+        self.assertEqual(diff["delNodes"], [])
+
+    def test_tc_changed(self):
+        diff = self.net.diffTopo(self.topo(bw=100))
+        self.assertEqual(diff["updateLinks"], [(self.l1, {"bw": 100}, {"bw": 100}),
+                                               (self.l2, {"bw": 100}, {"bw": 100})])
+        self.assertEqual(diff["delLinks"], [])
+        self.assertEqual(diff["addLinks"], [])
+
+    def test_parallel_links(self):
+        # links between the same nodes are told apart by their rank
+        diff = self.net.diffTopo(self.topo(links=(("h1", "s1"), ("h2", "s1"), ("h1", "s1"))))
+        self.assertEqual([(info["node1"], info["node2"]) for info in diff["addLinks"]], [("h1", "s1")])
+        self.assertEqual(diff["delLinks"], [])
+
+    def test_remove_nodes_hand_over(self):
+        # h1 connected t1 to the admin network, s1 survives on t1
+        self.h1.devices = ["intf1", "vx_20"]
+        self.h1.devicesMaster = ["vx_20"]
+        self.s1.devices = ["intf2"]
+        self.net.removeNodes([self.h1])
+        self.assertEqual(self.destroyed, [self.h1])
+        self.assertEqual(self.s1.devices, ["intf2", "intf1", "vx_20"])
+        self.assertEqual(self.s1.devicesMaster, ["vx_20"])
+        self.assertEqual((self.h1.devices, self.h1.devicesMaster), ([], []))
+        self.assertIn("t1", LxcNode.connectedToAdminNetwork)
+        self.assertEqual(self.net.hosts, [self.h2])
+        self.assertNotIn("h1", self.net.nameToNode)
+
+    def test_remove_nodes_last_of_target(self):
+        # h2 is alone on t2: its devices go with it
+        self.h2.devices = ["vx_21"]
+        self.h2.devicesMaster = ["vx_21"]
+        self.net.removeNodes([self.h2])
+        self.assertEqual(self.destroyed, [self.h2])
+        self.assertEqual(self.h2.devicesMaster, ["vx_21"])
+        self.assertNotIn("t2", LxcNode.connectedToAdminNetwork)
+
+    def test_remove_nodes_together(self):
+        # no heir among the nodes removed at the same time
+        self.h1.devicesMaster = ["vx_20"]
+        self.net.removeNodes([self.h1, self.s1])
+        self.assertEqual(self.h1.devicesMaster, ["vx_20"])
+        self.assertEqual(self.s1.devicesMaster, [])
+        self.assertNotIn("t1", LxcNode.connectedToAdminNetwork)
+        self.assertEqual(self.net.switches, [])
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from mininet.resolver import NameResolver
+
+try:
+    from mininet.lxc_container import LxcNode
+except ImportError:
+    # LxcNode needs asyncssh
+    LxcNode = None
+
+
+class FakeMaster(object):
+    """Connection with the master answering getent from a table"""
+    def __init__(self, loop, hosts):
+        self.loop = loop
+        self.hosts = hosts
+        self.commands = []
+
+    async def _run(self, cmd, input=None):
+        self.commands.append(cmd)
+        if cmd.startswith("getent"):
+            name = cmd.split()[-1]
+            ip = self.hosts.get(name)
+            return "{}       STREAM {}\n".format(ip, name) if ip else ""
+        # NameResolver.command: for name in NAMES; do ...
+        names = cmd.split(";")[0].split()[3:]
+        return "".join("{} {}\n".format(name, self.hosts.get(name, "")) for name in names)
+
+    def cmd(self, cmd):
+        return asyncio.run_coroutine_threadsafe(self._run(cmd), self.loop).result(5)
+
+
+class NameResolverTestCase(unittest.TestCase):
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        self.master = FakeMaster(self.loop, {"master": "10.0.0.1", "target1": "10.0.0.2"})
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    def inLoop(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(5)
+
+    def test_literal(self):
+        resolver = NameResolver()
+        self.assertEqual(resolver.resolve(self.master, "192.168.0.3"), "192.168.0.3")
+        self.assertEqual(self.master.commands, [])
+
+    def test_resolve_cached(self):
+        resolver = NameResolver()
+        self.assertEqual(resolver.resolve(self.master, "target1"), "10.0.0.2")
+        self.assertEqual(resolver.resolve(self.master, "target1"), "10.0.0.2")
+        self.assertEqual(len(self.master.commands), 1)
+
+    def test_prefetch_unresolved(self):
+        resolver = NameResolver()
+        ips = self.inLoop(resolver.prefetch(self.master, ["master", "target1", "unknown"]))
+        self.assertEqual(ips, {"master": "10.0.0.1", "target1": "10.0.0.2", "unknown": None})
+        # failed names are not cached
+        self.assertNotIn("unknown", resolver.cache)
+        self.assertIsNone(resolver.get("unknown"))
+
+    def test_prefetch_expired(self):
+        # the addresses are returned even if they expire before the end of
+        # the lookup
+        resolver = NameResolver(ttl=0)
+        ips = self.inLoop(resolver.prefetch(self.master, ["master", "target1"]))
+        self.assertEqual(ips, {"master": "10.0.0.1", "target1": "10.0.0.2"})
+
+    def test_expired_from_loop(self):
+        resolver = NameResolver(ttl=0.01)
+        self.inLoop(resolver.prefetch(self.master, ["target1"]))
+        time.sleep(0.05)
+        self.assertIsNone(resolver.get("target1"))
+
+        async def blocking():
+            return resolver.resolve(self.master, "target1")
+        # the blocking lookup would dead-lock the loop
+        with self.assertRaises(RuntimeError):
+            self.inLoop(blocking())
+        self.assertEqual(self.inLoop(resolver.aresolve(self.master, "target1")), "10.0.0.2")
+
+    def test_unresolved_from_loop(self):
+        resolver = NameResolver()
+
+        async def blocking():
+            return resolver.resolve(self.master, "unknown")
+        with self.assertRaises(RuntimeError):
+            self.inLoop(blocking())
+        self.assertIsNone(self.inLoop(resolver.aresolve(self.master, "unknown")))
+        # outside of the loop, the lookup blocks
+        self.assertIsNone(resolver.resolve(self.master, "unknown"))
+
+    @unittest.skipIf(LxcNode is None, "asyncssh is not installed")
+    def test_find_name_ip(self):
+        node = LxcNode.__new__(LxcNode)
+        node.resolver = NameResolver()
+        node.masternode = self.master
+        node.devices = []
+        ips = self.inLoop(node.resolver.prefetch(self.master, ["master", "target1", "unknown"]))
+        node.resolver.invalidate()
+
+        # the prefetched addresses are used even if the cache expired
+        self.assertEqual(node._findNameIP("target1", ips), "10.0.0.2")
+        self.assertEqual(self.master.commands[1:], [])
+        with self.assertRaises(Exception):
+            node._findNameIP("unknown", ips)
+
+        cmds = node.createContainerLinkCommandList("target1", "master", 7, "vx_7", "admin-br", None, ips=ips)
+        self.assertIn("ip link add vx_7 type vxlan id 7 remote 10.0.0.1 local 10.0.0.2 dstport 4789", cmds)
@@ -0,0 +1,99 @@
+import json
+import unittest
+
+from mininet.dtraffic import (FLOW_MARKER, clientScript, flowThroughput, linkLoads,
+                              parseClientOutput, pathFractions, serverScript, stopServerScript)
+
+TCP_REPORT = {"start": {"connected": [{"socket": 5}]},
+              "end": {"sum_sent": {"bytes": 125000000, "bits_per_second": 100500000.0},
+                      "sum_received": {"bytes": 124000000, "bits_per_second": 99200000.0}}}
+
+UDP_REPORT = {"end": {"sum": {"bytes": 1250000, "bits_per_second": 10000000.0,
+                              "lost_percent": 0.5}}}
+
+ERROR_REPORT = {"start": {}, "intervals": [], "end": {},
+                "error": "unable to connect to server: Connection refused"}
+
+
+def output(*reports):
+    "Output of a client script for the reports (index, report or raw text)"
+    lines = []
+    for index, report in reports:
+        lines.append("{} {}".format(FLOW_MARKER, index))
+        lines.append(report if isinstance(report, str) else json.dumps(report, indent=4))
+    return "\n".join(lines) + "\n"
+
+
+class ScriptsTestCase(unittest.TestCase):
+    def test_server_script(self):
+        self.assertEqual(serverScript([5201, 5202]),
+                         "iperf3 -s -1 -D -p 5201;iperf3 -s -1 -D -p 5202")
+
+    def test_stop_server_script(self):
+        # only the servers of the ports (not 52010) and never the script itself
+        self.assertEqual(stopServerScript([5201, 5202]),
+                         "pkill -f '^iperf3 -s -1 -D -p 5201$';pkill -f '^iperf3 -s -1 -D -p 5202$'; true")
+
+    def test_client_script(self):
+        script = clientScript([(0, "10.0.0.2", 5201, "10M", 5, False),
+                               (3, "10.0.0.3", 5202, None, 2, True)], retries=3)
+        self.assertIn("iperf3 -J -c 10.0.0.2 -p 5201 -t 5 -b 10M > /tmp/distrinet-flow-0.json", script)
+        self.assertIn("iperf3 -J -c 10.0.0.3 -p 5202 -t 2 -u > /tmp/distrinet-flow-3.json", script)
+        self.assertIn('echo "{} 3"'.format(FLOW_MARKER), script)
+        self.assertLess(script.index("wait"), script.index("echo"))
+
+
+class ParseClientOutputTestCase(unittest.TestCase):
+    def test_reports(self):
+        reports = parseClientOutput(output((0, TCP_REPORT), (4, UDP_REPORT)))
+        self.assertEqual(reports, {0: TCP_REPORT, 4: UDP_REPORT})
+
+    def test_truncated_or_missing_report(self):
+        reports = parseClientOutput(output((1, '{"start": {'), (2, "cat: no such file")))
+        self.assertEqual(reports, {1: None, 2: None})
+
+    def test_nothing(self):
+        self.assertEqual(parseClientOutput(""), {})
+        self.assertEqual(parseClientOutput("bash: iperf3: command not found\n"), {})
+
+
+class FlowThroughputTestCase(unittest.TestCase):
+    def test_tcp(self):
+        # the receiver side of a TCP flow
+        self.assertEqual(flowThroughput(TCP_REPORT), (99200000.0, None))
+
+    def test_udp(self):
+        self.assertEqual(flowThroughput(UDP_REPORT, udp=True), (10000000.0, None))
+        self.assertEqual(flowThroughput(TCP_REPORT, udp=True),
+                         (0.0, "no summary in the iperf3 report"))
+
+    def test_failures(self):
+        self.assertEqual(flowThroughput(None), (0.0, "no iperf3 report"))
+        self.assertEqual(flowThroughput(ERROR_REPORT),
+                         (0.0, "unable to connect to server: Connection refused"))
+
+
+class LinkLoadsTestCase(unittest.TestCase):
+    # two paths of equal length between h1 and h2 (s1-s2-s4 and s1-s3-s4)
+    adjacency = {"h1": {"s1"}, "s1": {"h1", "s2", "s3"}, "s2": {"s1", "s4"},
+                 "s3": {"s1", "s4"}, "s4": {"s2", "s3", "h2"}, "h2": {"s4"}}
+
+    def test_ecmp(self):
+        fractions = pathFractions(self.adjacency, "h1", "h2")
+        self.assertEqual(fractions[("h1", "s1")], 1)
+        self.assertEqual(fractions[("s1", "s2")], 0.5)
+        self.assertEqual(fractions[("s3", "s4")], 0.5)
+        self.assertNotIn(("s2", "s1"), fractions)
+
+    def test_unreachable(self):
+        self.assertEqual(pathFractions(dict(self.adjacency, h3=set()), "h1", "h3"), {})
+
+    def test_loads(self):
+        loads = linkLoads(self.adjacency, [("h1", "h2", 100.0), ("h2", "h1", 10.0), ("h1", "h2", 0)])
+        self.assertEqual(loads[("s1", "s2")], 50.0)
+        self.assertEqual(loads[("s4", "s3")], 5.0)
+        self.assertEqual(loads[("s4", "h2")], 100.0)
+
+
+if __name__ == '__main__':
+    unittest.main()